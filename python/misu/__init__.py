@@ -12,11 +12,28 @@ except PackageNotFoundError:
 from misu._engine import (
     EIncompatibleUnits,
     ESignatureAlreadyRegistered,
+    Interp1D,
+    LazyQuantityNP,
     Quantity,
     QuantityNP,
+    QuantityVec2,
+    QuantityVec3,
     addType,
+    axpy,
+    clip,
     dimensions,
+    fma,
+    get_num_threads,
+    hypot,
+    lazy,
+    lerp,
+    qmax,
+    qmean,
+    qmin,
+    qsorted,
+    qsum,
     quantity_from_string,
+    set_num_threads,
 )
 
 # Populate the package namespace with the unit catalogue.
@@ -24,6 +41,9 @@ from misu import _catalogue as _catalogue  # noqa: E402
 
 _catalogue.populate()
 
+from misu._decorator import jit  # noqa: E402
+from misu import integrate  # noqa: E402
+
 # Re-export the helpers users may want from the misulib facade.
 createUnit = _catalogue.createUnit
 createMetricPrefixes = _catalogue.createMetricPrefixes
@@ -0,0 +1,311 @@
+"""numpy function support (``__array_function__``) for Quantity and QuantityNP.
+
+Each supported function checks once that the quantities it was given agree
+in dimensions, runs on the bare magnitudes (base SI units, so no conversion
+is involved) and rewraps the result with those dimensions. numpy functions
+without a handler here run exactly as they did before the hook existed.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+from misu._engine import (
+    EIncompatibleUnits,
+    Quantity,
+    QuantityNP,
+    _restore_quantity_np,
+)
+from misu._ufunc import (
+    _DIMENSIONLESS,
+    _check_out,
+    _dims,
+    _magnitude,
+    _out_array,
+    _scaled,
+    _wrap,
+)
+
+_HANDLERS = {}
+
+
+def _implements(*funcs):
+    def register(handler):
+        for func in funcs:
+            _HANDLERS[func] = handler
+        return handler
+    return register
+
+
+def _common_dims(func, values):
+    """The dimensions shared by `values`; bare numbers and arrays count as
+    dimensionless, and None (an omitted bound) is skipped."""
+    dims = {
+        _dims(v) for v in values if v is not None and v is not np._NoValue
+    }
+    if len(dims) > 1:
+        raise EIncompatibleUnits(
+            f"Incompatible units for numpy.{func.__name__}"
+        )
+    return dims.pop() if dims else _DIMENSIONLESS
+
+
+def _wrap_all(raw, dims, view_of=None):
+    """`_wrap` for functions that return a list or tuple of arrays."""
+    if isinstance(raw, (list, tuple)):
+        return type(raw)(_wrap(r, dims, view_of) for r in raw)
+    return _wrap(raw, dims, view_of)
+
+
+def _finish(raw, dims, out):
+    """The result for a call that may have written into `out`."""
+    if out is None:
+        return _wrap_all(raw, dims)
+    if isinstance(out, QuantityNP):
+        out._set_unit(list(dims))
+    return out
+
+
+def _split_out(kwargs, dims):
+    kwargs = dict(kwargs)
+    out = kwargs.pop("out", None)
+    if out is not None:
+        _check_out(out, dims)
+        kwargs["out"] = _out_array(out)
+    return out, kwargs
+
+
+def _unhandled(func, args, kwargs):
+    # numpy's own implementation, as called before the hook existed.
+    implementation = getattr(func, "_implementation", None)
+    if implementation is None:
+        return NotImplemented
+    return implementation(*args, **kwargs)
+
+
+@_implements(
+    np.concatenate, np.stack, np.vstack, np.hstack, np.dstack,
+    np.column_stack,
+)
+def _join(func, args, kwargs):
+    arrays, *rest = args
+    dims = _common_dims(func, arrays)
+    out, kwargs = _split_out(kwargs, dims)
+    raw = func([_magnitude(a) for a in arrays], *rest, **kwargs)
+    return _finish(raw, dims, out)
+
+
+@_implements(
+    np.copy, np.reshape, np.ravel, np.transpose, np.squeeze, np.expand_dims,
+    np.moveaxis, np.swapaxes, np.flip, np.roll, np.tile, np.repeat,
+    np.broadcast_to, np.split, np.array_split, np.zeros_like, np.ones_like,
+    np.empty_like,
+)
+def _reshape(func, args, kwargs):
+    # Functions of one array whose other arguments are shapes, axes and
+    # counts: the result has the array's dimensions. Many return views,
+    # which must not change units independently of `a`.
+    a, *rest = args
+    view_of = a if isinstance(a, QuantityNP) else None
+    raw = func(_magnitude(a), *rest, **kwargs)
+    return _wrap_all(raw, _dims(a), view_of)
+
+
+@_implements(np.append)
+def _append(func, args, kwargs):
+    arr, values, *rest = args
+    dims = _common_dims(func, (arr, values))
+    raw = func(_magnitude(arr), _magnitude(values), *rest, **kwargs)
+    return _wrap(raw, dims)
+
+
+@_implements(np.where)
+def _where(func, args, kwargs):
+    if len(args) != 3:
+        return _unhandled(func, args, kwargs)
+    condition, x, y = args
+    dims = _common_dims(func, (x, y))
+    raw = func(_magnitude(condition), _magnitude(x), _magnitude(y))
+    return _wrap(raw, dims)
+
+
+@_implements(np.clip)
+def _clip(func, args, kwargs):
+    bounds = [
+        kwargs[k] for k in ("a_min", "a_max", "min", "max") if k in kwargs
+    ]
+    dims = _common_dims(func, (*args, *bounds))
+    out, kwargs = _split_out(kwargs, dims)
+    kwargs = {k: _magnitude(v) for k, v in kwargs.items()}
+    raw = func(*(_magnitude(a) for a in args), **kwargs)
+    return _finish(raw, dims, out)
+
+
+@_implements(np.full_like)
+def _full_like(func, args, kwargs):
+    kwargs = dict(kwargs)
+    a, *rest = args
+    fill_value = rest.pop(0) if rest else kwargs.pop("fill_value")
+    raw = func(_magnitude(a), _magnitude(fill_value), *rest, **kwargs)
+    return _wrap(raw, _dims(fill_value))
+
+
+def _as_quantity_np(x):
+    if isinstance(x, QuantityNP):
+        return x
+    return _restore_quantity_np(np.asarray(_magnitude(x)), list(_dims(x)))
+
+
+@_implements(np.isclose, np.allclose)
+def _isclose(func, args, kwargs):
+    # The QuantityNP methods check units and take a Quantity atol.
+    a, b, *rest = args
+    params = dict(zip(("rtol", "atol", "equal_nan"), rest), **kwargs)
+    a, b = _as_quantity_np(a), _as_quantity_np(b)
+    result = getattr(a, func.__name__)(b, **params)
+    if func is np.isclose and result.ndim == 0:
+        return result[()]
+    return result
+
+
+@_implements(np.sort, np.argsort, np.unique)
+def _ordering(func, args, kwargs):
+    a, *rest = args
+    if not rest and not kwargs and isinstance(a, QuantityNP) and a.dtype.kind != "c":
+        # Default arguments: the misu kernels.
+        if func is np.sort:
+            result = a.copy()
+            result.sort()
+            return result
+        return getattr(a, func.__name__)()
+    raw = func(_magnitude(a), *rest, **kwargs)
+    if func is np.argsort:
+        return raw
+    if isinstance(raw, tuple):
+        # np.unique(..., return_counts=True) and friends: only the values
+        # carry units.
+        return (_wrap(raw[0], _dims(a)), *raw[1:])
+    return _wrap(raw, _dims(a))
+
+
+@_implements(np.searchsorted)
+def _searchsorted(func, args, kwargs):
+    a, v, *rest = args
+    params = dict(zip(("side", "sorter"), rest), **kwargs)
+    if params.pop("sorter", None) is None:
+        return _as_quantity_np(a).searchsorted(v, **params)
+    _common_dims(func, (a, v))
+    return func(_magnitude(a), _magnitude(v), *rest, **kwargs)
+
+
+@_implements(np.digitize)
+def _digitize(func, args, kwargs):
+    x, bins, *rest = args
+    result = _as_quantity_np(x).digitize(_as_quantity_np(bins), *rest, **kwargs)
+    return result[()] if result.ndim == 0 else result
+
+
+# np.trapz became np.trapezoid in numpy 2.0.
+_TRAPEZOID = [
+    f for f in (getattr(np, "trapezoid", None), getattr(np, "trapz", None))
+    if f is not None
+]
+
+
+@_implements(*_TRAPEZOID)
+def _trapezoid(func, args, kwargs):
+    y, *rest = args
+    params = dict(zip(("x", "dx", "axis"), rest), **kwargs)
+    axis = params.pop("axis", -1)
+    if axis != -1:
+        y = np.moveaxis(y, axis, -1)
+    return _as_quantity_np(y).trapz(**params)
+
+
+@_implements(np.gradient)
+def _gradient(func, args, kwargs):
+    f, *spacing = args
+    if kwargs or len(spacing) > 1 or np.ndim(_magnitude(f)) != 1:
+        return _unhandled(func, args, kwargs)
+    return _as_quantity_np(f).gradient(*spacing)
+
+
+@_implements(np.diff, np.cumsum)
+def _running(func, args, kwargs):
+    a, *rest = args
+    raw = _magnitude(a)
+    if not rest and not kwargs and np.ndim(raw) > 0 and not np.iscomplexobj(raw):
+        return getattr(_as_quantity_np(a), func.__name__)()
+    # n=, axis=, prepend=, dtype=...: numpy's loop on the magnitudes.
+    dims = _common_dims(func, (a, kwargs.get("prepend"), kwargs.get("append")))
+    kwargs = {k: _magnitude(v) for k, v in kwargs.items()}
+    return _wrap(func(raw, *rest, **kwargs), dims)
+
+
+@_implements(np.linspace)
+def _linspace(func, args, kwargs):
+    kwargs = dict(kwargs)
+    start = args[0] if len(args) > 0 else kwargs.pop("start")
+    stop = args[1] if len(args) > 1 else kwargs.pop("stop")
+    dims = _common_dims(func, (start, stop))
+    raw = func(_magnitude(start), _magnitude(stop), *args[2:], **kwargs)
+    return _wrap_all(raw, dims)
+
+
+# Reductions: numpy function -> (QuantityNP method, power of the input
+# dimensions carried by the result; None for an index).
+_REDUCTIONS = {
+    np.sum: ("sum", 1),
+    np.nansum: ("nansum", 1),
+    np.mean: ("mean", 1),
+    np.nanmean: ("nanmean", 1),
+    np.var: ("var", 2),
+    np.nanvar: ("nanvar", 2),
+    np.std: ("std", 1),
+    np.nanstd: ("nanstd", 1),
+    np.min: ("min", 1),
+    np.amin: ("min", 1),
+    np.nanmin: ("nanmin", 1),
+    np.max: ("max", 1),
+    np.amax: ("max", 1),
+    np.nanmax: ("nanmax", 1),
+    np.ptp: ("ptp", 1),
+    np.linalg.norm: ("norm", 1),
+    np.argmin: ("argmin", None),
+    np.nanargmin: ("nanargmin", None),
+    np.argmax: ("argmax", None),
+    np.nanargmax: ("nanargmax", None),
+}
+_VARIANCES = {"var", "nanvar", "std", "nanstd"}
+
+
+@_implements(*_REDUCTIONS)
+def _reduction(func, args, kwargs):
+    method, power = _REDUCTIONS[func]
+    a, *rest = args
+    allowed = {"ddof"} if method in _VARIANCES else set()
+    whole = not rest and set(kwargs) <= allowed
+    if whole and isinstance(a, QuantityNP) and a.dtype.kind != "c":
+        # A whole-array reduction: the misu kernel.
+        return getattr(a, method)(**kwargs)
+    # axis=, keepdims=, out=, complex data: numpy's loop on the magnitudes.
+    raw = func(_magnitude(a), *rest, **kwargs)
+    if power is None:
+        return raw
+    return _wrap(raw, _scaled(_dims(a), power))
+
+
+_ACCEPTED_TYPES = (
+    Quantity, QuantityNP, np.ndarray, np.generic, int, float, complex,
+)
+
+
+def array_function(func, types, args, kwargs):
+    """The shared body of ``Quantity.__array_function__`` and
+    ``QuantityNP.__array_function__``."""
+    # numpy lists np.ndarray among the types of any call that mixes in a
+    # plain array; the handlers take those (and bare numbers) as
+    # dimensionless.
+    if not all(issubclass(t, _ACCEPTED_TYPES) for t in types):
+        return NotImplemented
+    handler = _HANDLERS.get(func, _unhandled)
+    return handler(func, args, kwargs)
@@ -1,4 +1,4 @@
-"""The ``dimensions`` decorator implementation.
+"""The ``dimensions`` and ``jit`` decorator implementations.
 
 Kept in pure Python because it walks user-defined function signatures and
 calls back into Python — a Rust port wouldn't make this faster, and the
@@ -7,7 +7,16 @@ that real callers throw at it.
 """
 from __future__ import annotations
 
-from misu._engine import Quantity
+import functools
+import numbers
+
+import numpy as np
+
+from misu._engine import (
+    Quantity,
+    QuantityNP,
+    _restore_quantity_np,
+)
 
 
 def make_dimensions_decorator(spec):
@@ -43,3 +52,128 @@ def make_dimensions_decorator(spec):
         modified.__doc__ = func.__doc__
         return modified
     return check_types
+
+
+# Marks a signature whose traced function can't run on bare magnitudes.
+_UNERASABLE = object()
+
+
+class _NotErasable(Exception):
+    pass
+
+
+def _dims(q):
+    return tuple(q.unit_as_tuple())
+
+
+def _arg_key(value):
+    if isinstance(value, Quantity):
+        return ('q', _dims(value))
+    if isinstance(value, QuantityNP):
+        return ('a', _dims(value))
+    return type(value)
+
+
+def _strip(value):
+    # Magnitudes are always held in base SI units, so erasing a quantity is
+    # just taking its magnitude: every conversion factor is 1.
+    if isinstance(value, (Quantity, QuantityNP)):
+        return value.magnitude
+    return value
+
+
+def _template(result):
+    """Records the shape and dimensions of a traced result."""
+    if isinstance(result, Quantity):
+        return ('q', list(result.unit_as_tuple()))
+    if isinstance(result, QuantityNP):
+        return ('a', list(result.unit_as_tuple()))
+    if isinstance(result, (tuple, list)):
+        return (type(result), [_template(r) for r in result])
+    return None
+
+
+def _rewrap(template, raw):
+    """Re-attaches traced dimensions to a result computed on magnitudes.
+
+    Raises ``_NotErasable`` if `raw` doesn't look like the traced result
+    with its units stripped.
+    """
+    if template is None:
+        if isinstance(raw, (Quantity, QuantityNP)):
+            raise _NotErasable
+        return raw
+    kind, spec = template
+    if kind == 'q':
+        if not isinstance(raw, numbers.Real):
+            raise _NotErasable
+        return Quantity(float(raw), spec)
+    if kind == 'a':
+        if not isinstance(raw, np.ndarray):
+            raise _NotErasable
+        return _restore_quantity_np(raw, spec)
+    if not isinstance(raw, (tuple, list)) or len(raw) != len(spec):
+        raise _NotErasable
+    items = [_rewrap(t, r) for t, r in zip(spec, raw)]
+    return kind._make(items) if hasattr(kind, '_make') else kind(items)
+
+
+def jit(func):
+    """Trace-once decorator: unit-checked first call, float speed after.
+
+    The first call for each combination of argument dimensions runs
+    `func` normally, on real quantities, so misu checks every operation.
+    The dimensions of the result are recorded. Later calls with the same
+    argument dimensions run `func` on the bare magnitudes (floats or
+    ndarrays, in base SI units) and re-attach the recorded dimensions to
+    the result::
+
+        @jit
+        def step(x, v, dt):
+            return x + v * dt
+
+        step(1 * m, 2 * m / s, 0.1 * s)   # traced, fully unit-checked
+        step(2 * m, 3 * m / s, 0.1 * s)   # runs on floats
+
+    Passing arguments with different dimensions traces again. Non-quantity
+    arguments are passed through unchanged and only their type is part of
+    the signature.
+
+    `func` must get all its units from its arguments. If it builds
+    quantities internally (``x = 0.0 * m``) or uses the quantity API
+    (``x.magnitude``, ``x >> km``, ``@dimensions`` helpers), running it on
+    magnitudes raises or returns a quantity. Any exception or mismatched
+    result on magnitudes makes that signature fall back to calling `func`
+    with units from then on. The fallback re-runs the call, so `func`
+    should be free of side effects. Likewise, control flow that depends on
+    the values of the arguments is only checked along the path taken by
+    the first call.
+    """
+    signatures = {}
+
+    @functools.wraps(func)
+    def compiled(*args, **kwargs):
+        key = (
+            tuple(_arg_key(a) for a in args),
+            tuple((k, _arg_key(v)) for k, v in sorted(kwargs.items())),
+        )
+        template = signatures.get(key)
+        if template is None:
+            result = func(*args, **kwargs)
+            signatures[key] = _template(result)
+            return result
+        if template is not _UNERASABLE:
+            try:
+                raw = func(
+                    *[_strip(a) for a in args],
+                    **{k: _strip(v) for k, v in kwargs.items()},
+                )
+                return _rewrap(template, raw)
+            except Exception:
+                # Whatever went wrong on bare magnitudes, the traced call
+                # with units is the reference: use it from now on.
+                signatures[key] = _UNERASABLE
+        return func(*args, **kwargs)
+
+    compiled.signatures = signatures
+    return compiled
@@ -0,0 +1,241 @@
+"""numpy ufunc support (``__array_ufunc__``) for Quantity and QuantityNP.
+
+The Rust ``__array_ufunc__`` handles plain two-operand arithmetic and
+comparisons itself, by calling the operator methods, and hands every other
+call here. Each supported ufunc has a unit rule that checks the input
+dimensions and gives the dimensions of the result. The ufunc then runs in
+a misu kernel when there is one (the elementwise math methods, and the
+named arithmetic methods for ``out=``), and otherwise as numpy's own loop
+over the bare magnitudes, with ``out=`` and ``where=`` passed through.
+
+Magnitudes are always held in base SI units, so stripping the units never
+needs a conversion.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+from misu._engine import (
+    EIncompatibleUnits,
+    Quantity,
+    QuantityNP,
+    _restore_quantity_np,
+)
+
+_DIMENSIONLESS = (0.0,) * 7
+
+
+def _dims(x):
+    if isinstance(x, (Quantity, QuantityNP)):
+        return tuple(x.unit_as_tuple())
+    return _DIMENSIONLESS
+
+
+def _magnitude(x):
+    if isinstance(x, (Quantity, QuantityNP)):
+        return x.magnitude
+    return x
+
+
+def _check_out(o, dims):
+    """Raise before numpy writes into `o` if it cannot take on `dims`."""
+    if isinstance(o, QuantityNP):
+        o._check_unit(list(dims if dims is not None else _DIMENSIONLESS))
+
+
+def _out_array(o):
+    if isinstance(o, QuantityNP):
+        if o.quantum is not None:
+            raise TypeError("cannot write into fixed-point QuantityNP storage")
+        return o.magnitude
+    return o
+
+
+def _scaled(dims, k):
+    return tuple(d * k for d in dims)
+
+
+def _incompatible(name):
+    return EIncompatibleUnits(f"Incompatible units for numpy.{name}")
+
+
+# ---- unit rules --------------------------------------------------------------
+# Each takes (name, dims, inputs) and returns the result's dimensions, or
+# None for a result that carries no units (booleans, indices).
+
+def _same(name, dims, inputs):
+    if any(d != dims[0] for d in dims[1:]):
+        raise _incompatible(name)
+    return dims[0]
+
+
+def _compare(name, dims, inputs):
+    _same(name, dims, inputs)
+    return None
+
+
+def _first(name, dims, inputs):
+    return dims[0]
+
+
+def _product(name, dims, inputs):
+    return tuple(a + b for a, b in zip(dims[0], dims[1]))
+
+
+def _quotient(name, dims, inputs):
+    return tuple(a - b for a, b in zip(dims[0], dims[1]))
+
+
+def _ratio(name, dims, inputs):
+    _same(name, dims, inputs)
+    return _DIMENSIONLESS
+
+
+def _dimensionless(name, dims, inputs):
+    if any(d != _DIMENSIONLESS for d in dims):
+        raise EIncompatibleUnits(f"numpy.{name} needs dimensionless input.")
+    return _DIMENSIONLESS
+
+
+def _unitless(name, dims, inputs):
+    return None
+
+
+def _to_dimensionless(name, dims, inputs):
+    return _DIMENSIONLESS
+
+
+def _power_of(k):
+    def rule(name, dims, inputs):
+        return _scaled(dims[0], k)
+    return rule
+
+
+def _power(name, dims, inputs):
+    if dims[1] != _DIMENSIONLESS:
+        raise EIncompatibleUnits("The exponent must be dimensionless.")
+    if dims[0] == _DIMENSIONLESS:
+        return _DIMENSIONLESS
+    # A dimensioned base needs one exponent for every element, or the
+    # result would have mixed units.
+    exponent = np.unique(np.asarray(_magnitude(inputs[1])))
+    if exponent.size != 1:
+        raise EIncompatibleUnits(
+            "A dimensioned base needs a single exponent for all elements."
+        )
+    return _scaled(dims[0], float(exponent[0]))
+
+
+_RULES = {
+    **dict.fromkeys(
+        ["add", "subtract", "maximum", "minimum", "fmax", "fmin", "hypot",
+         "fmod", "remainder", "nextafter"],
+        _same,
+    ),
+    **dict.fromkeys(
+        ["equal", "not_equal", "less", "less_equal", "greater",
+         "greater_equal"],
+        _compare,
+    ),
+    **dict.fromkeys(
+        ["negative", "positive", "absolute", "fabs", "rint", "floor", "ceil",
+         "trunc", "conjugate", "spacing", "copysign"],
+        _first,
+    ),
+    **dict.fromkeys(["multiply", "matmul"], _product),
+    "divide": _quotient,
+    **dict.fromkeys(["arctan2", "floor_divide"], _ratio),
+    **dict.fromkeys(
+        ["sin", "cos", "tan", "arcsin", "arccos", "arctan", "sinh", "cosh",
+         "tanh", "arcsinh", "arccosh", "arctanh", "exp", "expm1", "exp2",
+         "log", "log10", "log2", "log1p", "deg2rad", "rad2deg", "degrees",
+         "radians"],
+        _dimensionless,
+    ),
+    **dict.fromkeys(["isnan", "isinf", "isfinite", "signbit"], _unitless),
+    "sign": _to_dimensionless,
+    "sqrt": _power_of(0.5),
+    "cbrt": _power_of(1.0 / 3.0),
+    "square": _power_of(2.0),
+    "reciprocal": _power_of(-1.0),
+    "power": _power,
+    "float_power": _power,
+}
+
+# ufuncs with a misu kernel, keyed by ufunc name: the method to call on a
+# QuantityNP first operand.
+_ARITHMETIC = {
+    "add": "add",
+    "subtract": "subtract",
+    "multiply": "multiply",
+    "divide": "divide",
+}
+_ELEMENTWISE = {
+    name for name, rule in _RULES.items() if rule is _dimensionless
+}
+
+
+def _kernel(name, inputs, kwargs):
+    """Runs the ufunc in a misu kernel if one applies, else returns None."""
+    if isinstance(inputs[0], Quantity):
+        if name in _ELEMENTWISE and len(inputs) == 1 and not kwargs:
+            return getattr(inputs[0], name)()
+        return None
+    out = kwargs.get("out")
+    if set(kwargs) - {"out"} or not isinstance(inputs[0], QuantityNP):
+        return None
+    if inputs[0].dtype.kind == "c":
+        # The elementwise kernels are real-only; numpy's loops take complex.
+        return None
+    if out is not None:
+        if len(out) != 1 or not isinstance(out[0], QuantityNP):
+            return None
+        out = out[0]
+    if name in _ELEMENTWISE and len(inputs) == 1:
+        return getattr(inputs[0], name)(out=out)
+    if name in _ARITHMETIC and len(inputs) == 2:
+        return getattr(inputs[0], _ARITHMETIC[name])(inputs[1], out=out)
+    return None
+
+
+def _wrap(raw, dims, view_of=None):
+    # `view_of`: the QuantityNP whose magnitude `raw` may be a view of.
+    if dims is None:
+        return raw
+    if isinstance(raw, np.ndarray):
+        return _restore_quantity_np(raw, list(dims), view_of=view_of)
+    if np.iscomplexobj(raw):
+        return _restore_quantity_np(np.asarray(raw), list(dims))
+    return Quantity(float(raw), list(dims))
+
+
+def array_ufunc(ufunc, method, inputs, kwargs):
+    """The shared body of ``Quantity.__array_ufunc__`` and
+    ``QuantityNP.__array_ufunc__``.
+
+    Returns ``NotImplemented`` for ufuncs without a unit rule, and for
+    methods other than a plain call (``reduce``, ``accumulate``, ...), so
+    that numpy raises its usual ``TypeError``.
+    """
+    rule = _RULES.get(ufunc.__name__)
+    if method != "__call__" or rule is None or ufunc.nout != 1:
+        return NotImplemented
+    name = ufunc.__name__
+    dims = rule(name, [_dims(x) for x in inputs], inputs)
+
+    result = _kernel(name, inputs, kwargs)
+    if result is not None:
+        return result
+
+    out = kwargs.get("out")
+    if out is not None:
+        _check_out(out[0], dims)
+        kwargs = dict(kwargs, out=tuple(_out_array(o) for o in out))
+    raw = ufunc(*(_magnitude(x) for x in inputs), **kwargs)
+    if out is None:
+        return _wrap(raw, dims)
+    (target,) = out
+    if isinstance(target, QuantityNP):
+        target._set_unit(list(dims if dims is not None else _DIMENSIONLESS))
+        return target
+    return raw
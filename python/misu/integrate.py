@@ -0,0 +1,150 @@
+"""Unit-checked ODE integration: ``misu.integrate.solve``.
+
+The state is a ``Quantity`` or ``QuantityNP``, or a tuple of them. Their
+units, and those of the time span, the step and the tolerances, are
+checked once before integration starts. From then on the right-hand side
+works on bare magnitudes in base SI units: it is called as
+``rhs(t, *components)`` with floats (and numpy arrays for array
+components) and returns the derivatives the same way, one per component.
+With ``vectorized=True`` it is called as ``rhs(t, y)`` with the whole
+state as one flat array and returns one flat array.
+
+The stepping, the error control of the adaptive method and the dense
+output at ``t_eval`` run in the Rust core, which calls back into Python
+only for the right-hand side. The results come back as ``QuantityNP``
+time series in the units of the state::
+
+    from misu import integrate, m, s
+
+    def fall(t, x, v):
+        return v, -9.81 - 0.1 * v * abs(v)
+
+    sol = integrate.solve(fall, (0*s, 5*s), (100*m, 0*m/s))
+    x, v = sol.y              # QuantityNP, in m and m/s
+
+Methods are ``"euler"`` and ``"rk4"``, which take a fixed step ``dt``,
+and ``"rk45"`` (Dormand–Prince 5(4), the default), which adapts its step
+to ``rtol`` and ``atol``.
+"""
+from __future__ import annotations
+
+from typing import NamedTuple
+
+import numpy as np
+
+from misu._engine import EIncompatibleUnits, _integrate
+from misu._ufunc import _dims, _magnitude, _wrap
+
+__all__ = ["Solution", "solve"]
+
+# The absolute tolerance, in base SI units, when none is given.
+_ATOL = 1e-9
+
+
+class Solution(NamedTuple):
+    """The result of `solve`."""
+
+    #: The times: every step's end, or ``t_eval``.
+    t: object
+    #: The state at those times: a series for each component, with the time
+    #: along the first axis. A single series if the state was not a tuple.
+    y: object
+    #: The number of right-hand side evaluations.
+    nfev: int
+
+
+def _check_dims(what, dims, value):
+    if _dims(value) != dims:
+        raise EIncompatibleUnits(
+            f"Incompatible units for integrate.solve: {what}"
+        )
+
+
+def solve(
+    rhs,
+    t_span,
+    y0,
+    method="rk45",
+    dt=None,
+    rtol=1e-6,
+    atol=None,
+    t_eval=None,
+    vectorized=False,
+    max_steps=1_000_000,
+):
+    """Integrate ``dy/dt = rhs(t, y)`` over ``t_span = (t0, t1)`` from
+    ``y0``; see the module docstring for the form of ``rhs``.
+
+    ``dt`` is the step of the fixed-step methods, and the first step of
+    ``"rk45"``. ``atol`` is one tolerance per component, in its units
+    (default 1e-9 in base SI units). ``t_eval`` gives the times to report
+    the state at; by default every step is reported. Raises
+    `EIncompatibleUnits` if the times, the step or the tolerances do not
+    fit the state, and RuntimeError if the integration cannot finish in
+    ``max_steps`` steps.
+    """
+    t0, t1 = t_span
+    t_dims = _dims(t0)
+    _check_dims("t_span", t_dims, t1)
+    if dt is not None:
+        _check_dims("dt", t_dims, dt)
+        dt = float(_magnitude(dt))
+    if t_eval is not None:
+        _check_dims("t_eval", t_dims, t_eval)
+        t_eval = np.asarray(_magnitude(t_eval), dtype=np.float64).ravel()
+        t_eval = t_eval.tolist()
+
+    single = not isinstance(y0, (tuple, list))
+    components = (y0,) if single else tuple(y0)
+    dims, shapes, values = [], [], []
+    for c in components:
+        magnitude = np.asarray(_magnitude(c))
+        if np.iscomplexobj(magnitude):
+            raise TypeError("integrate.solve does not support complex states")
+        dims.append(_dims(c))
+        shapes.append(magnitude.shape)
+        values.append(magnitude.astype(np.float64).ravel())
+    flat = np.concatenate(values) if values else np.zeros(0)
+
+    if atol is None:
+        tolerances = np.full(flat.size, _ATOL)
+    else:
+        atol = (atol,) if single else tuple(atol)
+        if len(atol) != len(components):
+            raise ValueError("atol needs one tolerance per state component")
+        parts = []
+        for a, d, shape in zip(atol, dims, shapes):
+            _check_dims("atol", d, a)
+            a = np.asarray(_magnitude(a), dtype=np.float64)
+            parts.append(np.broadcast_to(a, shape).ravel())
+        tolerances = np.concatenate(parts) if parts else np.zeros(0)
+
+    if single and not vectorized:
+        def func(t, y):
+            return (rhs(t, y),)
+    else:
+        func = rhs
+
+    times, states, nfev = _integrate(
+        func,
+        method,
+        float(_magnitude(t0)),
+        float(_magnitude(t1)),
+        flat.tolist(),
+        None if vectorized else [list(shape) for shape in shapes],
+        dt,
+        float(rtol),
+        tolerances.tolist(),
+        t_eval,
+        max_steps,
+    )
+
+    series = []
+    offset = 0
+    for d, shape in zip(dims, shapes):
+        size = int(np.prod(shape, dtype=np.int64))
+        part = states[:, offset:offset + size].reshape((len(times),) + shape)
+        series.append(_wrap(np.ascontiguousarray(part), d))
+        offset += size
+    t = _wrap(times, t_dims)
+    return Solution(t, series[0] if single else tuple(series), nfev)
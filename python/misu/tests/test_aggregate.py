@@ -0,0 +1,63 @@
+"""Tests for the sequence aggregates qsum, qmean, qmin, qmax and qsorted."""
+import math
+
+import pytest
+
+from misu import (
+    EIncompatibleUnits,
+    Quantity,
+    m,
+    qmax,
+    qmean,
+    qmin,
+    qsorted,
+    qsum,
+    s,
+)
+
+
+def test_qsum():
+    items = [1 * m, 2 * m, 3.5 * m]
+    total = qsum(items)
+    assert total.magnitude == 6.5
+    assert total.unit_as_tuple() == m.unit_as_tuple()
+    assert qsum(q for q in items).magnitude == 6.5
+    assert qsum([], start=2 * m).unit_as_tuple() == m.unit_as_tuple()
+    assert qsum([]).magnitude == 0.0
+    assert qsum([1.0, 2.0]).magnitude == 3.0
+
+
+def test_qsum_is_compensated():
+    items = [1e16 * m, 1.0 * m, -1e16 * m] * 10
+    assert qsum(items).magnitude == 10.0
+
+
+def test_qmean():
+    assert qmean([1 * s, 2 * s, 6 * s]).magnitude == 3.0
+    with pytest.raises(ValueError):
+        qmean([])
+
+
+def test_qmin_qmax_return_the_elements():
+    a, b, c = 3 * m, 1 * m, 2 * m
+    assert qmin([a, b, c]) is b
+    assert qmax([a, b, c]) is a
+    assert math.isnan(qmax([a, float("nan") * m, c]).magnitude)
+    with pytest.raises(ValueError, match="qmin"):
+        qmin([])
+
+
+def test_qsorted():
+    a, b, c, d = 3 * m, 1 * m, 3 * m, float("nan") * m
+    assert qsorted([a, d, b, c]) == [b, a, c, d]
+    out = qsorted([a, d, b, c], reverse=True)
+    assert out[:3] == [a, c, b] and out[0] is a and out[3] is d
+    assert all(type(q) is Quantity for q in out)
+
+
+@pytest.mark.parametrize("func", [qsum, qmean, qmin, qmax, qsorted])
+def test_mixed_units_raise(func):
+    with pytest.raises(EIncompatibleUnits, match="index 2"):
+        func([1 * m, 2 * m, 3 * s])
+    with pytest.raises(TypeError):
+        func([1 * m, "x"])
@@ -114,8 +114,27 @@ def test_quantity_np_incompatible_units_addition():
         x + y
 
 
-def test_quantity_np_coerce_2d_array_raises():
-    # 2-D arrays cannot be cast into PyArray1<f64>.
-    arr2d = np.array([[1.0, 2.0], [3.0, 4.0]])
+def test_quantity_np_coerce_non_numeric_raises():
+    with pytest.raises(ValueError):
+        QuantityNP(np.array(["a", "b"]))
+
+
+# --- unsupported operand types --------------------------------------------
+
+@pytest.mark.parametrize("other", ["abc", object(), None])
+def test_quantity_arithmetic_with_unknown_type_raises_type_error(other):
+    with pytest.raises(TypeError):
+        (2 * kg) * other
+    with pytest.raises(TypeError):
+        other + (2 * kg)
+
+
+def test_quantity_eq_unknown_type_is_false():
+    assert ((2 * kg) == "abc") is False
+    assert ((2 * kg) != "abc") is True
+
+
+def test_quantity_np_arithmetic_with_unknown_type_raises_type_error():
+    x = np.array([1.0, 2.0]) * kg
     with pytest.raises(TypeError):
-        QuantityNP(arr2d)
+        x * object()
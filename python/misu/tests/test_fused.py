@@ -0,0 +1,102 @@
+"""Tests for the fused kernels axpy, lerp, hypot, clip and fma."""
+import math
+
+import numpy as np
+import pytest
+
+from misu import (
+    EIncompatibleUnits,
+    Quantity,
+    QuantityNP,
+    axpy,
+    clip,
+    fma,
+    hypot,
+    lerp,
+    m,
+    s,
+)
+
+
+def test_axpy():
+    v = np.array([1.0, 2.0, 3.0]) * m / s
+    x = np.array([10.0, 20.0, 30.0]) * m
+    result = axpy(0.5 * s, v, x)
+    assert isinstance(result, QuantityNP)
+    assert result.magnitude.tolist() == [10.5, 21.0, 31.5]
+    assert result.unit_as_tuple() == m.unit_as_tuple()
+    with pytest.raises(EIncompatibleUnits, match="misu.axpy"):
+        axpy(0.5 * s, v, v)
+
+
+def test_axpy_in_place():
+    v = np.array([1.0, 2.0]) * m / s
+    x = np.array([0.0, 1.0]) * m
+    assert axpy(2 * s, v, x, out=x) is x
+    assert x.magnitude.tolist() == [2.0, 5.0]
+    out = np.zeros(2) * s
+    axpy(2 * s, v, x, out=out)
+    assert out.unit_as_tuple() == m.unit_as_tuple()
+
+
+def test_scalars_give_a_quantity():
+    result = axpy(2 * s, 3 * m / s, 1 * m)
+    assert isinstance(result, Quantity)
+    assert result.magnitude == 7.0
+    assert hypot(3 * m, 4 * m).magnitude == 5.0
+
+
+def test_broadcasting_and_dtype():
+    a = np.ones((2, 3), dtype=np.float32) * m
+    b = np.array([0.0, 1.0, 2.0], dtype=np.float32) * m
+    result = lerp(a, b, 0.5)
+    assert result.dtype == np.float32
+    assert result.magnitude.tolist() == [[0.5, 1.0, 1.5]] * 2
+    with pytest.raises(ValueError):
+        axpy(1.0, np.ones(3) * m, np.ones(3) * m, out=np.zeros(2) * m)
+
+
+def test_lerp():
+    a, b = np.array([0.0, 10.0]) * m, np.array([10.0, 20.0]) * m
+    t = np.array([0.25, 1.0])
+    assert lerp(a, b, t).magnitude.tolist() == [2.5, 20.0]
+    with pytest.raises(EIncompatibleUnits):
+        lerp(a, b, 0.5 * s)
+    with pytest.raises(EIncompatibleUnits):
+        lerp(a, np.ones(2) * s, 0.5)
+
+
+def test_hypot():
+    x = np.array([3.0, 1e200]) * m
+    y = np.array([4.0, 1e200]) * m
+    result = hypot(x, y).magnitude
+    assert result[0] == 5.0
+    assert math.isclose(result[1], math.sqrt(2) * 1e200)
+    with pytest.raises(EIncompatibleUnits):
+        hypot(x, y / s)
+
+
+def test_clip():
+    q = np.array([-1.0, 0.5, 2.0, np.nan]) * m
+    assert clip(q, 0 * m, 1 * m).magnitude.tolist()[:3] == [0.0, 0.5, 1.0]
+    assert math.isnan(clip(q, 0 * m, 1 * m).magnitude[3])
+    assert clip(q, hi=1 * m).magnitude.tolist()[:3] == [-1.0, 0.5, 1.0]
+    assert clip(q, lo=0 * m).magnitude.tolist()[:3] == [0.0, 0.5, 2.0]
+    lo = np.array([0.0, 1.0, 0.0, 0.0]) * m
+    assert clip(q, lo, 1 * m).magnitude.tolist()[:3] == [0.0, 1.0, 1.0]
+    with pytest.raises(EIncompatibleUnits):
+        clip(q, 0 * s)
+
+
+def test_fma():
+    a = np.array([0.1, 3.0]) * m
+    result = fma(a, 10 * s, np.array([-1.0, 1.0]) * m * s)
+    # Rounded once: the error in 0.1 survives, where 0.1 * 10 - 1 is 0.
+    assert result.magnitude.tolist() == [2.0**-54, 31.0]
+    assert result.unit_as_tuple() == (m * s).unit_as_tuple()
+
+
+def test_complex_is_rejected():
+    z = np.array([1 + 1j]) * m
+    with pytest.raises(TypeError):
+        hypot(z, z)
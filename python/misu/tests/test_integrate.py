@@ -0,0 +1,112 @@
+"""Tests for misu.integrate."""
+import math
+
+import numpy as np
+import pytest
+
+from misu import EIncompatibleUnits, QuantityNP, integrate, kg, m, ms, s
+
+
+def test_exponential_decay():
+    # dN/dt = -N / tau, in kg.
+    tau = 2.0
+    sol = integrate.solve(lambda t, n: -n / tau, (0 * s, 5 * s), 3.0 * kg,
+                          rtol=1e-9, atol=1e-12 * kg)
+    assert isinstance(sol.t, QuantityNP) and isinstance(sol.y, QuantityNP)
+    assert sol.t.unit_as_tuple() == s.unit_as_tuple()
+    assert sol.y.unit_as_tuple() == kg.unit_as_tuple()
+    assert sol.t.magnitude[0] == 0.0 and sol.t.magnitude[-1] == 5.0
+    assert sol.y.magnitude[0] == 3.0
+    np.testing.assert_allclose(
+        sol.y.magnitude, 3.0 * np.exp(-sol.t.magnitude / tau), rtol=1e-6
+    )
+    assert sol.nfev > 0
+
+
+@pytest.mark.parametrize("method, dt, rtol", [
+    ("euler", 1e-4, 5e-3),
+    ("rk4", 1e-2, 1e-7),
+    ("rk45", None, 1e-4),
+])
+def test_harmonic_oscillator(method, dt, rtol):
+    omega = 3.0
+
+    def spring(t, x, v):
+        return v, -omega * omega * x
+
+    sol = integrate.solve(spring, (0 * s, 2 * s), (1 * m, 0 * m / s),
+                          method=method, dt=None if dt is None else dt * s)
+    x, v = sol.y
+    assert x.unit_as_tuple() == m.unit_as_tuple()
+    assert v.unit_as_tuple() == (m / s).unit_as_tuple()
+    t = sol.t.magnitude
+    np.testing.assert_allclose(x.magnitude, np.cos(omega * t),
+                               rtol=rtol, atol=rtol)
+    np.testing.assert_allclose(v.magnitude, -omega * np.sin(omega * t),
+                               rtol=rtol, atol=3 * rtol)
+    if dt is not None:
+        assert len(t) == round(2.0 / dt) + 1
+        assert t[-1] == 2.0
+
+
+def test_t_eval_dense_output():
+    t_eval = np.linspace(0.0, 1000.0, 11) * ms
+    for method in ("rk45", "rk4"):
+        sol = integrate.solve(lambda t, x: x, (0 * s, 1 * s), 1 * m,
+                              method=method, dt=0.01 * s, t_eval=t_eval)
+        np.testing.assert_array_equal(sol.t.magnitude, t_eval.magnitude)
+        np.testing.assert_allclose(sol.y.magnitude,
+                                   np.exp(t_eval.magnitude), rtol=1e-5)
+
+
+def test_backwards_in_time():
+    sol = integrate.solve(lambda t, x: x, (1 * s, 0 * s), math.e * m)
+    assert sol.t.magnitude[-1] == 0.0
+    assert math.isclose(sol.y.magnitude[-1], 1.0, rel_tol=1e-5)
+
+
+def test_vectorized_and_array_components():
+    rates = np.array([1.0, 2.0, 3.0])
+    y0 = np.ones(3) * m
+    end = np.exp(-rates)
+    vec = integrate.solve(lambda t, y: -rates * y, (0 * s, 1 * s), y0,
+                          vectorized=True, t_eval=np.array([1.0]) * s)
+    assert vec.y.magnitude.shape == (1, 3)
+    np.testing.assert_allclose(vec.y.magnitude[0], end, rtol=1e-5)
+    # The same, with the array as one component among others.
+    sol = integrate.solve(lambda t, y, c: (-rates * y, 0.0),
+                          (0 * s, 1 * s), (y0, 2 * kg))
+    y, c = sol.y
+    assert y.magnitude.shape == (len(sol.t.magnitude), 3)
+    np.testing.assert_allclose(y.magnitude[-1], end, rtol=1e-5)
+    assert np.all(c.magnitude == 2.0)
+
+
+def test_units_are_checked():
+    decay = lambda t, x: -x  # noqa: E731
+    with pytest.raises(EIncompatibleUnits):
+        integrate.solve(decay, (0 * s, 1 * m), 1 * m)
+    with pytest.raises(EIncompatibleUnits):
+        integrate.solve(decay, (0 * s, 1 * s), 1 * m, method="rk4", dt=1 * m)
+    with pytest.raises(EIncompatibleUnits):
+        integrate.solve(decay, (0 * s, 1 * s), 1 * m, atol=1e-6 * kg)
+    with pytest.raises(EIncompatibleUnits):
+        integrate.solve(decay, (0 * s, 1 * s), 1 * m, t_eval=np.array([0.5]) * m)
+    with pytest.raises(TypeError):
+        integrate.solve(lambda t, x: -x * m, (0 * s, 1 * s), 1 * m)
+
+
+def test_arguments_are_checked():
+    decay = lambda t, x: -x  # noqa: E731
+    with pytest.raises(ValueError):
+        integrate.solve(decay, (0 * s, 1 * s), 1 * m, method="euler")
+    with pytest.raises(ValueError):
+        integrate.solve(decay, (0 * s, 1 * s), 1 * m, method="midpoint")
+    with pytest.raises(ValueError):
+        integrate.solve(decay, (0 * s, 1 * s), 1 * m,
+                        t_eval=np.array([0.5, 0.2]) * s)
+    with pytest.raises(ValueError):
+        integrate.solve(lambda t, x, v: (v,), (0 * s, 1 * s), (1 * m, 1 * m / s))
+    with pytest.raises(RuntimeError):
+        integrate.solve(decay, (0 * s, 1 * s), 1 * m, method="euler",
+                        dt=1e-3 * s, max_steps=10)
@@ -0,0 +1,105 @@
+"""Tests for the Interp1D interpolation table."""
+import math
+import pickle
+
+import numpy as np
+import pytest
+
+from misu import (
+    EIncompatibleUnits,
+    Interp1D,
+    K,
+    Pa,
+    Quantity,
+    QuantityNP,
+    m,
+    s,
+)
+
+
+def _table(**kwargs):
+    temperature = np.array([250.0, 300.0, 350.0, 400.0]) * K
+    viscosity = np.array([4.0, 2.0, 1.0, 0.5]) * Pa * s
+    return Interp1D(temperature, viscosity, **kwargs)
+
+
+def test_scalar_lookup():
+    table = _table()
+    result = table(325 * K)
+    assert isinstance(result, Quantity)
+    assert result.magnitude == 1.5
+    assert result.unit_as_tuple() == (Pa * s).unit_as_tuple()
+    assert table(250 * K).magnitude == 4.0
+    assert table(400 * K).magnitude == 0.5
+    with pytest.raises(EIncompatibleUnits):
+        table(325 * m)
+
+
+def test_array_lookup():
+    table = _table()
+    result = table(np.array([[260.0, 300.0], [310.0, 395.0]]) * K)
+    assert isinstance(result, QuantityNP)
+    assert result.magnitude.shape == (2, 2)
+    expected = np.interp([260.0, 300.0, 310.0, 395.0], table.x.magnitude, table.y.magnitude)
+    np.testing.assert_allclose(result.magnitude.ravel(), expected, rtol=1e-15)
+
+
+def test_uneven_knots_match_np_interp():
+    xs = np.array([0.0, 0.1, 0.5, 2.0, 2.1, 7.0])
+    ys = np.sin(xs)
+    table = Interp1D(xs * s, ys * m)
+    samples = np.linspace(0.0, 7.0, 101)
+    np.testing.assert_allclose(
+        table(samples * s).magnitude, np.interp(samples, xs, ys), rtol=1e-14, atol=1e-15
+    )
+
+
+def test_extrapolation():
+    x = np.array([0.0, 1.0, 2.0]) * s
+    y = np.array([0.0, 10.0, 30.0]) * m
+    assert Interp1D(x, y)(-1 * s).magnitude == 0.0
+    assert Interp1D(x, y)(3 * s).magnitude == 30.0
+    assert Interp1D(x, y, extrapolate="extend")(3 * s).magnitude == 50.0
+    assert Interp1D(x, y, extrapolate="extend")(-1 * s).magnitude == -10.0
+    assert math.isnan(Interp1D(x, y, extrapolate="nan")(3 * s).magnitude)
+    raising = Interp1D(x, y, extrapolate="raise")
+    assert raising(1.5 * s).magnitude == 20.0
+    with pytest.raises(ValueError):
+        raising(3 * s)
+    with pytest.raises(ValueError):
+        raising(np.array([1.0, 2.5]) * s)
+    with pytest.raises(ValueError):
+        Interp1D(x, y, extrapolate="wrap")
+
+
+def test_cubic():
+    xs = np.linspace(0.0, math.pi, 41)
+    table = Interp1D(xs * s, np.sin(xs) * m, kind="cubic")
+    assert table.kind == "cubic"
+    samples = np.linspace(0.0, math.pi, 333)
+    np.testing.assert_allclose(table(samples * s).magnitude, np.sin(samples), atol=1e-5)
+    # A natural spline through points on a line is that line.
+    line = Interp1D(np.array([0.0, 1.0, 3.0, 4.0]) * s, np.array([1.0, 3.0, 7.0, 9.0]) * m, kind="cubic")
+    assert math.isclose(line(2 * s).magnitude, 5.0)
+
+
+def test_knots_are_checked():
+    with pytest.raises(ValueError):
+        Interp1D(np.array([0.0, 2.0, 1.0]) * s, np.zeros(3) * m)
+    with pytest.raises(ValueError):
+        Interp1D(np.array([0.0, 1.0]) * s, np.zeros(3) * m)
+    with pytest.raises(ValueError):
+        Interp1D(np.array([0.0]) * s, np.zeros(1) * m)
+    with pytest.raises(ValueError):
+        Interp1D(np.array([0.0, 1.0]) * s, np.zeros(2) * m, kind="quadratic")
+
+
+def test_accessors_and_pickle():
+    table = _table(kind="cubic", extrapolate="nan")
+    assert len(table) == 4
+    assert table.x.unit_as_tuple() == K.unit_as_tuple()
+    assert table.extrapolate == "nan"
+    assert "4 knots" in repr(table)
+    copy = pickle.loads(pickle.dumps(table))
+    assert copy.kind == "cubic" and copy.extrapolate == "nan"
+    assert copy(333 * K).magnitude == table(333 * K).magnitude
@@ -0,0 +1,96 @@
+"""Tests for the ``jit`` trace-once decorator."""
+import numpy as np
+import pytest
+
+import misu
+from misu import EIncompatibleUnits, Quantity, QuantityNP, kg, m, s
+
+
+def _recording(func):
+    """Wraps `func`, recording the argument types of every call."""
+    calls = []
+
+    def inner(*args):
+        calls.append(tuple(type(a) for a in args))
+        return func(*args)
+
+    return calls, misu.jit(inner)
+
+
+def test_second_call_runs_on_floats():
+    calls, step = _recording(lambda x, v, dt: x + v * dt)
+    first = step(1 * m, 2 * m / s, 0.5 * s)
+    second = step(2 * m, 4 * m / s, 0.5 * s)
+    assert first == 2 * m
+    assert second == 4 * m
+    assert isinstance(second, Quantity)
+    assert calls == [(Quantity,) * 3, (float,) * 3]
+
+
+def test_trace_checks_units():
+    step = misu.jit(lambda x, v: x + v)
+    with pytest.raises(EIncompatibleUnits):
+        step(1 * m, 1 * m / s)
+    # A failed trace is not cached.
+    with pytest.raises(EIncompatibleUnits):
+        step(1 * m, 1 * m / s)
+
+
+def test_new_dimensions_retrace():
+    calls, double = _recording(lambda x: 2 * x)
+    double(1 * m)
+    assert double(1 * kg) == 2 * kg
+    assert calls == [(Quantity,), (Quantity,)]
+
+
+def test_tuple_and_array_results():
+    @misu.jit
+    def split(x, t):
+        return x / t, x * 2
+
+    x = np.array([2.0, 4.0]) * m
+    split(x, 2 * s)
+    v, d = split(x, 2 * s)
+    assert isinstance(v, QuantityNP)
+    assert list(v.magnitude) == [1.0, 2.0]
+    assert v.unit_as_tuple() == (m / s).unit_as_tuple()
+    assert list(d.magnitude) == [4.0, 8.0]
+
+
+def test_internal_unit_literals_fall_back_to_units():
+    calls, offset = _recording(lambda x: x + 1.0 * m)
+    assert offset(1 * m) == 2 * m
+    assert offset(2 * m) == 3 * m
+    assert offset(3 * m) == 4 * m
+    # Trace, failed float attempt, then straight to units from then on.
+    assert calls == [(Quantity,), (float,), (Quantity,), (Quantity,)]
+
+
+def test_quantity_api_falls_back_to_units():
+    # float has no .magnitude, so the erased run raises AttributeError.
+    calls, speed = _recording(lambda x, t: x.magnitude / t.magnitude)
+    assert speed(4 * m, 2 * s) == 2.0
+    assert speed(6 * m, 2 * s) == 3.0
+    assert speed(8 * m, 2 * s) == 4.0
+    assert calls == [(Quantity,) * 2, (float,) * 2, (Quantity,) * 2,
+                     (Quantity,) * 2]
+
+
+def test_dimensions_helpers_fall_back_to_units():
+    @misu.dimensions(x='Length')
+    def checked(x):
+        return x * 2
+
+    double = misu.jit(checked)
+    double(1 * m)
+    # The helper's AssertionError on a float is not the caller's error.
+    assert double(3 * m) == 6 * m
+
+
+def test_non_quantity_arguments_pass_through():
+    @misu.jit
+    def scale(x, n):
+        return x * n
+
+    scale(1 * m, 3)
+    assert scale(2 * m, 3) == 6 * m
@@ -0,0 +1,86 @@
+"""Tests for lazily evaluated, fused QuantityNP expressions."""
+import numpy as np
+import pytest
+
+from misu import (
+    EIncompatibleUnits,
+    LazyQuantityNP,
+    QuantityNP,
+    kg,
+    lazy,
+    m,
+    s,
+)
+
+
+def test_expression_matches_eager_result():
+    rho = np.linspace(1.0, 2.0, 1000) * kg / m**3
+    v = np.linspace(0.0, 10.0, 1000) * m / s
+    area = 2.0 * m**2
+    eager = 0.5 * rho * v**2 * area
+    fused = (0.5 * lazy(rho) * lazy(v) ** 2 * area).evaluate()
+    assert isinstance(fused, QuantityNP)
+    np.testing.assert_allclose(fused.magnitude, eager.magnitude)
+    assert fused.unit_as_tuple() == eager.unit_as_tuple()
+
+
+def test_operators_build_nodes_until_evaluated():
+    x = lazy(np.array([1.0, 2.0, 3.0]) * m)
+    y = -(x - 1 * m) / (2 * s)
+    assert isinstance(y, LazyQuantityNP)
+    assert list(y.magnitude) == [0.0, -0.5, -1.0]
+    assert y.unit_as_tuple() == (m / s).unit_as_tuple()
+
+
+def test_dimensions_checked_at_build_time():
+    x = lazy(np.array([1.0, 2.0]) * m)
+    with pytest.raises(EIncompatibleUnits):
+        x + 1 * s
+    with pytest.raises(EIncompatibleUnits):
+        x.exp()
+
+
+def test_mixed_with_eager_arrays_and_spans_blocks():
+    n = 1000  # larger than one evaluation block
+    a = np.arange(n, dtype=float) * m
+    b = lazy(a) * a + a * (1 * m)
+    np.testing.assert_allclose(b.evaluate().magnitude, np.arange(n) ** 2 + np.arange(n))
+
+
+def test_length_mismatch_raises():
+    x = lazy(np.array([1.0, 2.0]) * m)
+    y = np.array([1.0, 2.0, 3.0]) * m
+    with pytest.raises(ValueError):
+        (x + y).evaluate()
+
+
+def test_convert_materialises():
+    x = lazy(np.array([1000.0, 2000.0]) * m) * 1.0
+    np.testing.assert_allclose(x >> m, [1000.0, 2000.0])
+    assert len(x) == 2
+
+
+def test_repr_and_shape_do_not_evaluate():
+    grid = lazy(np.arange(12.0).reshape(3, 4) * m)
+    row = np.arange(4.0) * m
+    expr = (grid * row / (2 * m * m)).sin() ** 2 - 1
+    assert repr(expr) == (
+        "LazyQuantityNP((sin((array[3, 4] * array[4]) / 2.0) ** 2.0) - 1.0, "
+        "unit='dimensionless')"
+    )
+    assert expr.shape == (3, 4)
+    assert len(expr) == 3
+    assert "m^1.0" in repr(grid)
+    # A shape mismatch is found without running the kernel.
+    with pytest.raises(ValueError):
+        len(grid + np.zeros(5) * m)
+
+
+def test_broadcasts_2d_grids():
+    grid = np.arange(12.0).reshape(3, 4) * m
+    row = np.arange(4.0) * m
+    out = (lazy(grid) * row + grid * (1 * m)).evaluate()
+    assert out.shape == (3, 4)
+    np.testing.assert_allclose(
+        out.magnitude, grid.magnitude * row.magnitude + grid.magnitude
+    )
@@ -393,3 +393,66 @@ def test_scalar_q_times_ndarray_q():
     arr = np.array([1, 2, 3]) * s
     out = (4 * kg) * arr
     assert list(out.magnitude) == [4.0, 8.0, 12.0]
+
+
+# --- Dimension exponents (packed and interned forms) ------------------------
+
+def test_fractional_exponent_round_trip():
+    q = kg ** 0.5 * m ** -0.25
+    assert q.unit_as_tuple()[:2] == (-0.25, 0.5)
+    assert kg ** 0.5 * kg ** 0.5 == 1 * kg
+
+
+def test_negative_power_matches_reciprocal():
+    # -0.0 exponents from `** -1` compare equal to the 0.0 from division.
+    assert m ** -1 == 1 / m
+
+
+def test_unpackable_exponents_are_interned():
+    third = m ** (1 / 3)
+    assert third.unit_as_tuple()[0] == 1 / 3
+    assert third == m ** (1 / 3)
+    big = m ** 100
+    assert big.unit_as_tuple()[0] == 100.0
+    assert big / m ** 99 == 1 * m
+    assert hash(big / m ** 99) == hash(1 * m)
+
+
+# --- Quantity free-list -----------------------------------------------------
+
+def test_freelist_capacity_is_exposed():
+    from misu import _engine
+    assert _engine.QUANTITY_FREELIST_CAPACITY > 0
+
+
+def test_recycled_quantities_keep_their_values():
+    # Churn through far more short-lived results than the free-list holds,
+    # keeping some alive, and check nothing recycled leaks its old state.
+    from misu import _engine
+    kept = []
+    v = 0 * m / s
+    for i in range(4 * _engine.QUANTITY_FREELIST_CAPACITY):
+        v = v + 1 * m / s
+        if i % 100 == 0:
+            kept.append(v)
+    assert v == 4 * _engine.QUANTITY_FREELIST_CAPACITY * m / s
+    assert [q.magnitude for q in kept] == [i + 1.0 for i in range(0, len(kept) * 100, 100)]
+    assert all(q.unit_as_tuple() == (m / s).unit_as_tuple() for q in kept)
+
+
+# --- Operand dispatch -------------------------------------------------------
+
+def test_mul_by_numpy_scalar():
+    q = kg * np.float32(2.0)
+    assert q.magnitude == 2.0
+    assert q.unit_as_tuple() == kg.unit_as_tuple()
+
+
+def test_mul_by_int_and_bool():
+    assert (kg * 3).magnitude == 3.0
+    assert (kg * True).magnitude == 1.0
+
+
+def test_scalar_compare_against_array_defers_to_array():
+    arr = np.array([1.0, 3.0]) * kg
+    assert list(2 * kg < arr) == [False, True]
@@ -26,3 +26,92 @@ def test_sin_1():
 def test_sin_2():
     assert np.sin(c/b).magnitude == np.sin(c_m/b_m)
 
+
+def test_ufunc_arithmetic_units():
+    assert (np.multiply(a, b)).unit_as_tuple() == (m * m).unit_as_tuple()
+    assert np.allclose(np.add(a, b).magnitude, a_m + b_m)
+    assert np.sqrt(a * a).unit_as_tuple() == m.unit_as_tuple()
+    assert np.power(a, 3).unit_as_tuple() == (m * m * m).unit_as_tuple()
+
+def test_ufunc_ndarray_left_operand():
+    r = a_m * b
+    assert type(r) == QuantityNP
+    assert np.allclose(r.magnitude, a_m * b_m)
+
+def test_ufunc_incompatible_units():
+    import pytest
+    from misu import EIncompatibleUnits, s
+    with pytest.raises(EIncompatibleUnits):
+        np.add(a, 1 * s)
+    with pytest.raises(EIncompatibleUnits):
+        np.sin(a)
+
+def test_ufunc_out_and_where():
+    out = a / b
+    np.sin(a / b, out=out)
+    assert np.allclose(out.magnitude, np.sin(a_m / b_m))
+    dest = np.zeros_like(a_m) * m
+    np.maximum(a, b, out=dest, where=a_m > 1.5)
+    assert dest.unit_as_tuple() == m.unit_as_tuple()
+    assert np.allclose(dest.magnitude, np.where(a_m > 1.5, 3.0, 0.0))
+
+def test_ufunc_unitless_results():
+    assert np.isfinite(a).dtype == bool
+    assert np.less(a, 1.5 * m, where=True).tolist() == (a_m < 1.5).tolist()
+
+def test_array_function_concatenate_and_stack():
+    joined = np.concatenate([a, a * 2])
+    assert type(joined) == QuantityNP
+    assert joined.unit_as_tuple() == m.unit_as_tuple()
+    assert np.allclose(joined.magnitude, np.concatenate([a_m, 2 * a_m]))
+    assert np.stack([a, a]).shape == (2, len(a_m))
+
+def test_array_function_where_clip_full_like():
+    mask = a_m > 1.5
+    picked = np.where(mask, a, a * 0)
+    assert np.allclose(picked.magnitude, np.where(mask, a_m, 0.0))
+    clipped = np.clip(a, 1.2 * m, 1.8 * m)
+    assert np.allclose(clipped.magnitude, np.clip(a_m, 1.2, 1.8))
+    filled = np.full_like(a, 3 * m)
+    assert filled.unit_as_tuple() == m.unit_as_tuple()
+    assert np.allclose(filled.magnitude, 3.0)
+
+def test_array_function_mixed_with_ndarray():
+    import pytest
+    from misu import EIncompatibleUnits
+    ratio = a / b
+    ratio_m = a_m / b_m
+    zeros = np.zeros_like(a_m)
+    picked = np.where(a > 1.5 * m, ratio, zeros)
+    assert type(picked) == QuantityNP
+    assert np.allclose(picked.magnitude, np.where(a_m > 1.5, ratio_m, 0.0))
+    joined = np.concatenate([ratio, a_m])
+    assert np.allclose(joined.magnitude, np.concatenate([ratio_m, a_m]))
+    appended = np.append(ratio, zeros)
+    assert np.allclose(appended.magnitude, np.append(ratio_m, zeros))
+    clipped = np.clip(ratio, np.full_like(a_m, 0.4), 0.6)
+    assert np.allclose(clipped.magnitude, np.clip(ratio_m, 0.4, 0.6))
+    filled = np.full_like(a_m, 3 * m)
+    assert type(filled) == QuantityNP
+    assert filled.unit_as_tuple() == m.unit_as_tuple()
+    assert np.isclose(ratio, ratio_m).all()
+    assert np.searchsorted(ratio, np.array([0.5])).tolist() == np.searchsorted(ratio_m, [0.5]).tolist()
+    with pytest.raises(EIncompatibleUnits):
+        np.concatenate([a, a_m])
+    with pytest.raises(EIncompatibleUnits):
+        np.where(a_m > 1.5, a, zeros)
+    with pytest.raises(EIncompatibleUnits):
+        np.clip(a, np.full_like(a_m, 1.2), 1.8 * m)
+
+def test_array_function_linspace():
+    line = np.linspace(0 * m, 1 * m, 5)
+    assert type(line) == QuantityNP
+    assert np.allclose(line.magnitude, np.linspace(0, 1, 5))
+
+def test_array_function_incompatible_units():
+    import pytest
+    from misu import EIncompatibleUnits, s
+    with pytest.raises(EIncompatibleUnits):
+        np.concatenate([a, a_m * s])
+    with pytest.raises(EIncompatibleUnits):
+        np.clip(a, 1 * s, 2 * s)
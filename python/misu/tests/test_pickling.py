@@ -16,3 +16,12 @@ def test_pickle_np():
     pick = pickle.dumps(var)
     res = pickle.loads(pick)
     assert (var[0]==res[0] and var[1]==res[1])
+
+def test_pickle_np_float32_and_fixed():
+    var = np.array([2.5, 4], dtype=np.float32) * kg / s
+    res = pickle.loads(pickle.dumps(var))
+    assert res.dtype == np.float32
+    fixed = var.to_fixed(0.5 * kg / s)
+    res = pickle.loads(pickle.dumps(fixed))
+    assert res.quantum == fixed.quantum
+    assert res.magnitude.tolist() == [2.5, 4.0]
@@ -12,8 +12,10 @@ import pytest
 
 from misu import (
     EIncompatibleUnits,
+    J,
     Quantity,
     QuantityNP,
+    W,
     dimensionless,
     kg,
     lb,
@@ -34,6 +36,31 @@ def test_constructor_from_array():
     assert list(qnp.magnitude) == [1.0, 2.0, 3.0]
 
 
+def test_from_quantities():
+    x = QuantityNP.from_quantities([1 * m, 2 * m, 3 * m])
+    assert x.magnitude.tolist() == [1.0, 2.0, 3.0]
+    assert x.unit_as_tuple() == m.unit_as_tuple()
+    gen = QuantityNP.from_quantities(q * m for q in (4.0, 5.0))
+    assert gen.magnitude.tolist() == [4.0, 5.0]
+    empty = QuantityNP.from_quantities([], unit=m)
+    assert len(empty) == 0 and empty.unit_as_tuple() == m.unit_as_tuple()
+    with pytest.raises(EIncompatibleUnits, match="index 1"):
+        QuantityNP.from_quantities([1 * m, 1 * s])
+    with pytest.raises(EIncompatibleUnits):
+        QuantityNP.from_quantities([1 * s], unit=m)
+    with pytest.raises(TypeError):
+        QuantityNP.from_quantities([1 * m, "2 m"])
+
+
+def test_from_values():
+    x = QuantityNP.from_values((v for v in range(3)), 1000 * m)
+    assert x.magnitude.tolist() == [0.0, 1000.0, 2000.0]
+    assert x.unit_as_tuple() == m.unit_as_tuple()
+    y = QuantityNP.from_values(np.asarray([1.0, 2.0], dtype=np.float32), 2 * s)
+    assert y.dtype == np.float32
+    assert y.magnitude.tolist() == [2.0, 4.0]
+
+
 def test_unit_as_tuple():
     x = _arr([1, 2])
     t = x.unit_as_tuple()
@@ -136,12 +163,13 @@ def test_pow():
         ("ge", lambda a, b: a >= b),
     ],
 )
-def test_richcmp_same_dims_returns_per_element_list(op_name, op):
+def test_richcmp_same_dims_returns_bool_array(op_name, op):
     x = _arr([1.0, 2.0, 3.0])
     y = _arr([2.0, 2.0, 2.0])
     result = op(x, y)
-    assert isinstance(result, list)
-    assert len(result) == 3
+    assert isinstance(result, np.ndarray)
+    assert result.dtype == np.bool_
+    assert result.tolist() == op(x.magnitude, y.magnitude).tolist()
 
 
 def test_eq_across_incompatible_dims_returns_false():
@@ -158,6 +186,35 @@ def test_lt_across_incompatible_dims_raises():
         x < y
 
 
+def test_isclose_with_quantity_tolerance():
+    x = np.asarray([1.0, 2.0, 3.0]) * m
+    y = np.asarray([1.0005, 2.1, np.nan]) * m
+    assert x.isclose(y, atol=1 * m / 1000).tolist() == [True, False, False]
+    assert x.isclose(y, rtol=0.1).tolist() == [True, True, False]
+    assert x.isclose(x, rtol=0).all()
+    assert not x.allclose(y, atol=1 * m / 1000)
+    assert x.allclose(x + 1e-9 * m, atol=1e-6 * m)
+    nan = np.asarray([np.nan]) * m
+    assert nan.allclose(nan, equal_nan=True)
+    assert np.isclose(x, y, atol=1 * m / 1000).tolist() == [True, False, False]
+    assert np.allclose(x, x + 1e-9 * m, atol=1e-6 * m)
+    assert np.isclose(1 * m, 1.0000001 * m, rtol=1e-6)
+
+
+def test_isclose_checks_units():
+    x = np.asarray([1.0, 2.0]) * m
+    with pytest.raises(EIncompatibleUnits):
+        x.isclose(x.magnitude * s)
+    with pytest.raises(EIncompatibleUnits):
+        x.isclose(x, atol=1 * s)
+    with pytest.raises(EIncompatibleUnits):
+        x.isclose(x, atol=0.001)
+    # Dimensionless arrays take a bare number, and numpy's default atol.
+    d = QuantityNP(np.asarray([0.0]))
+    assert d.isclose(np.asarray([1e-9])).tolist() == [True]
+    assert d.isclose(np.asarray([1e-3]), atol=0.01).tolist() == [True]
+
+
 # --- conversion / unitCategory / setRepresent -----------------------------
 
 def test_convert_via_rshift():
@@ -245,13 +302,61 @@ def test_repr_round_trip():
     assert "kg" in repr(x)
 
 
-# --- broadcast / length-mismatch ------------------------------------------
+# --- N-D arrays & broadcasting ---------------------------------------------
 
-def test_length_mismatch_returns_nan_array():
+def test_length_mismatch_raises():
     x = _arr([1, 2])
     y = _arr([1, 2, 3])
-    out = x + y
-    assert all(math.isnan(v) for v in out.magnitude.tolist())
+    with pytest.raises(ValueError, match="broadcast"):
+        x + y
+
+
+def test_2d_shape_accessors():
+    x = np.arange(6.0).reshape(2, 3) * m
+    assert x.shape == (2, 3)
+    assert x.ndim == 2
+    assert x.size == 6
+    assert len(x) == 2
+    assert x.reshape(3, 2).shape == (3, 2)
+
+
+def test_broadcast_row_against_column():
+    col = np.asarray([[1.0], [2.0], [3.0]]) * m
+    row = np.asarray([10.0, 20.0]) * m
+    out = col + row
+    assert out.shape == (3, 2)
+    assert out.magnitude.tolist() == [[11.0, 21.0], [12.0, 22.0], [13.0, 23.0]]
+    assert (col * row).unit_as_tuple() == (m * m).unit_as_tuple()
+
+
+def test_strided_view_is_not_copied():
+    a = np.arange(6.0).reshape(2, 3)
+    t = a.T
+    x = QuantityNP(t)
+    assert x.magnitude is t
+    assert (x * 2.0).magnitude.tolist() == (t * 2.0).tolist()
+
+
+def test_2d_getitem_row_and_element():
+    x = np.arange(6.0).reshape(2, 3) * kg
+    row = x[1]
+    assert isinstance(row, QuantityNP)
+    assert row.magnitude.tolist() == [3.0, 4.0, 5.0]
+    assert isinstance(x[1, 2], Quantity)
+    assert x[1, 2] == 5 * kg
+
+
+def test_2d_richcmp_returns_nested_lists():
+    x = np.asarray([[1.0, 2.0], [3.0, 4.0]]) * m
+    assert (x > 2.5 * m) == [[False, False], [True, True]]
+
+
+def test_iadd_broadcasts_row_into_2d_buffer():
+    x = np.zeros((2, 2)) * m
+    x += np.asarray([1.0, 2.0]) * m
+    assert x.magnitude.tolist() == [[1.0, 2.0], [1.0, 2.0]]
+    with pytest.raises(ValueError):
+        x += np.zeros((3, 2)) * m
 
 
 # --- __getitem__ ----------------------------------------------------------
@@ -267,3 +372,528 @@ def test_getitem_out_of_range_raises():
     x = _arr([10, 20])
     with pytest.raises(IndexError):
         x[5]
+
+
+def test_getitem_boolean_mask():
+    readings = np.asarray([[1.0, 5.0], [7.0, 2.0]]) * m
+    high = readings[readings > 3 * m]
+    assert isinstance(high, QuantityNP)
+    assert high.magnitude.tolist() == [5.0, 7.0]
+    assert high.unit_as_tuple() == readings.unit_as_tuple()
+    strided = np.transpose(readings)
+    assert strided[strided > 3 * m].magnitude.tolist() == [7.0, 5.0]
+    f32 = np.asarray([1, 2, 3], dtype=np.float32) * m
+    assert f32[f32 > 1 * m].dtype == np.float32
+
+
+def test_getitem_integer_index_array():
+    x = _arr([10, 20, 30])
+    picked = x[np.asarray([2, 0, -1])]
+    assert picked.magnitude.tolist() == [30.0, 10.0, 30.0]
+    rows = (np.arange(6.0).reshape(3, 2) * m)[np.asarray([1])]
+    assert rows.magnitude.tolist() == [[2.0, 3.0]]
+    with pytest.raises(IndexError):
+        x[np.asarray([3])]
+
+
+@pytest.mark.parametrize(
+    "index",
+    [
+        slice(1, 4),
+        slice(None, None, -1),
+        slice(5, 1, -2),
+        slice(-3, None),
+        slice(4, 2),
+        slice(None, None, 3),
+        (slice(None), slice(1, None, 2)),
+        (slice(None, None, -1), slice(None, None, -2)),
+    ],
+)
+def test_slices_are_views(index):
+    a = np.arange(24.0).reshape(6, 4)
+    x = a * m
+    part = x[index]
+    assert isinstance(part, QuantityNP)
+    assert part.magnitude.tolist() == x.magnitude[index].tolist()
+    assert np.shares_memory(part.magnitude, x.magnitude) or part.magnitude.size == 0
+
+
+def test_views_write_through_and_copies_do_not():
+    x = np.zeros(6) * m
+    every_other = x[::2]
+    every_other += 1 * m
+    assert x.magnitude.tolist() == [1.0, 0.0, 1.0, 0.0, 1.0, 0.0]
+    v = x.view()
+    v += 1 * m
+    assert x.magnitude.tolist()[:2] == [2.0, 1.0]
+    c = x.copy()
+    c += 1 * m
+    assert x.magnitude.tolist()[:2] == [2.0, 1.0]
+    assert every_other.base is x.magnitude
+    assert v.base is x.magnitude
+    assert c.base is None
+
+
+def test_views_refuse_in_place_unit_changes():
+    x = np.arange(4.0) * m
+    v = x[0:2]
+    with pytest.raises(ValueError):
+        v *= 2 * s
+    with pytest.raises(ValueError):
+        x /= 2 * s
+    with pytest.raises(ValueError):
+        np.multiply(v, 2 * s, out=v)
+    with pytest.raises(ValueError):
+        x.view().multiply(2 * s, out=x)
+    assert x.magnitude.tolist() == [0.0, 1.0, 2.0, 3.0]
+    assert x.unit_as_tuple() == m.unit_as_tuple()
+    # Unit-preserving writes still go through, and copies are free.
+    v *= 2
+    assert x.magnitude.tolist() == [0.0, 2.0, 2.0, 3.0]
+    c = x.copy()
+    c *= 2 * s
+    assert c.unit_as_tuple() == (m * s).unit_as_tuple()
+
+
+def test_arrays_built_from_numpy_views_own_their_units():
+    # The ndarrays have a numpy base, but no other QuantityNP shares them.
+    for raw in (np.arange(12.0).reshape(3, 4), np.linspace(0.0, 1.0, 10)):
+        x = QuantityNP(raw)
+        x *= 2 * s
+        assert x.unit_as_tuple() == s.unit_as_tuple()
+
+
+def test_numpy_view_functions_share_units():
+    x = np.arange(6.0) * m
+    r = np.reshape(x, (2, 3))
+    t = np.transpose(r)
+    with pytest.raises(ValueError):
+        r *= 2 * s
+    with pytest.raises(ValueError):
+        x *= 2 * s
+    # np.copy makes its own buffer.
+    c = np.copy(x)
+    c *= 2 * s
+    assert c.unit_as_tuple() == (m * s).unit_as_tuple()
+    # Once the views are gone the units can change again.
+    del r, t
+    x *= 2 * s
+    assert x.unit_as_tuple() == (m * s).unit_as_tuple()
+
+
+def test_slice_of_read_only_array_stays_read_only():
+    frozen = np.arange(4.0)
+    frozen.flags.writeable = False
+    part = QuantityNP(frozen)[1:]
+    assert not part.magnitude.flags.writeable
+
+
+# --- iteration & lists ------------------------------------------------------
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_iter_yields_quantity_scalars(dtype):
+    x = np.asarray([1.0, 2.0, 3.0], dtype=dtype) * m
+    items = list(x)
+    assert all(type(q) is Quantity for q in items)
+    assert [q.magnitude for q in items] == [1.0, 2.0, 3.0]
+    assert all(q.unit_as_tuple() == m.unit_as_tuple() for q in items)
+
+
+def test_iter_sees_writes_and_walks_rows():
+    x = _arr([1.0, 2.0, 3.0])
+    it = iter(x)
+    next(it)
+    x.magnitude[1] = 20.0
+    assert next(it).magnitude == 20.0
+    rows = list(_arr([[1.0, 2.0], [3.0, 4.0]]))
+    assert [r.magnitude.tolist() for r in rows] == [[1.0, 2.0], [3.0, 4.0]]
+    with pytest.raises(TypeError):
+        iter(QuantityNP(np.asarray(1.0)))
+
+
+def test_iter_fixed_point():
+    f = (np.asarray([1.0, 2.5, -0.5]) * m).to_fixed(0.5 * m, dtype=np.int16)
+    items = list(f)
+    assert [q.magnitude for q in items] == [1.0, 2.5, -0.5]
+    assert all(q.unit_as_tuple() == m.unit_as_tuple() for q in items)
+
+
+def test_tolist_and_to_quantities():
+    x = _arr([[1.0, 2.0], [3.0, 4.0]])
+    nested = x.tolist()
+    assert [[q.magnitude for q in row] for row in nested] == [[1.0, 2.0], [3.0, 4.0]]
+    assert nested[1][0].unit_as_tuple() == kg.unit_as_tuple()
+    flat = np.transpose(x).to_quantities()
+    assert [q.magnitude for q in flat] == [1.0, 3.0, 2.0, 4.0]
+    assert QuantityNP(np.asarray(5.0)).tolist().magnitude == 5.0
+    with pytest.raises(TypeError):
+        QuantityNP(np.asarray([1j])).tolist()
+
+
+# --- scalar kernels ---------------------------------------------------------
+
+def test_array_op_scalar_quantity():
+    x = np.asarray([2.0, 4.0]) * m
+    out = x / (2 * s)
+    assert list(out.magnitude) == [1.0, 2.0]
+    assert out.unit_as_tuple() == (m / s).unit_as_tuple()
+
+
+def test_scalar_float_op_array_orientation():
+    x = QuantityNP(np.asarray([1.0, 4.0]))
+    assert list((1.0 - x).magnitude) == [0.0, -3.0]
+    assert list((8.0 / x).magnitude) == [8.0, 2.0]
+    assert list((x - 1.0).magnitude) == [0.0, 3.0]
+
+
+def test_scalar_quantity_op_array_incompatible_units_raises():
+    x = _arr([1.0, 2.0])
+    with pytest.raises(EIncompatibleUnits):
+        (1 * s) + x
+    with pytest.raises(EIncompatibleUnits):
+        x - 1.0
+
+
+# --- in-place operators & out= ----------------------------------------------
+
+def test_iadd_writes_into_existing_buffer():
+    x = np.asarray([1.0, 2.0]) * m
+    buf = x.magnitude
+    x += np.asarray([0.5, 0.5]) * m
+    assert buf.tolist() == [1.5, 2.5]
+    x -= 1 * m
+    assert x.magnitude is buf
+    assert buf.tolist() == [0.5, 1.5]
+
+
+def test_iadd_self_alias():
+    x = np.asarray([1.0, 2.0]) * m
+    x += x
+    assert x.magnitude.tolist() == [2.0, 4.0]
+
+
+def test_imul_itruediv_update_units():
+    x = np.asarray([2.0, 4.0]) * m
+    buf = x.magnitude
+    x /= 2 * s
+    assert x.magnitude is buf
+    assert buf.tolist() == [1.0, 2.0]
+    assert x.unit_as_tuple() == (m / s).unit_as_tuple()
+    x *= 3.0
+    assert buf.tolist() == [3.0, 6.0]
+
+
+def test_iadd_incompatible_units_leaves_buffer_untouched():
+    x = np.asarray([1.0, 2.0]) * m
+    with pytest.raises(EIncompatibleUnits):
+        x += 1 * s
+    assert x.magnitude.tolist() == [1.0, 2.0]
+
+
+def test_iadd_unsupported_operand_raises():
+    x = np.asarray([1.0]) * m
+    with pytest.raises(TypeError):
+        x += "a"
+
+
+def test_named_ops_with_out():
+    x = np.asarray([1.0, 2.0]) * m
+    v = np.asarray([3.0, 4.0]) * (m / s)
+    out = np.zeros(2) * m
+    buf = out.magnitude
+    result = x.add(v.multiply(2 * s), out=out)
+    assert result is out
+    assert buf.tolist() == [7.0, 10.0]
+    x.divide(1 * s, out=out)
+    assert out.unit_as_tuple() == (m / s).unit_as_tuple()
+    assert x.subtract(x).magnitude.tolist() == [0.0, 0.0]
+
+
+def test_named_op_out_length_mismatch_raises():
+    x = np.asarray([1.0, 2.0]) * m
+    with pytest.raises(ValueError):
+        x.add(x, out=np.zeros(3) * m)
+
+
+def test_convert_with_out():
+    x = np.asarray([1000.0, 2000.0]) * m
+    out = np.empty(2)
+    assert x.convert(1000 * m, out=out) is out
+    assert out.tolist() == [1.0, 2.0]
+
+
+def test_math_fn_with_out():
+    x = QuantityNP(np.asarray([0.0, 1.0]))
+    buf = x.magnitude
+    assert x.exp(out=x) is x
+    assert x.magnitude is buf
+    assert buf.tolist() == [1.0, math.e]
+
+
+# --- dtypes -------------------------------------------------------------------
+
+def test_float32_is_kept_without_copy():
+    raw = np.ones(3, dtype=np.float32)
+    x = QuantityNP(raw)
+    assert x.magnitude is raw
+    assert x.dtype == np.float32
+    assert (x * 2.0 * m).dtype == np.float32
+    assert (x + x).dtype == np.float32
+
+
+def test_mixed_dtype_arithmetic_promotes():
+    x32 = np.ones(2, dtype=np.float32) * m
+    x64 = np.ones(2) * m
+    assert (x32 + x64).dtype == np.float64
+    z64 = np.ones(2, dtype=np.complex64) * m
+    assert (x32 * z64).dtype == np.complex64
+    assert (x64 * z64).dtype == np.complex128
+
+
+def test_complex_arithmetic_and_restrictions():
+    z = np.asarray([1 + 1j, 2 - 1j]) * m
+    assert (z * 1j).magnitude.tolist() == [-1 + 1j, 1 + 2j]
+    assert (z == z).tolist() == [True, True]
+    with pytest.raises(TypeError):
+        z < z
+    with pytest.raises(TypeError):
+        QuantityNP(np.asarray([1j])).exp()
+    real = np.zeros(2) * m
+    with pytest.raises(TypeError):
+        real += z
+
+
+def test_inplace_float32_stays_float32():
+    x = np.zeros(2, dtype=np.float32) * m
+    x += np.asarray([1.5, 2.5]) * m
+    assert x.dtype == np.float32
+    assert x.magnitude.tolist() == [1.5, 2.5]
+
+
+def test_astype():
+    x = np.asarray([1.0, 2.0]) * m
+    assert x.astype(np.float32).dtype == np.float32
+    with pytest.raises(TypeError):
+        x.astype(np.int32)
+
+
+def test_fixed_point_round_trip():
+    mm = 1e-3 * m
+    x = np.asarray([1.2344, 2.5]) * m
+    f = x.to_fixed(mm, dtype=np.int16)
+    assert f.dtype == np.int16
+    assert f.quantum == mm
+    np.testing.assert_allclose(f.magnitude, [1.234, 2.5])
+    assert f[1] == 2.5 * m
+    assert (f + x).dtype == np.float64
+
+
+def test_fixed_point_overflow_and_readonly():
+    x = np.asarray([2.5]) * m
+    with pytest.raises(OverflowError):
+        x.to_fixed(1e-3 * m, dtype=np.int8)
+    f = x.to_fixed(1e-3 * m)
+    with pytest.raises(TypeError):
+        f += x
+    with pytest.raises(EIncompatibleUnits):
+        x.to_fixed(1 * s)
+
+
+# --- reductions --------------------------------------------------------------
+
+
+def test_reductions_return_quantities():
+    x = np.asarray([1.0, 4.0, 2.0, 3.0]) * m
+    assert x.sum() == 10 * m
+    assert x.mean() == 2.5 * m
+    assert x.min() == 1 * m
+    assert x.max() == 4 * m
+    assert x.ptp() == 3 * m
+    assert x.argmin() == 0
+    assert x.argmax() == 1
+    assert x.var() == 1.25 * m * m
+    assert math.isclose(x.std(ddof=1).magnitude, np.std([1, 4, 2, 3], ddof=1))
+    assert math.isclose(x.norm().magnitude, math.sqrt(30))
+
+
+def test_reductions_nan_variants():
+    x = np.asarray([1.0, np.nan, 3.0]) * s
+    assert math.isnan(x.sum().magnitude)
+    assert math.isnan(x.max().magnitude)
+    assert x.argmax() == 1
+    assert x.nansum() == 4 * s
+    assert x.nanmean() == 2 * s
+    assert x.nanmax() == 3 * s
+    assert x.nanargmin() == 0
+    with pytest.raises(ValueError):
+        (np.asarray([np.nan]) * s).nanargmax()
+
+
+def test_reductions_compensated_and_strided():
+    x = np.full(100_001, 0.1, dtype=np.float32) * m
+    assert math.isclose(x.sum().magnitude, 100_001 * float(np.float32(0.1)), rel_tol=1e-12)
+    grid = np.arange(12.0).reshape(3, 4) * m
+    assert grid[:, 1].sum() == (1 + 5 + 9) * m
+    with pytest.raises(ValueError):
+        (np.asarray([]) * m).min()
+
+
+def test_numpy_reductions_dispatch():
+    grid = np.arange(6.0).reshape(2, 3) * m
+    assert np.sum(grid) == 15 * m
+    assert np.var(grid).unit_as_tuple() == (m * m).unit_as_tuple()
+    per_row = np.sum(grid, axis=1)
+    assert isinstance(per_row, QuantityNP)
+    assert per_row.magnitude.tolist() == [3.0, 12.0]
+    assert np.argmax(grid) == 5
+
+
+# --- calculus ----------------------------------------------------------------
+
+
+# np.trapz became np.trapezoid in numpy 2.0.
+_trapezoid = getattr(np, "trapezoid", None) or np.trapz
+
+
+def test_trapz_multiplies_dimensions():
+    power = np.asarray([1.0, 3.0, 2.0, 4.0]) * W
+    energy = power.trapz(dx=2 * s)
+    assert isinstance(energy, Quantity)
+    assert energy.unit_as_tuple() == J.unit_as_tuple()
+    assert energy.magnitude == _trapezoid([1.0, 3.0, 2.0, 4.0], dx=2.0)
+    t = np.asarray([0.0, 1.0, 3.0, 4.0]) * s
+    assert power.trapz(t).magnitude == _trapezoid([1.0, 3.0, 2.0, 4.0], [0.0, 1.0, 3.0, 4.0])
+    running = power.cumtrapz(t)
+    assert running.magnitude.tolist() == [2.0, 7.0, 10.0]
+    assert running.unit_as_tuple() == J.unit_as_tuple()
+    rows = np.asarray([[1.0, 1.0], [2.0, 4.0]]) * W
+    assert rows.trapz(dx=1 * s).magnitude.tolist() == [1.0, 3.0]
+    assert _trapezoid(power, dx=2 * s) == energy
+    with pytest.raises(ValueError):
+        power.trapz(np.asarray([0.0, 1.0]) * s)
+
+
+def test_gradient_divides_dimensions():
+    position = np.asarray([0.0, 1.0, 4.0, 9.0, 16.0]) * m
+    velocity = position.gradient(0.5 * s)
+    assert velocity.unit_as_tuple() == (m / s).unit_as_tuple()
+    np.testing.assert_allclose(velocity.magnitude, np.gradient(position.magnitude, 0.5))
+    t = np.asarray([0.0, 1.0, 1.5, 3.0, 4.0])
+    uneven = position.gradient(t * s)
+    np.testing.assert_allclose(uneven.magnitude, np.gradient(position.magnitude, t))
+    np.testing.assert_allclose(np.gradient(position, t * s).magnitude, uneven.magnitude)
+    with pytest.raises(ValueError):
+        (np.asarray([1.0]) * m).gradient()
+
+
+def test_diff_and_cumsum_keep_units():
+    x = np.asarray([1.0, 4.0, 9.0], dtype=np.float32) * m
+    d = x.diff()
+    assert d.dtype == np.float32
+    assert d.magnitude.tolist() == [3.0, 5.0]
+    assert x.cumsum().magnitude.tolist() == [1.0, 5.0, 14.0]
+    assert np.diff(x).unit_as_tuple() == m.unit_as_tuple()
+    grid = np.arange(6.0).reshape(2, 3) * s
+    assert grid.diff().magnitude.tolist() == [[1.0, 1.0], [1.0, 1.0]]
+    assert np.cumsum(grid).magnitude.tolist() == [0.0, 1.0, 3.0, 6.0, 10.0, 15.0]
+    assert np.diff(grid, axis=0).magnitude.tolist() == [[3.0, 3.0, 3.0]]
+
+
+# --- sorting & searching -----------------------------------------------------
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_sort_and_argsort(dtype):
+    values = np.asarray([[3.0, np.nan, 1.0], [2.0, 2.0, -1.0]], dtype=dtype)
+    x = values * m
+    order = x.argsort()
+    assert order.dtype == np.int64
+    assert order.tolist() == np.argsort(values, kind="stable").tolist()
+    x.sort()
+    np.testing.assert_array_equal(x.magnitude, np.sort(values))
+    assert x.unit_as_tuple() == m.unit_as_tuple()
+    column = (np.asarray([[3.0, 1.0], [1.0, 2.0], [2.0, 3.0]]) * m)[:, 0]
+    column.sort()
+    assert column.magnitude.tolist() == [1.0, 2.0, 3.0]
+
+
+def test_searchsorted_checks_units():
+    grid = np.asarray([0.0, 1.0, 1.0, 2.0]) * s
+    assert grid.searchsorted(1 * s) == 1
+    assert grid.searchsorted(1 * s, side="right") == 3
+    found = grid.searchsorted(np.asarray([[-1.0, 1.5], [5.0, np.nan]]) * s)
+    assert found.dtype == np.int64
+    assert found.tolist() == [[0, 3], [4, 4]]
+    assert np.searchsorted(grid, 1500 * s / 1000) == 3
+    with pytest.raises(EIncompatibleUnits):
+        grid.searchsorted(1 * m)
+    with pytest.raises(ValueError):
+        grid.searchsorted(1 * s, side="middle")
+
+
+def test_unique_and_digitize():
+    x = np.asarray([2.0, 1.0, np.nan, 2.0, np.nan]) * m
+    u = x.unique()
+    assert isinstance(u, QuantityNP)
+    np.testing.assert_array_equal(u.magnitude, [1.0, 2.0, np.nan])
+    values = np.asarray([0.5, 1.0, 2.5, 9.0])
+    rising = np.asarray([1.0, 2.0, 3.0])
+    for right in (False, True):
+        expected = np.digitize(values, rising, right=right).tolist()
+        assert (values * m).digitize(rising * m, right=right).tolist() == expected
+        expected = np.digitize(values, rising[::-1], right=right).tolist()
+        assert (values * m).digitize(rising[::-1] * m, right=right).tolist() == expected
+    assert np.digitize(1.5 * m, rising * m) == 1
+    with pytest.raises(ValueError):
+        (values * m).digitize(np.asarray([1.0, 3.0, 2.0]) * m)
+    with pytest.raises(EIncompatibleUnits):
+        (values * m).digitize(rising * s)
+
+
+def test_numpy_sort_functions_dispatch():
+    x = np.asarray([3.0, 1.0, 2.0]) * m
+    ordered = np.sort(x)
+    assert ordered.magnitude.tolist() == [1.0, 2.0, 3.0]
+    assert x.magnitude.tolist() == [3.0, 1.0, 2.0]
+    assert np.argsort(x).tolist() == [1, 2, 0]
+    values, counts = np.unique(x, return_counts=True)
+    assert values.unit_as_tuple() == m.unit_as_tuple()
+    assert counts.tolist() == [1, 1, 1]
+
+
+# --- multi-core kernels ------------------------------------------------------
+
+
+def test_set_num_threads():
+    import misu
+
+    before = misu.get_num_threads()
+    try:
+        misu.set_num_threads(3)
+        assert misu.get_num_threads() == 3
+        with pytest.raises(ValueError):
+            misu.set_num_threads(0)
+    finally:
+        misu.set_num_threads(before)
+
+
+def test_results_do_not_depend_on_thread_count():
+    import misu
+
+    rng = np.random.default_rng(0)
+    x = rng.random((300, 1000)) * m
+    y = rng.random(1000) * m
+    before = misu.get_num_threads()
+    try:
+        results = []
+        for n in (1, 4):
+            misu.set_num_threads(n)
+            out = np.empty((300, 1000)) * m
+            x.add(y, out=out)
+            results.append(
+                ((x * y).magnitude, (x / y).sin().magnitude, (x ** 2).magnitude, out.magnitude)
+            )
+        for single, multi in zip(*results):
+            assert np.array_equal(single, multi)
+    finally:
+        misu.set_num_threads(before)
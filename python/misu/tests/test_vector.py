@@ -0,0 +1,109 @@
+"""Tests for the fixed-size vector quantities QuantityVec2 and QuantityVec3."""
+import math
+import pickle
+
+import numpy as np
+import pytest
+
+from misu import (
+    EIncompatibleUnits,
+    Quantity,
+    QuantityVec2,
+    QuantityVec3,
+    km,
+    m,
+    s,
+)
+
+
+def test_construction_and_access():
+    r = QuantityVec3(1 * m, 2 * m, 3 * km)
+    assert r.magnitude == (1.0, 2.0, 3000.0)
+    assert r.unit_as_tuple() == m.unit_as_tuple()
+    assert isinstance(r.z, Quantity) and r.z.magnitude == 3000.0
+    assert len(r) == 3
+    assert r[-1].magnitude == 3000.0
+    assert [c.magnitude for c in r] == [1.0, 2.0, 3000.0]
+    with pytest.raises(IndexError):
+        r[3]
+    assert QuantityVec2.from_values([1.0, 2.0], 1 * km).magnitude == (1000.0, 2000.0)
+    assert QuantityVec2(1.0, 2).unit_as_tuple() == Quantity(1.0).unit_as_tuple()
+    with pytest.raises(EIncompatibleUnits):
+        QuantityVec2(1 * m, 1 * s)
+    with pytest.raises(TypeError):
+        QuantityVec3(1 * m, 2 * m)
+
+
+def test_arithmetic():
+    r = QuantityVec2(1 * m, 2 * m)
+    v = QuantityVec2(3 * m / s, 4 * m / s)
+    step = r + v * (2 * s)
+    assert isinstance(step, QuantityVec2)
+    assert step.magnitude == (7.0, 10.0)
+    assert step.unit_as_tuple() == m.unit_as_tuple()
+    assert (2 * s * v).magnitude == (6.0, 8.0)
+    assert (r - r).magnitude == (0.0, 0.0)
+    assert (v / (2 * s)).unit_as_tuple() == (m / s**2).unit_as_tuple()
+    assert (r * 0.5).magnitude == (0.5, 1.0)
+    assert (np.float64(2.0) * r).magnitude == (2.0, 4.0)
+    assert (-r).magnitude == (-1.0, -2.0)
+    with pytest.raises(EIncompatibleUnits):
+        r + v
+    with pytest.raises(TypeError):
+        r + QuantityVec3(1 * m, 2 * m, 3 * m)
+    with pytest.raises(TypeError):
+        r * r
+
+
+def test_dot_cross_norm():
+    a = QuantityVec3(1 * m, 0 * m, 0 * m)
+    b = QuantityVec3(0 * m, 2 * m, 0 * m)
+    assert a.dot(b).magnitude == 0.0
+    c = a.cross(b)
+    assert isinstance(c, QuantityVec3)
+    assert c.magnitude == (0.0, 0.0, 2.0)
+    assert c.unit_as_tuple() == (m * m).unit_as_tuple()
+    z = QuantityVec2(1 * m, 0 * m).cross(QuantityVec2(0 * m, 3 * m / s))
+    assert isinstance(z, Quantity) and z.magnitude == 3.0
+    v = QuantityVec2(3 * m, 4 * m)
+    assert v.norm().magnitude == 5.0
+    assert v.dot(v).magnitude == 25.0
+    unit = v.normalized()
+    assert unit.magnitude == (0.6, 0.8)
+    assert unit.unit_as_tuple() == Quantity(1.0).unit_as_tuple()
+    with pytest.raises(ValueError):
+        QuantityVec2(0 * m, 0 * m).normalized()
+
+
+def test_compare_convert_hash_pickle():
+    r = QuantityVec3(1 * km, 2 * km, 0 * km)
+    assert r == QuantityVec3(1000 * m, 2000 * m, 0 * m)
+    assert r != QuantityVec3(1 * m, 2 * m, 0 * m)
+    assert hash(r) == hash(QuantityVec3(1000 * m, 2000 * m, 0 * m))
+    assert r >> km == (1.0, 2.0, 0.0)
+    with pytest.raises(EIncompatibleUnits):
+        r.convert(1 * s)
+    assert pickle.loads(pickle.dumps(r)) == r
+    assert repr(r).startswith("QuantityVec3(")
+
+
+def test_signed_zeros_hash_alike():
+    a = QuantityVec2(0.0 * m, 1.0 * m)
+    b = QuantityVec2(-0.0 * m, 1.0 * m)
+    assert a == b
+    assert hash(a) == hash(b)
+    assert len({a, b}) == 1
+
+
+def test_orbit_step_matches_scalars():
+    r, v = QuantityVec2(1 * m, 0 * m), QuantityVec2(0 * m / s, 1 * m / s)
+    mu, dt = 1 * m**3 / s**2, 1e-3 * s
+    rx, ry, vx, vy = 1.0, 0.0, 0.0, 1.0
+    for _ in range(100):
+        d = r.norm()
+        v = v + r * (-mu / (d * d * d)) * dt
+        r = r + v * dt
+        d = math.hypot(rx, ry)
+        vx, vy = vx - rx / d**3 * 1e-3, vy - ry / d**3 * 1e-3
+        rx, ry = rx + vx * 1e-3, ry + vy * 1e-3
+    assert r.magnitude == pytest.approx((rx, ry), rel=1e-12)
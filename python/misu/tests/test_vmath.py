@@ -0,0 +1,94 @@
+"""Accuracy of the vectorised float64 math kernels against libm.
+
+sin, cos, exp, log, tanh and ``**`` on float64 QuantityNP run through
+polynomial kernels (rust/src/vmath.rs) instead of libm. Python's ``math``
+functions are libm, so they are the reference here. The allowed error is
+the documented bound plus one ulp, as libm itself is not exact.
+"""
+import math
+
+import numpy as np
+import pytest
+
+from misu import QuantityNP
+
+
+def _ulps(got, want):
+    """The error of each element in units in the last place of `want`."""
+    got, want = np.asarray(got), np.asarray(want)
+    same = (got == want) | (np.isnan(got) & np.isnan(want))
+    err = np.abs(got - want) / np.spacing(np.abs(want))
+    return np.where(same, 0.0, err)
+
+
+def _inputs(low, high, n=20000, log=False):
+    rng = np.random.default_rng(42)
+    if log:
+        return np.exp(rng.uniform(math.log(low), math.log(high), n))
+    return rng.uniform(low, high, n)
+
+
+_CASES = [
+    ("sin", math.sin, _inputs(-10, 10), 2),
+    ("sin", math.sin, _inputs(-8e5, 8e5), 2),
+    ("sin", math.sin, np.arange(1, 2000) * (math.pi / 2), 2),
+    ("cos", math.cos, _inputs(-10, 10), 2),
+    ("cos", math.cos, _inputs(-8e5, 8e5), 2),
+    ("cos", math.cos, np.arange(1, 2000) * (math.pi / 2), 2),
+    ("exp", math.exp, _inputs(-745, 709.7), 2),
+    ("exp", math.exp, _inputs(-1, 1), 2),
+    ("log", math.log, _inputs(1e-300, 1e300, log=True), 2),
+    ("log", math.log, _inputs(0.5, 2), 2),
+    ("log", math.log, _inputs(5e-324, 1e-308, log=True), 2),
+    ("tanh", math.tanh, _inputs(-1, 1), 3),
+    ("tanh", math.tanh, _inputs(-25, 25), 3),
+]
+
+
+@pytest.mark.parametrize("name, reference, x, bound", _CASES)
+def test_kernel_accuracy(name, reference, x, bound):
+    got = getattr(QuantityNP(x), name)().magnitude
+    want = [reference(v) for v in x]
+    assert _ulps(got, want).max() <= bound
+
+
+@pytest.mark.parametrize("exponent", [2.0, 3.0, 0.5, -1.0, -2.5, 1 / 3, 17.3])
+def test_pow_accuracy(exponent):
+    x = np.concatenate([_inputs(0, 10), _inputs(1e-9, 1e9, log=True)])
+    got = (QuantityNP(x) ** exponent).magnitude
+    want = [v ** exponent for v in x]
+    assert _ulps(got, want).max() <= 2
+
+
+# Signed zeros, NaN, infinities and huge values: each is either left to
+# libm or exact in the kernels.
+_SPECIAL = np.array([0.0, -0.0, np.nan, np.inf, -np.inf, 1e300, -1e300])
+
+
+@pytest.mark.parametrize(
+    "name, reference",
+    [("sin", np.sin), ("cos", np.cos), ("exp", np.exp), ("log", np.log),
+     ("tanh", np.tanh)],
+)
+def test_special_values_follow_libm(name, reference):
+    with np.errstate(all="ignore"):
+        want = reference(_SPECIAL)
+    got = getattr(QuantityNP(_SPECIAL), name)().magnitude
+    np.testing.assert_array_equal(got, want)
+    np.testing.assert_array_equal(np.signbit(got), np.signbit(want))
+
+
+def test_pow_special_values_follow_libm():
+    with np.errstate(all="ignore"):
+        want = _SPECIAL ** 2.5
+    np.testing.assert_array_equal((QuantityNP(_SPECIAL) ** 2.5).magnitude, want)
+
+
+def test_same_values_strided_and_with_out():
+    x = _inputs(-20, 20).reshape(100, 200)
+    whole = QuantityNP(x).exp().magnitude
+    strided = QuantityNP(x[:, ::2]).exp().magnitude
+    assert np.array_equal(strided, whole[:, ::2])
+    out = QuantityNP(np.empty_like(x))
+    QuantityNP(x).exp(out=out)
+    assert np.array_equal(out.magnitude, whole)
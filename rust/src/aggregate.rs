@@ -0,0 +1,142 @@
+//! Aggregates over plain Python sequences of scalar `Quantity` values:
+//! `qsum`, `qmean`, `qmin`, `qmax` and `qsorted`.
+//!
+//! `sum(items)` on a list of quantities makes one `__add__` call and one
+//! unit check per element, starting from an int 0 that has to be coerced.
+//! These walk the sequence (or any iterable) once, compare `Dim`s directly
+//! and build a single result. Bare numbers count as dimensionless, anything
+//! else raises TypeError, and mixed dimensions raise `EIncompatibleUnits`
+//! naming the first offending index.
+
+use pyo3::exceptions::{PyTypeError, PyValueError};
+use pyo3::prelude::*;
+use pyo3::types::PyList;
+
+use crate::dim::Dim;
+use crate::errors::EIncompatibleUnits;
+use crate::operand::Operand;
+use crate::quantity::Quantity;
+use crate::reduce::Sum;
+
+/// Call `f(item, magnitude)` for each element of `items`, checking that
+/// they all have the same dimensions (`expected`, when given). Returns those
+/// dimensions, or None for an empty iterable without `expected`.
+pub fn for_each_quantity<'py>(
+    items: &Bound<'py, PyAny>,
+    expected: Option<Dim>,
+    mut f: impl FnMut(Bound<'py, PyAny>, f64),
+) -> PyResult<Option<Dim>> {
+    let mut dim = expected;
+    for (i, item) in items.try_iter()?.enumerate() {
+        let item = item?;
+        let Some(q) = Operand::classify(&item)?.as_quantity() else {
+            return Err(PyTypeError::new_err(format!(
+                "element {i} is not a Quantity"
+            )));
+        };
+        match dim {
+            None => dim = Some(q.dim),
+            Some(d) if d != q.dim => {
+                return Err(EIncompatibleUnits::new_err(format!(
+                    "Incompatible units at index {i}"
+                )));
+            }
+            Some(_) => {}
+        }
+        f(item, q.magnitude);
+    }
+    Ok(dim)
+}
+
+/// `qsum(items, start=None)` — the sum of `items`, with compensated
+/// (Neumaier) summation. `start` is added in and fixes the dimensions an
+/// empty `items` sums to; without it that is a dimensionless 0.
+#[pyfunction]
+#[pyo3(signature = (items, start=None))]
+pub fn qsum(items: &Bound<'_, PyAny>, start: Option<Quantity>) -> PyResult<Quantity> {
+    let mut total = Sum::default();
+    if let Some(start) = &start {
+        total.add(start.magnitude);
+    }
+    let dim = for_each_quantity(items, start.map(|s| s.dim), |_, v| total.add(v))?;
+    Ok(Quantity::new(
+        total.value(),
+        dim.unwrap_or(Dim::DIMENSIONLESS),
+    ))
+}
+
+/// `qmean(items)` — the arithmetic mean of `items`.
+#[pyfunction]
+pub fn qmean(items: &Bound<'_, PyAny>) -> PyResult<Quantity> {
+    let mut total = Sum::default();
+    let mut count = 0usize;
+    let dim = for_each_quantity(items, None, |_, v| {
+        total.add(v);
+        count += 1;
+    })?;
+    let Some(dim) = dim else {
+        return Err(PyValueError::new_err("qmean() arg is an empty sequence"));
+    };
+    Ok(Quantity::new(total.value() / count as f64, dim))
+}
+
+/// The first smallest (`want_max` false) or largest element of `items`.
+/// A NaN magnitude wins, as in `QuantityNP.min()`.
+fn extreme<'py>(
+    items: &Bound<'py, PyAny>,
+    want_max: bool,
+    name: &str,
+) -> PyResult<Bound<'py, PyAny>> {
+    let mut best: Option<(Bound<'py, PyAny>, f64)> = None;
+    for_each_quantity(items, None, |item, v| {
+        let replace = match &best {
+            None => true,
+            Some((_, b)) if b.is_nan() => false,
+            Some((_, b)) => v.is_nan() || if want_max { v > *b } else { v < *b },
+        };
+        if replace {
+            best = Some((item, v));
+        }
+    })?;
+    best.map(|(item, _)| item)
+        .ok_or_else(|| PyValueError::new_err(format!("{name}() arg is an empty sequence")))
+}
+
+/// `qmin(items)` — the smallest element of `items` (the object itself).
+#[pyfunction]
+pub fn qmin<'py>(items: &Bound<'py, PyAny>) -> PyResult<Bound<'py, PyAny>> {
+    extreme(items, false, "qmin")
+}
+
+/// `qmax(items)` — the largest element of `items` (the object itself).
+#[pyfunction]
+pub fn qmax<'py>(items: &Bound<'py, PyAny>) -> PyResult<Bound<'py, PyAny>> {
+    extreme(items, true, "qmax")
+}
+
+/// `qsorted(items, reverse=False)` — a new list of the elements of `items`
+/// in ascending (or, with `reverse`, descending) order of magnitude. The
+/// sort is stable, and NaNs go last either way.
+#[pyfunction]
+#[pyo3(signature = (items, reverse=false))]
+pub fn qsorted<'py>(
+    py: Python<'py>,
+    items: &Bound<'py, PyAny>,
+    reverse: bool,
+) -> PyResult<Bound<'py, PyList>> {
+    let mut keyed = Vec::with_capacity(items.len().unwrap_or(0));
+    for_each_quantity(items, None, |item, v| keyed.push((v, item)))?;
+    let order = |a: f64, b: f64| match (a.is_nan(), b.is_nan()) {
+        (false, false) => {
+            let o = a.partial_cmp(&b).expect("neither is NaN");
+            if reverse {
+                o.reverse()
+            } else {
+                o
+            }
+        }
+        (a_nan, b_nan) => a_nan.cmp(&b_nan),
+    };
+    keyed.sort_by(|(a, _), (b, _)| order(*a, *b));
+    PyList::new(py, keyed.into_iter().map(|(_, item)| item))
+}
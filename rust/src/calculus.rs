@@ -0,0 +1,157 @@
+//! Calculus kernels for `QuantityNP`: trapz, cumtrapz, gradient, diff and
+//! cumsum.
+//!
+//! Each runs in one pass along the last axis of its input (cumsum
+//! flattens first, as numpy does), reading any real dtype through a view
+//! and accumulating in `f64`. Results keep the input's dtype. The sample
+//! spacing is a constant step or a 1-D array of sample positions; the
+//! result's dimensions follow from the samples' and the spacing's (see
+//! `Kernel::result_dim`).
+
+use numpy::ndarray::{ArrayD, ArrayView1, ArrayViewD, Axis, IxDyn, Slice};
+
+use crate::dim::Dim;
+use crate::parallel;
+use crate::reduce::Sum;
+use crate::storage::Elem;
+
+/// A kernel that uses the sample spacing.
+#[derive(Clone, Copy, Debug, PartialEq, Eq)]
+pub enum Kernel {
+    /// The trapezoidal-rule integral (the last axis is reduced away).
+    Trapz,
+    /// The running trapezoidal integral (one fewer along the last axis).
+    CumTrapz,
+    /// Second-order central differences, one-sided at the ends.
+    Gradient,
+}
+
+impl Kernel {
+    /// The method name, for error messages.
+    pub fn name(self) -> &'static str {
+        match self {
+            Kernel::Trapz => "trapz",
+            Kernel::CumTrapz => "cumtrapz",
+            Kernel::Gradient => "gradient",
+        }
+    }
+
+    /// Dimensions of the result for samples in `y` spaced in `x`: integrals
+    /// multiply (power × time → energy), gradients divide.
+    pub fn result_dim(self, y: &Dim, x: &Dim) -> Dim {
+        match self {
+            Kernel::Trapz | Kernel::CumTrapz => y.add(x),
+            Kernel::Gradient => y.sub(x),
+        }
+    }
+}
+
+/// Where the samples along the last axis sit.
+pub enum Spacing<'a> {
+    /// A constant step.
+    Uniform(f64),
+    /// One position per sample.
+    Samples(ArrayView1<'a, f64>),
+}
+
+impl Spacing<'_> {
+    /// The distance from sample `i` to sample `i + 1`.
+    #[inline]
+    fn step(&self, i: usize) -> f64 {
+        match self {
+            Spacing::Uniform(dx) => *dx,
+            Spacing::Samples(x) => x[i + 1] - x[i],
+        }
+    }
+
+    /// The area under `lane` between samples `i` and `i + 1`.
+    #[inline]
+    fn trapezoid<T: Elem>(&self, lane: &ArrayView1<'_, T>, i: usize) -> f64 {
+        self.step(i) * (lane[i].to_f64() + lane[i + 1].to_f64()) / 2.0
+    }
+
+    /// The derivative at interior sample `i` from its neighbours, as
+    /// numpy's `gradient` computes it.
+    #[inline]
+    fn central(&self, i: usize, prev: f64, here: f64, next: f64) -> f64 {
+        if let Spacing::Uniform(dx) = self {
+            return (next - prev) / (2.0 * dx);
+        }
+        let (h1, h2) = (self.step(i - 1), self.step(i));
+        let a = -h2 / (h1 * (h1 + h2));
+        let b = (h2 - h1) / (h1 * h2);
+        let c = h1 / (h2 * (h1 + h2));
+        a * prev + b * here + c * next
+    }
+}
+
+/// `kernel` along the last axis of `y`, which has at least one axis (and,
+/// for `Gradient`, at least two samples along it).
+pub fn run<T: Elem>(kernel: Kernel, y: &ArrayViewD<'_, T>, spacing: &Spacing<'_>) -> ArrayD<T> {
+    let axis = Axis(y.ndim() - 1);
+    let n = y.len_of(axis);
+    let mut shape = y.shape().to_vec();
+    match kernel {
+        Kernel::Trapz => {
+            shape.pop();
+        }
+        Kernel::CumTrapz => shape[axis.index()] = n.saturating_sub(1),
+        Kernel::Gradient => {}
+    }
+    let mut out = ArrayD::from_elem(IxDyn(&shape), T::from_f64(0.0));
+    match kernel {
+        Kernel::Trapz => {
+            for (o, lane) in out.iter_mut().zip(y.lanes(axis)) {
+                let mut total = Sum::default();
+                (0..n.saturating_sub(1)).for_each(|i| total.add(spacing.trapezoid(&lane, i)));
+                *o = T::from_f64(total.value());
+            }
+        }
+        Kernel::CumTrapz => {
+            for (mut dst, lane) in out.lanes_mut(axis).into_iter().zip(y.lanes(axis)) {
+                let mut total = Sum::default();
+                for (i, o) in dst.iter_mut().enumerate() {
+                    total.add(spacing.trapezoid(&lane, i));
+                    *o = T::from_f64(total.value());
+                }
+            }
+        }
+        Kernel::Gradient => {
+            for (mut dst, lane) in out.lanes_mut(axis).into_iter().zip(y.lanes(axis)) {
+                let v = |i: usize| lane[i].to_f64();
+                dst[0] = T::from_f64((v(1) - v(0)) / spacing.step(0));
+                dst[n - 1] = T::from_f64((v(n - 1) - v(n - 2)) / spacing.step(n - 2));
+                for i in 1..n - 1 {
+                    dst[i] = T::from_f64(spacing.central(i, v(i - 1), v(i), v(i + 1)));
+                }
+            }
+        }
+    }
+    out
+}
+
+/// Differences of neighbouring elements along the last axis of `y`, which
+/// has at least one axis.
+pub fn diff<T: Elem>(y: &ArrayViewD<'_, T>) -> ArrayD<T> {
+    let axis = Axis(y.ndim() - 1);
+    let n = y.len_of(axis);
+    if n == 0 {
+        return y.to_owned();
+    }
+    let lower = y.slice_axis(axis, Slice::from(..n - 1));
+    let upper = y.slice_axis(axis, Slice::from(1..));
+    parallel::zip(&upper, &lower, |b, a| b - a)
+}
+
+/// Running (compensated) totals of `y`, flattened in C order.
+pub fn cumsum<T: Elem>(y: &ArrayViewD<'_, T>) -> ArrayD<T> {
+    let mut total = Sum::default();
+    let values: Vec<T> = y
+        .iter()
+        .map(|v| {
+            total.add(v.to_f64());
+            T::from_f64(total.value())
+        })
+        .collect();
+    ArrayD::from_shape_vec(IxDyn(&[values.len()]), values).expect("1-D shape")
+}
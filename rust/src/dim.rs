@@ -1,74 +1,228 @@
 //! The 7-element SI dimension exponent vector and operations on it.
 //!
-//! All quantities in misu carry one of these. Equality, addition, subtraction,
-//! and scalar multiplication are length-7 loops that LLVM will autovectorize
-//! at `opt-level=3`.
+//! All quantities in misu carry one of these, so it is kept to a single
+//! machine word. Exponents are stored as quarter-steps (`e * 4`) in seven
+//! signed 9-bit fields, which covers every integer, half and quarter power
+//! in `[-63.75, 63.75]` exactly — both representations are exact in binary
+//! floating point, so packing and unpacking never round.
+//!
+//! The rare exponent vector that doesn't fit (e.g. `m^(1/3)`, or `kg^100`)
+//! is interned in a process-wide table and the word holds its index with
+//! the top bit set. Interning keeps every `Dim` canonical, which makes
+//! equality a single integer compare and lets the word double as its own
+//! (precomputed) hash.
+
+use std::collections::HashMap;
+use std::hash::{BuildHasherDefault, Hash, Hasher};
+
+use once_cell::sync::Lazy;
+use parking_lot::RwLock;
+
+/// Set when the word is an index into `WIDE` rather than packed fields.
+const WIDE_FLAG: u64 = 1 << 63;
+const FIELD_BITS: u32 = 9;
+const FIELD_MASK: u64 = (1 << FIELD_BITS) - 1;
+/// Largest quarter-step count a 9-bit signed field holds symmetrically.
+const FIELD_MAX: i32 = 255;
+/// Exponents are stored as multiples of `1 / STEPS`.
+const STEPS: f64 = 4.0;
+
+/// Exponent vectors that cannot be packed. Entries are never removed, so an
+/// index stays valid for the life of the process; the table only grows with
+/// the number of *distinct* unpackable dimensions, which is tiny in practice.
+#[derive(Default)]
+struct WideTable {
+    exponents: Vec<[f64; 7]>,
+    index: HashMap<[u64; 7], u64>,
+}
 
-use std::hash::{Hash, Hasher};
+static WIDE: Lazy<RwLock<WideTable>> = Lazy::new(|| RwLock::new(WideTable::default()));
 
-/// The seven base-SI dimensions (m, kg, s, A, K, ca, mole) — kept as f64
-/// so non-integer exponents (e.g. `m^-0.5`) work, matching the original
-/// Cython behaviour.
-#[derive(Clone, Copy, Debug, Default)]
-#[repr(C)]
-pub struct Dim(pub [f64; 7]);
+/// The seven base-SI dimensions (m, kg, s, A, K, ca, mole). Non-integer
+/// exponents (e.g. `m^-0.5`) work, matching the original Cython behaviour.
+#[derive(Clone, Copy, Debug, Default, PartialEq, Eq)]
+#[repr(transparent)]
+pub struct Dim(u64);
 
 impl Dim {
-    pub const DIMENSIONLESS: Dim = Dim([0.0; 7]);
+    pub const DIMENSIONLESS: Dim = Dim(0);
+
+    /// Build a Dim from plain exponents, packing them when possible.
+    pub fn from_exponents(exponents: [f64; 7]) -> Dim {
+        match pack(&exponents) {
+            Some(word) => Dim(word),
+            None => Dim::intern(exponents),
+        }
+    }
+
+    /// The exponents as plain floats, in `SYMBOLS` order.
+    pub fn exponents(&self) -> [f64; 7] {
+        if self.0 & WIDE_FLAG == 0 {
+            let fields = unpack(self.0);
+            let mut out = [0.0; 7];
+            for i in 0..7 {
+                out[i] = fields[i] as f64 / STEPS;
+            }
+            out
+        } else {
+            WIDE.read().exponents[(self.0 & !WIDE_FLAG) as usize]
+        }
+    }
 
     #[inline(always)]
     pub fn is_dimensionless(&self) -> bool {
-        self.0.iter().all(|x| *x == 0.0)
+        self.0 == 0
     }
 
     #[inline(always)]
     pub fn add(&self, other: &Dim) -> Dim {
+        if (self.0 | other.0) & WIDE_FLAG == 0 {
+            let (a, b) = (unpack(self.0), unpack(other.0));
+            let mut out = [0; 7];
+            for i in 0..7 {
+                out[i] = a[i] + b[i];
+            }
+            if let Some(word) = repack(&out) {
+                return Dim(word);
+            }
+        }
+        let (a, b) = (self.exponents(), other.exponents());
         let mut out = [0.0; 7];
         for i in 0..7 {
-            out[i] = self.0[i] + other.0[i];
+            out[i] = a[i] + b[i];
         }
-        Dim(out)
+        Dim::from_exponents(out)
     }
 
     #[inline(always)]
     pub fn sub(&self, other: &Dim) -> Dim {
+        if (self.0 | other.0) & WIDE_FLAG == 0 {
+            let (a, b) = (unpack(self.0), unpack(other.0));
+            let mut out = [0; 7];
+            for i in 0..7 {
+                out[i] = a[i] - b[i];
+            }
+            if let Some(word) = repack(&out) {
+                return Dim(word);
+            }
+        }
+        let (a, b) = (self.exponents(), other.exponents());
         let mut out = [0.0; 7];
         for i in 0..7 {
-            out[i] = self.0[i] - other.0[i];
+            out[i] = a[i] - b[i];
         }
-        Dim(out)
+        Dim::from_exponents(out)
     }
 
     #[inline(always)]
     pub fn scale(&self, k: f64) -> Dim {
+        let a = self.exponents();
         let mut out = [0.0; 7];
         for i in 0..7 {
-            out[i] = self.0[i] * k;
+            out[i] = a[i] * k;
         }
-        Dim(out)
+        Dim::from_exponents(out)
     }
-}
 
-impl PartialEq for Dim {
+    /// The raw packed word. Equal dims have equal words, so this is usable
+    /// directly as a hash.
     #[inline(always)]
-    fn eq(&self, other: &Self) -> bool {
-        // Bitwise comparison — exponents are produced by arithmetic on
-        // identical f64 inputs, so for matching dims they are bit-identical.
-        // (This avoids NaN-related gotchas of `==` on f64 too.)
+    pub fn word(&self) -> u64 {
         self.0
-            .iter()
-            .zip(other.0.iter())
-            .all(|(a, b)| a.to_bits() == b.to_bits())
     }
+
+    #[cold]
+    fn intern(mut exponents: [f64; 7]) -> Dim {
+        // Canonicalise -0.0 so that it interns (and compares) like 0.0,
+        // exactly as it does in the packed form.
+        let mut key = [0u64; 7];
+        for i in 0..7 {
+            if exponents[i] == 0.0 {
+                exponents[i] = 0.0;
+            }
+            key[i] = exponents[i].to_bits();
+        }
+        if let Some(&idx) = WIDE.read().index.get(&key) {
+            return Dim(idx | WIDE_FLAG);
+        }
+        let mut table = WIDE.write();
+        if let Some(&idx) = table.index.get(&key) {
+            return Dim(idx | WIDE_FLAG);
+        }
+        let idx = table.exponents.len() as u64;
+        table.exponents.push(exponents);
+        table.index.insert(key, idx);
+        Dim(idx | WIDE_FLAG)
+    }
+}
+
+/// Pack seven exponents into quarter-step fields, or `None` if any of them
+/// is not a multiple of 0.25 within range (including NaN and infinities).
+#[inline]
+fn pack(exponents: &[f64; 7]) -> Option<u64> {
+    let mut fields = [0i32; 7];
+    for i in 0..7 {
+        let q = exponents[i] * STEPS;
+        if q != q.trunc() || q.abs() > FIELD_MAX as f64 {
+            return None;
+        }
+        fields[i] = q as i32;
+    }
+    repack(&fields)
 }
 
-impl Eq for Dim {}
+#[inline(always)]
+fn repack(fields: &[i32; 7]) -> Option<u64> {
+    let mut word = 0u64;
+    for i in 0..7 {
+        if fields[i].abs() > FIELD_MAX {
+            return None;
+        }
+        word |= ((fields[i] as u64) & FIELD_MASK) << (FIELD_BITS * i as u32);
+    }
+    Some(word)
+}
+
+#[inline(always)]
+fn unpack(word: u64) -> [i32; 7] {
+    let mut out = [0i32; 7];
+    for i in 0..7 {
+        let raw = ((word >> (FIELD_BITS * i as u32)) & FIELD_MASK) as i32;
+        // Sign-extend the 9-bit field.
+        out[i] = (raw << (32 - FIELD_BITS)) >> (32 - FIELD_BITS);
+    }
+    out
+}
 
 impl Hash for Dim {
     #[inline]
     fn hash<H: Hasher>(&self, state: &mut H) {
-        for v in self.0.iter() {
-            state.write_u64(v.to_bits());
+        state.write_u64(self.0);
+    }
+}
+
+/// Hasher for `Dim`-keyed maps. The word is already unique per dimension,
+/// so a single multiply to spread its bits replaces SipHash over 56 bytes.
+#[derive(Default)]
+pub struct DimHasher(u64);
+
+impl Hasher for DimHasher {
+    #[inline]
+    fn finish(&self) -> u64 {
+        self.0
+    }
+
+    #[inline]
+    fn write(&mut self, bytes: &[u8]) {
+        for &b in bytes {
+            self.0 = (self.0.rotate_left(8) ^ b as u64).wrapping_mul(0x9E37_79B9_7F4A_7C15);
         }
     }
+
+    #[inline]
+    fn write_u64(&mut self, v: u64) {
+        self.0 = (self.0 ^ v).wrapping_mul(0x9E37_79B9_7F4A_7C15);
+    }
 }
+
+pub type DimMap<V> = HashMap<Dim, V, BuildHasherDefault<DimHasher>>;
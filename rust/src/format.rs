@@ -15,7 +15,7 @@ pub const SYMBOLS: [&str; 7] = ["m", "kg", "s", "A", "K", "ca", "mole"];
 /// Build the "m^1 s^-2" style fallback when no preferred symbol exists.
 pub fn dim_string(dim: &Dim) -> String {
     let mut parts: Vec<String> = Vec::new();
-    for (i, &v) in dim.0.iter().enumerate() {
+    for (i, &v) in dim.exponents().iter().enumerate() {
         if v != 0.0 {
             parts.push(format!("{}^{}", SYMBOLS[i], format_exponent(v)));
         }
@@ -0,0 +1,271 @@
+//! Fused elementwise kernels: `axpy`, `lerp`, `hypot`, `clip` and `fma`.
+//!
+//! Written with the operators, `a * x + y` on QuantityNPs makes two passes
+//! over memory, allocates a temporary for `a * x` and checks units twice.
+//! These functions check the units of all their arguments once, then make
+//! a single pass with the GIL released, into a new array or into `out=`.
+//!
+//! Arguments may be QuantityNPs, Quantities, bare numbers or array-likes
+//! (dimensionless), and broadcast as numpy's do. The result keeps the
+//! arrays' (promoted) dtype; complex data is not supported. With only
+//! scalar arguments and no `out`, the result is a scalar `Quantity`.
+
+use numpy::{PyArrayDyn, PyUntypedArrayMethods};
+use pyo3::exceptions::PyTypeError;
+use pyo3::prelude::*;
+
+use crate::dim::Dim;
+use crate::errors::EIncompatibleUnits;
+use crate::quantity::Quantity;
+use crate::quantity_np::{Input, QuantityNP};
+use crate::storage::{self, per_dtype, DType, Elem};
+
+/// The fused kernels, each a function of three values.
+#[derive(Clone, Copy, Debug, PartialEq, Eq)]
+enum Op {
+    /// `a * x + y`.
+    Axpy,
+    /// `a + (b - a) * t`.
+    Lerp,
+    /// `sqrt(x**2 + y**2)`, without overflow; the third value is unused.
+    Hypot,
+    /// `q` limited to `[lo, hi]`, as `numpy.clip` (NaN stays NaN).
+    Clip,
+    /// `a * b + c`, with a single rounding.
+    Fma,
+}
+
+impl Op {
+    fn name(self) -> &'static str {
+        match self {
+            Op::Axpy => "axpy",
+            Op::Lerp => "lerp",
+            Op::Hypot => "hypot",
+            Op::Clip => "clip",
+            Op::Fma => "fma",
+        }
+    }
+
+    /// Dimensions of the result for arguments with dimensions `d`, or None
+    /// if they do not fit together.
+    fn result_dim(self, d: [Dim; 3]) -> Option<Dim> {
+        let fits = match self {
+            Op::Axpy | Op::Fma => d[0].add(&d[1]) == d[2],
+            Op::Lerp => d[0] == d[1] && d[2] == Dim::DIMENSIONLESS,
+            Op::Hypot => d[0] == d[1],
+            Op::Clip => d[0] == d[1] && d[0] == d[2],
+        };
+        fits.then_some(match self {
+            Op::Axpy | Op::Fma => d[2],
+            _ => d[0],
+        })
+    }
+
+    #[inline(always)]
+    fn apply(self, a: f64, b: f64, c: f64) -> f64 {
+        match self {
+            Op::Axpy => a * b + c,
+            Op::Lerp => a + (b - a) * c,
+            Op::Hypot => a.hypot(b),
+            Op::Clip => {
+                let low = if a < b { b } else { a };
+                if low > c {
+                    c
+                } else {
+                    low
+                }
+            }
+            Op::Fma => a.mul_add(b, c),
+        }
+    }
+}
+
+/// `obj` as a kernel argument, or TypeError for unsupported types.
+fn argument<'py>(py: Python<'py>, op: Op, obj: &Bound<'py, PyAny>) -> PyResult<(Input, Dim)> {
+    match QuantityNP::operand_input(py, obj)? {
+        Some(arg) => Ok(arg),
+        None => Err(PyTypeError::new_err(format!(
+            "unsupported operand type for misu.{}: '{}'",
+            op.name(),
+            obj.get_type().name()?
+        ))),
+    }
+}
+
+/// `op` over `args`, into `out` if given (which is returned, with the
+/// result's Dim), else into a new QuantityNP or a scalar Quantity.
+fn evaluate<'py>(
+    py: Python<'py>,
+    op: Op,
+    args: [(Input, Dim); 3],
+    out: Option<&Bound<'py, QuantityNP>>,
+) -> PyResult<Py<PyAny>> {
+    let Some(dim) = op.result_dim([args[0].1, args[1].1, args[2].1]) else {
+        return Err(EIncompatibleUnits::new_err(format!(
+            "Incompatible units for misu.{}",
+            op.name()
+        )));
+    };
+    // The broadcast shape and promoted dtype of the array arguments.
+    let mut layout: Option<(Vec<usize>, DType)> = None;
+    for (arg, _) in &args {
+        let Input::Array(s) = arg else { continue };
+        if s.dtype().is_complex() {
+            return Err(PyTypeError::new_err(format!(
+                "misu.{} is not supported for complex QuantityNP",
+                op.name()
+            )));
+        }
+        let shape = s.array(py).shape().to_vec();
+        layout = Some(match layout {
+            None => (shape, s.dtype()),
+            Some((sh, dt)) => (
+                storage::broadcast_shape(&sh, &shape)?,
+                dt.promote(s.dtype()),
+            ),
+        });
+    }
+    let out = match (out, layout) {
+        (Some(out), _) => {
+            if out.try_borrow()?.storage.dtype().is_complex() {
+                return Err(PyTypeError::new_err(format!(
+                    "misu.{} is not supported for complex QuantityNP",
+                    op.name()
+                )));
+            }
+            out.clone()
+        }
+        (None, Some((shape, dtype))) => {
+            let storage = per_dtype!(dtype, T => {
+                // SAFETY: `write_into3` below writes every element (the
+                // array has the broadcast shape of the inputs), and the
+                // array is not reachable from Python until it has.
+                let arr = unsafe { PyArrayDyn::<T>::new(py, shape.as_slice(), false) };
+                T::wrap(arr.unbind())
+            });
+            Bound::new(py, QuantityNP::new(storage, dim))?
+        }
+        (None, None) => {
+            let v = |i: usize| match args[i].0 {
+                Input::Scalar(v) => v,
+                Input::Array(_) => unreachable!("no array arguments"),
+            };
+            let q = Quantity::new(op.apply(v(0), v(1), v(2)), dim);
+            return Ok(q.into_pyobject(py)?.into_any().unbind());
+        }
+    };
+    out.try_borrow()?.check_unit_change(dim)?;
+    let dest = QuantityNP::out_storage(py, &out)?;
+    per_dtype!(dest.dtype(), T => {
+        let arr = T::expect(&dest).bind(py);
+        let data = [
+            QuantityNP::input_data::<T>(py, &args[0].0)?,
+            QuantityNP::input_data::<T>(py, &args[1].0)?,
+            QuantityNP::input_data::<T>(py, &args[2].0)?,
+        ];
+        storage::write_into3(py, arr, data.each_ref(), |a, b, c| {
+            T::from_f64(op.apply(a.to_f64(), b.to_f64(), c.to_f64()))
+        })?;
+    });
+    if out.try_borrow()?.dim != dim {
+        out.try_borrow_mut()?.dim = dim;
+    }
+    Ok(out.into_any().unbind())
+}
+
+/// `axpy(a, x, y, out=None)` — `a * x + y` in one pass. The units of
+/// `a * x` must match `y`'s.
+#[pyfunction]
+#[pyo3(signature = (a, x, y, out=None))]
+pub fn axpy<'py>(
+    py: Python<'py>,
+    a: &Bound<'py, PyAny>,
+    x: &Bound<'py, PyAny>,
+    y: &Bound<'py, PyAny>,
+    out: Option<&Bound<'py, QuantityNP>>,
+) -> PyResult<Py<PyAny>> {
+    let op = Op::Axpy;
+    let args = [
+        argument(py, op, a)?,
+        argument(py, op, x)?,
+        argument(py, op, y)?,
+    ];
+    evaluate(py, op, args, out)
+}
+
+/// `lerp(a, b, t, out=None)` — linear interpolation `a + (b - a) * t`.
+/// `a` and `b` share units; `t` is dimensionless.
+#[pyfunction]
+#[pyo3(signature = (a, b, t, out=None))]
+pub fn lerp<'py>(
+    py: Python<'py>,
+    a: &Bound<'py, PyAny>,
+    b: &Bound<'py, PyAny>,
+    t: &Bound<'py, PyAny>,
+    out: Option<&Bound<'py, QuantityNP>>,
+) -> PyResult<Py<PyAny>> {
+    let op = Op::Lerp;
+    let args = [
+        argument(py, op, a)?,
+        argument(py, op, b)?,
+        argument(py, op, t)?,
+    ];
+    evaluate(py, op, args, out)
+}
+
+/// `hypot(x, y, out=None)` — `sqrt(x**2 + y**2)` without intermediate
+/// overflow. `x` and `y` share units.
+#[pyfunction]
+#[pyo3(signature = (x, y, out=None))]
+pub fn hypot<'py>(
+    py: Python<'py>,
+    x: &Bound<'py, PyAny>,
+    y: &Bound<'py, PyAny>,
+    out: Option<&Bound<'py, QuantityNP>>,
+) -> PyResult<Py<PyAny>> {
+    let op = Op::Hypot;
+    let unused = (Input::Scalar(0.0), Dim::DIMENSIONLESS);
+    let args = [argument(py, op, x)?, argument(py, op, y)?, unused];
+    evaluate(py, op, args, out)
+}
+
+/// `clip(q, lo=None, hi=None, out=None)` — `q` limited to `[lo, hi]`, in
+/// `q`'s units. A bound of None is no bound.
+#[pyfunction]
+#[pyo3(signature = (q, lo=None, hi=None, out=None))]
+pub fn clip<'py>(
+    py: Python<'py>,
+    q: &Bound<'py, PyAny>,
+    lo: Option<&Bound<'py, PyAny>>,
+    hi: Option<&Bound<'py, PyAny>>,
+    out: Option<&Bound<'py, QuantityNP>>,
+) -> PyResult<Py<PyAny>> {
+    let op = Op::Clip;
+    let q = argument(py, op, q)?;
+    let bound = |b: Option<&Bound<'py, PyAny>>, none: f64| match b {
+        Some(b) => argument(py, op, b),
+        None => Ok((Input::Scalar(none), q.1)),
+    };
+    let (lo, hi) = (bound(lo, f64::NEG_INFINITY)?, bound(hi, f64::INFINITY)?);
+    evaluate(py, op, [q, lo, hi], out)
+}
+
+/// `fma(a, b, c, out=None)` — `a * b + c` with a single rounding. The
+/// units of `a * b` must match `c`'s.
+#[pyfunction]
+#[pyo3(signature = (a, b, c, out=None))]
+pub fn fma<'py>(
+    py: Python<'py>,
+    a: &Bound<'py, PyAny>,
+    b: &Bound<'py, PyAny>,
+    c: &Bound<'py, PyAny>,
+    out: Option<&Bound<'py, QuantityNP>>,
+) -> PyResult<Py<PyAny>> {
+    let op = Op::Fma;
+    let args = [
+        argument(py, op, a)?,
+        argument(py, op, b)?,
+        argument(py, op, c)?,
+    ];
+    evaluate(py, op, args, out)
+}
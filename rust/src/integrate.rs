@@ -0,0 +1,535 @@
+//! The integration loop behind `misu.integrate`: fixed-step Euler and RK4,
+//! and adaptive RK45 (Dormand–Prince 5(4)).
+//!
+//! `misu.integrate.solve` checks the units of the initial state, the time
+//! span, the step and the tolerances once, and flattens the state into
+//! base-SI magnitudes. Everything after that happens here — stepping,
+//! error estimation and step-size control, and dense output at requested
+//! times — calling back into Python only for the right-hand side. The
+//! result is a table of times and flat states, which the wrapper splits
+//! back into one `QuantityNP` series per state component.
+//!
+//! Dense output uses the Dormand–Prince continuous extension (order 4)
+//! for RK45, and cubic Hermite interpolation between steps for the
+//! fixed-step methods.
+
+use std::mem;
+
+use numpy::ndarray::Array2;
+use numpy::{IntoPyArray, PyArray1, PyArray2, PyArrayDyn, PyArrayMethods};
+use pyo3::exceptions::{PyRuntimeError, PyTypeError, PyValueError};
+use pyo3::prelude::*;
+use pyo3::types::{PyFloat, PyTuple};
+
+use crate::quantity::Quantity;
+use crate::quantity_np::QuantityNP;
+
+/// The integration methods.
+#[derive(Clone, Copy, Debug, PartialEq, Eq)]
+enum Method {
+    Euler,
+    Rk4,
+    Rk45,
+}
+
+impl Method {
+    fn parse(s: &str) -> PyResult<Method> {
+        match s {
+            "euler" => Ok(Method::Euler),
+            "rk4" => Ok(Method::Rk4),
+            "rk45" => Ok(Method::Rk45),
+            _ => Err(PyValueError::new_err(format!(
+                "method must be 'euler', 'rk4' or 'rk45', not {s:?}"
+            ))),
+        }
+    }
+}
+
+// Dormand–Prince 5(4): nodes, stage coefficients, fifth-order weights, the
+// weights of the error estimate (fifth minus fourth order), and the
+// coefficients of the continuous extension in powers of the step fraction.
+const DP_C: [f64; 7] = [0.0, 1.0 / 5.0, 3.0 / 10.0, 4.0 / 5.0, 8.0 / 9.0, 1.0, 1.0];
+const DP_A: [[f64; 5]; 6] = [
+    [0.0; 5],
+    [1.0 / 5.0, 0.0, 0.0, 0.0, 0.0],
+    [3.0 / 40.0, 9.0 / 40.0, 0.0, 0.0, 0.0],
+    [44.0 / 45.0, -56.0 / 15.0, 32.0 / 9.0, 0.0, 0.0],
+    [
+        19372.0 / 6561.0,
+        -25360.0 / 2187.0,
+        64448.0 / 6561.0,
+        -212.0 / 729.0,
+        0.0,
+    ],
+    [
+        9017.0 / 3168.0,
+        -355.0 / 33.0,
+        46732.0 / 5247.0,
+        49.0 / 176.0,
+        -5103.0 / 18656.0,
+    ],
+];
+const DP_B: [f64; 6] = [
+    35.0 / 384.0,
+    0.0,
+    500.0 / 1113.0,
+    125.0 / 192.0,
+    -2187.0 / 6784.0,
+    11.0 / 84.0,
+];
+const DP_E: [f64; 7] = [
+    71.0 / 57600.0,
+    0.0,
+    -71.0 / 16695.0,
+    71.0 / 1920.0,
+    -17253.0 / 339200.0,
+    22.0 / 525.0,
+    -1.0 / 40.0,
+];
+const DP_P: [[f64; 4]; 7] = [
+    [
+        1.0,
+        -8048581381.0 / 2820520608.0,
+        8663915743.0 / 2820520608.0,
+        -12715105075.0 / 11282082432.0,
+    ],
+    [0.0; 4],
+    [
+        0.0,
+        131558114200.0 / 32700410799.0,
+        -68118460800.0 / 10900136933.0,
+        87487479700.0 / 32700410799.0,
+    ],
+    [
+        0.0,
+        -1754552775.0 / 470086768.0,
+        14199869525.0 / 1410260304.0,
+        -10690763975.0 / 1880347072.0,
+    ],
+    [
+        0.0,
+        127303824393.0 / 49829197408.0,
+        -318862633887.0 / 49829197408.0,
+        701980252875.0 / 199316789632.0,
+    ],
+    [
+        0.0,
+        -282668133.0 / 205662961.0,
+        2019193451.0 / 616988883.0,
+        -1453857185.0 / 822651844.0,
+    ],
+    [
+        0.0,
+        40617522.0 / 29380423.0,
+        -110615467.0 / 29380423.0,
+        69997945.0 / 29380423.0,
+    ],
+];
+
+// Step-size control for RK45.
+const SAFETY: f64 = 0.9;
+const MIN_FACTOR: f64 = 0.2;
+const MAX_FACTOR: f64 = 10.0;
+
+/// The right-hand side: a Python callable of the time and the state.
+struct Rhs<'py> {
+    func: Bound<'py, PyAny>,
+    /// The shape of each state component, or None when `func` takes the
+    /// whole state as one flat array.
+    layout: Option<Vec<Vec<usize>>>,
+    calls: usize,
+}
+
+impl Rhs<'_> {
+    /// `func(t, y)`, written into `out`.
+    fn eval(&mut self, t: f64, y: &[f64], out: &mut [f64]) -> PyResult<()> {
+        let py = self.func.py();
+        self.calls += 1;
+        let Some(layout) = &self.layout else {
+            let result = self.func.call1((t, PyArray1::from_slice(py, y)))?;
+            return read_into(&result, out);
+        };
+        let mut args = Vec::with_capacity(layout.len() + 1);
+        args.push(PyFloat::new(py, t).into_any());
+        let mut offset = 0;
+        for shape in layout {
+            let size: usize = shape.iter().product();
+            let part = &y[offset..offset + size];
+            // Scalar components are passed as floats, the rest as arrays.
+            args.push(if shape.is_empty() {
+                PyFloat::new(py, part[0]).into_any()
+            } else {
+                PyArray1::from_slice(py, part)
+                    .reshape(shape.as_slice())?
+                    .into_any()
+            });
+            offset += size;
+        }
+        let result = self.func.call1(PyTuple::new(py, args)?)?;
+        let parts = result.try_iter()?.collect::<PyResult<Vec<_>>>()?;
+        if parts.len() != layout.len() {
+            return Err(PyValueError::new_err(format!(
+                "the right-hand side returned {} derivatives for {} state components",
+                parts.len(),
+                layout.len()
+            )));
+        }
+        let mut offset = 0;
+        for (part, shape) in parts.iter().zip(layout) {
+            let size: usize = shape.iter().product();
+            read_into(part, &mut out[offset..offset + size])?;
+            offset += size;
+        }
+        Ok(())
+    }
+}
+
+/// Copy `value` — a number, or an array-like of `out.len()` numbers — into
+/// `out`.
+fn read_into(value: &Bound<'_, PyAny>, out: &mut [f64]) -> PyResult<()> {
+    if let (Ok(v), 1) = (value.cast::<PyFloat>(), out.len()) {
+        out[0] = v.value();
+        return Ok(());
+    }
+    if value.is_instance_of::<Quantity>() || value.is_instance_of::<QuantityNP>() {
+        return Err(PyTypeError::new_err(
+            "the right-hand side must return bare magnitudes in base SI units, not quantities",
+        ));
+    }
+    let np = value.py().import("numpy")?;
+    let arr = np.call_method1("asarray", (value, "float64"))?;
+    let arr = arr.cast_into::<PyArrayDyn<f64>>()?;
+    let view = arr.readonly();
+    let view = view.as_array();
+    if view.len() != out.len() {
+        return Err(PyValueError::new_err(format!(
+            "the right-hand side returned {} values where {} were expected",
+            view.len(),
+            out.len()
+        )));
+    }
+    out.iter_mut().zip(view.iter()).for_each(|(o, &v)| *o = v);
+    Ok(())
+}
+
+/// `sqrt(mean((v / scale)**2))`, the norm used for step-size control.
+fn rms(v: impl Iterator<Item = f64>, n: usize) -> f64 {
+    if n == 0 {
+        return 0.0;
+    }
+    (v.map(|x| x * x).sum::<f64>() / n as f64).sqrt()
+}
+
+struct Solver<'a, 'py> {
+    rhs: Rhs<'py>,
+    method: Method,
+    rtol: f64,
+    atol: &'a [f64],
+    /// Stage derivatives (the first is the derivative at the step's start,
+    /// the last, for RK45, at its end).
+    k: [Vec<f64>; 7],
+    /// The state at which the next stage is evaluated.
+    stage: Vec<f64>,
+}
+
+impl Solver<'_, '_> {
+    /// One step of size `h` (signed) from `(t, y)`, where the derivative
+    /// is `f`: the new state and its derivative go into `y_new` and
+    /// `f_new`. Returns the norm of the error estimate (scaled so that 1
+    /// is the tolerance), or 0 for the fixed-step methods.
+    fn attempt(
+        &mut self,
+        t: f64,
+        y: &[f64],
+        f: &[f64],
+        h: f64,
+        y_new: &mut [f64],
+        f_new: &mut [f64],
+    ) -> PyResult<f64> {
+        let n = y.len();
+        match self.method {
+            Method::Euler => {
+                (0..n).for_each(|i| y_new[i] = y[i] + h * f[i]);
+                self.rhs.eval(t + h, y_new, f_new)?;
+                Ok(0.0)
+            }
+            Method::Rk4 => {
+                self.k[0].copy_from_slice(f);
+                for (s, c) in [0.5, 0.5, 1.0].into_iter().enumerate() {
+                    let (done, rest) = self.k.split_at_mut(s + 1);
+                    (0..n).for_each(|i| self.stage[i] = y[i] + c * h * done[s][i]);
+                    self.rhs.eval(t + c * h, &self.stage, &mut rest[0])?;
+                }
+                let k = &self.k;
+                (0..n).for_each(|i| {
+                    y_new[i] = y[i] + h / 6.0 * (k[0][i] + 2.0 * k[1][i] + 2.0 * k[2][i] + k[3][i])
+                });
+                self.rhs.eval(t + h, y_new, f_new)?;
+                Ok(0.0)
+            }
+            Method::Rk45 => {
+                self.k[0].copy_from_slice(f);
+                for s in 1..6 {
+                    let (done, rest) = self.k.split_at_mut(s);
+                    for i in 0..n {
+                        let dy: f64 = (0..s).map(|j| DP_A[s][j] * done[j][i]).sum();
+                        self.stage[i] = y[i] + h * dy;
+                    }
+                    self.rhs.eval(t + DP_C[s] * h, &self.stage, &mut rest[0])?;
+                }
+                for i in 0..n {
+                    let dy: f64 = (0..6).map(|j| DP_B[j] * self.k[j][i]).sum();
+                    y_new[i] = y[i] + h * dy;
+                }
+                self.rhs.eval(t + h, y_new, f_new)?;
+                self.k[6].copy_from_slice(f_new);
+                let k = &self.k;
+                let scaled = (0..n).map(|i| {
+                    let err = h * (0..7).map(|j| DP_E[j] * k[j][i]).sum::<f64>();
+                    err / (self.atol[i] + self.rtol * y[i].abs().max(y_new[i].abs()))
+                });
+                Ok(rms(scaled, n))
+            }
+        }
+    }
+
+    /// The state at `t + x * h`, `x` in `[0, 1]`, after an accepted step.
+    #[allow(clippy::too_many_arguments)]
+    fn interpolate(
+        &self,
+        y: &[f64],
+        f: &[f64],
+        y_new: &[f64],
+        f_new: &[f64],
+        h: f64,
+        x: f64,
+        out: &mut [f64],
+    ) {
+        if self.method == Method::Rk45 {
+            let powers = [x, x * x, x * x * x, x * x * x * x];
+            let weights: [f64; 7] =
+                std::array::from_fn(|j| (0..4).map(|p| DP_P[j][p] * powers[p]).sum());
+            for (i, o) in out.iter_mut().enumerate() {
+                *o = y[i] + h * (0..7).map(|j| weights[j] * self.k[j][i]).sum::<f64>();
+            }
+            return;
+        }
+        // Cubic Hermite: matches the states and derivatives at both ends.
+        let (x2, x3) = (x * x, x * x * x);
+        let (h00, h10) = (2.0 * x3 - 3.0 * x2 + 1.0, x3 - 2.0 * x2 + x);
+        let (h01, h11) = (-2.0 * x3 + 3.0 * x2, x3 - x2);
+        for (i, o) in out.iter_mut().enumerate() {
+            *o = h00 * y[i] + h10 * h * f[i] + h01 * y_new[i] + h11 * h * f_new[i];
+        }
+    }
+
+    /// A first RK45 step size for `(t0, y0)` with derivative `f0`, by the
+    /// usual estimate of where the error of a step reaches the tolerance
+    /// (Hairer, Nørsett & Wanner, II.4).
+    fn initial_step(
+        &mut self,
+        t0: f64,
+        y0: &[f64],
+        f0: &[f64],
+        dir: f64,
+        span: f64,
+    ) -> PyResult<f64> {
+        let n = y0.len();
+        let scale: Vec<f64> = (0..n)
+            .map(|i| self.atol[i] + self.rtol * y0[i].abs())
+            .collect();
+        let d0 = rms((0..n).map(|i| y0[i] / scale[i]), n);
+        let d1 = rms((0..n).map(|i| f0[i] / scale[i]), n);
+        let h0 = if d0 < 1e-5 || d1 < 1e-5 {
+            1e-6
+        } else {
+            0.01 * d0 / d1
+        };
+        let h0 = h0.min(span);
+        let y1: Vec<f64> = (0..n).map(|i| y0[i] + dir * h0 * f0[i]).collect();
+        let mut f1 = vec![0.0; n];
+        self.rhs.eval(t0 + dir * h0, &y1, &mut f1)?;
+        let d2 = rms((0..n).map(|i| (f1[i] - f0[i]) / scale[i]), n) / h0;
+        let h1 = if d1.max(d2) <= 1e-15 {
+            (h0 * 1e-3).max(1e-6)
+        } else {
+            (0.01 / d1.max(d2)).powf(0.2)
+        };
+        Ok((100.0 * h0).min(h1).min(span))
+    }
+}
+
+/// `_integrate(rhs, method, t0, t1, y0, layout, dt, rtol, atol, t_eval,
+/// max_steps)` — integrate `dy/dt = rhs(t, y)` from `t0` to `t1`, all in
+/// base SI magnitudes; see `misu.integrate.solve`, which checks the units.
+///
+/// `layout` lists the shape of each state component (the callable gets
+/// them as separate arguments), or is None for a callable of the flat
+/// state. Returns `(times, states, nfev)`, with one row of `states` per
+/// time: every step's end, or the times in `t_eval`.
+#[pyfunction]
+#[pyo3(signature = (rhs, method, t0, t1, y0, layout, dt, rtol, atol, t_eval, max_steps))]
+#[allow(clippy::too_many_arguments)]
+pub fn _integrate<'py>(
+    py: Python<'py>,
+    rhs: Bound<'py, PyAny>,
+    method: &str,
+    t0: f64,
+    t1: f64,
+    y0: Vec<f64>,
+    layout: Option<Vec<Vec<usize>>>,
+    dt: Option<f64>,
+    rtol: f64,
+    atol: Vec<f64>,
+    t_eval: Option<Vec<f64>>,
+    max_steps: usize,
+) -> PyResult<(Bound<'py, PyArray1<f64>>, Bound<'py, PyArray2<f64>>, usize)> {
+    let method = Method::parse(method)?;
+    let n = y0.len();
+    if !t0.is_finite() || !t1.is_finite() {
+        return Err(PyValueError::new_err("the time span must be finite"));
+    }
+    if let Some(layout) = &layout {
+        if layout
+            .iter()
+            .map(|s| s.iter().product::<usize>())
+            .sum::<usize>()
+            != n
+        {
+            return Err(PyValueError::new_err("the layout does not match the state"));
+        }
+    }
+    if atol.len() != n {
+        return Err(PyValueError::new_err(
+            "atol needs one tolerance per state value",
+        ));
+    }
+    if rtol < 0.0 || atol.iter().any(|&a| !(a >= 0.0)) {
+        return Err(PyValueError::new_err("tolerances must not be negative"));
+    }
+    let dir = if t1 >= t0 { 1.0 } else { -1.0 };
+    let span = (t1 - t0).abs();
+    let t_eval = t_eval.unwrap_or_default();
+    let ordered = t_eval.windows(2).all(|w| dir * (w[1] - w[0]) >= 0.0);
+    if !ordered
+        || t_eval
+            .iter()
+            .any(|&t| !(dir * (t - t0) >= 0.0 && dir * (t1 - t) >= 0.0))
+    {
+        return Err(PyValueError::new_err(
+            "t_eval must be sorted in the direction of integration and lie within t_span",
+        ));
+    }
+    let mut h_abs = match (method, dt) {
+        (_, Some(dt)) if !(dt != 0.0 && dt.is_finite()) => {
+            return Err(PyValueError::new_err("dt must be finite and non-zero"));
+        }
+        (_, Some(dt)) => dt.abs(),
+        (Method::Rk45, None) => 0.0,
+        (_, None) => {
+            return Err(PyValueError::new_err(
+                "the fixed-step methods need a step dt",
+            ));
+        }
+    };
+
+    let mut solver = Solver {
+        rhs: Rhs {
+            func: rhs,
+            layout,
+            calls: 0,
+        },
+        method,
+        rtol,
+        atol: &atol,
+        k: std::array::from_fn(|_| vec![0.0; n]),
+        stage: vec![0.0; n],
+    };
+    let (mut t, mut y, mut f) = (t0, y0, vec![0.0; n]);
+    solver.rhs.eval(t, &y, &mut f)?;
+    if method == Method::Rk45 && h_abs == 0.0 && span > 0.0 {
+        h_abs = solver.initial_step(t, &y, &f, dir, span)?;
+    }
+
+    // Every step's end, or the requested times.
+    let (mut times, mut states) = (Vec::new(), Vec::new());
+    let mut next = 0;
+    if t_eval.is_empty() {
+        times.push(t0);
+        states.extend_from_slice(&y);
+    }
+    while next < t_eval.len() && t_eval[next] == t0 {
+        times.push(t0);
+        states.extend_from_slice(&y);
+        next += 1;
+    }
+
+    let (mut y_new, mut f_new, mut point) = (vec![0.0; n], vec![0.0; n], vec![0.0; n]);
+    let mut steps = 0usize;
+    let mut rejected = false;
+    while dir * (t1 - t) > 0.0 {
+        if steps >= max_steps {
+            return Err(PyRuntimeError::new_err(format!(
+                "integration stopped after {max_steps} steps at t = {t} (base SI units)"
+            )));
+        }
+        let t_new = match method {
+            // From t0, so rounding does not build up over many steps.
+            Method::Euler | Method::Rk4 => {
+                let t_next = t0 + dir * (steps + 1) as f64 * h_abs;
+                if dir * (t1 - t_next) <= 1e-9 * h_abs {
+                    t1
+                } else {
+                    t_next
+                }
+            }
+            Method::Rk45 if h_abs >= (t1 - t).abs() => t1,
+            Method::Rk45 => t + dir * h_abs,
+        };
+        let h = t_new - t;
+        let err = solver.attempt(t, &y, &f, h, &mut y_new, &mut f_new)?;
+        if method == Method::Rk45 {
+            if !(err <= 1.0) {
+                // Also for a NaN error: f64::max ignores the NaN.
+                h_abs = h.abs() * (SAFETY * err.powf(-0.2)).max(MIN_FACTOR);
+                if h_abs < 10.0 * f64::EPSILON * t.abs().max(span) {
+                    return Err(PyRuntimeError::new_err(format!(
+                        "the step size became too small at t = {t} (base SI units)"
+                    )));
+                }
+                rejected = true;
+                continue;
+            }
+            let factor = if err == 0.0 {
+                MAX_FACTOR
+            } else {
+                (SAFETY * err.powf(-0.2)).min(MAX_FACTOR)
+            };
+            h_abs = h.abs() * if rejected { factor.min(1.0) } else { factor };
+            rejected = false;
+        }
+        if t_eval.is_empty() {
+            times.push(t_new);
+            states.extend_from_slice(&y_new);
+        }
+        while next < t_eval.len() && dir * (t_new - t_eval[next]) >= 0.0 {
+            let x = (t_eval[next] - t) / h;
+            solver.interpolate(&y, &f, &y_new, &f_new, h, x, &mut point);
+            times.push(t_eval[next]);
+            states.extend_from_slice(&point);
+            next += 1;
+        }
+        t = t_new;
+        mem::swap(&mut y, &mut y_new);
+        mem::swap(&mut f, &mut f_new);
+        steps += 1;
+    }
+
+    let rows = times.len();
+    let states = Array2::from_shape_vec((rows, n), states).expect("one state per time");
+    Ok((
+        times.into_pyarray(py),
+        states.into_pyarray(py),
+        solver.rhs.calls,
+    ))
+}
@@ -0,0 +1,394 @@
+//! Precomputed interpolation tables: `Interp1D`.
+//!
+//! `np.interp(x >> K, xs, ys) * Pa*s` converts, unwraps and rewraps on
+//! every lookup. An `Interp1D` is built once from a `QuantityNP` axis and
+//! values: it keeps both as base-SI `f64` knots together with their `Dim`s
+//! (and, for cubic interpolation, the spline's curvature at each knot). A
+//! lookup then checks the argument's dimensions once, finds the segment —
+//! by index arithmetic when the knots are evenly spaced, else by binary
+//! search — and returns a result in the values' dimensions. Array lookups
+//! run with the GIL released.
+
+use numpy::ndarray::{ArrayD, IxDyn};
+use numpy::PyArrayMethods;
+use pyo3::exceptions::{PyTypeError, PyValueError};
+use pyo3::prelude::*;
+use pyo3::types::PyTuple;
+
+use crate::dim::Dim;
+use crate::errors::EIncompatibleUnits;
+use crate::operand::Operand;
+use crate::parallel;
+use crate::quantity::Quantity;
+use crate::quantity_np::QuantityNP;
+use crate::storage::Storage;
+
+/// How values between the knots are found.
+#[derive(Clone, Copy, Debug, PartialEq, Eq)]
+enum Kind {
+    /// Straight lines between neighbouring knots.
+    Linear,
+    /// A natural cubic spline (zero curvature at both ends).
+    Cubic,
+}
+
+/// What a lookup outside the knots gives.
+#[derive(Clone, Copy, Debug, PartialEq, Eq)]
+enum Extrapolate {
+    /// The value at the nearest end, as `np.interp` does.
+    Clamp,
+    /// The end segment's line or cubic, continued.
+    Extend,
+    /// NaN.
+    Nan,
+    /// ValueError.
+    Raise,
+}
+
+impl Kind {
+    fn parse(s: &str) -> PyResult<Kind> {
+        match s {
+            "linear" => Ok(Kind::Linear),
+            "cubic" => Ok(Kind::Cubic),
+            _ => Err(PyValueError::new_err(format!(
+                "kind must be 'linear' or 'cubic', not {s:?}"
+            ))),
+        }
+    }
+
+    fn name(self) -> &'static str {
+        match self {
+            Kind::Linear => "linear",
+            Kind::Cubic => "cubic",
+        }
+    }
+}
+
+impl Extrapolate {
+    fn parse(s: &str) -> PyResult<Extrapolate> {
+        match s {
+            "clamp" => Ok(Extrapolate::Clamp),
+            "extend" => Ok(Extrapolate::Extend),
+            "nan" => Ok(Extrapolate::Nan),
+            "raise" => Ok(Extrapolate::Raise),
+            _ => Err(PyValueError::new_err(format!(
+                "extrapolate must be 'clamp', 'extend', 'nan' or 'raise', not {s:?}"
+            ))),
+        }
+    }
+
+    fn name(self) -> &'static str {
+        match self {
+            Extrapolate::Clamp => "clamp",
+            Extrapolate::Extend => "extend",
+            Extrapolate::Nan => "nan",
+            Extrapolate::Raise => "raise",
+        }
+    }
+}
+
+/// The knots and everything precomputed from them, in base SI units.
+struct Table {
+    xs: Vec<f64>,
+    ys: Vec<f64>,
+    /// The spline's second derivative at each knot (cubic only).
+    curvature: Vec<f64>,
+    /// `(first knot, step)` when the knots are evenly spaced.
+    grid: Option<(f64, f64)>,
+    kind: Kind,
+    extrapolate: Extrapolate,
+}
+
+impl Table {
+    /// Checks the knots (at least two, `xs` strictly increasing) and
+    /// precomputes the search grid and spline.
+    fn new(xs: Vec<f64>, ys: Vec<f64>, kind: Kind, extrapolate: Extrapolate) -> PyResult<Table> {
+        if xs.len() != ys.len() {
+            return Err(PyValueError::new_err(format!(
+                "x and y must have the same length, not {} and {}",
+                xs.len(),
+                ys.len()
+            )));
+        }
+        if xs.len() < 2 {
+            return Err(PyValueError::new_err("Interp1D needs at least two knots"));
+        }
+        // Written so that NaN fails too.
+        if !xs.windows(2).all(|w| w[0] < w[1]) {
+            return Err(PyValueError::new_err("x must be strictly increasing"));
+        }
+        let curvature = match kind {
+            Kind::Linear => Vec::new(),
+            Kind::Cubic => natural_spline(&xs, &ys),
+        };
+        Ok(Table {
+            grid: uniform_grid(&xs),
+            xs,
+            ys,
+            curvature,
+            kind,
+            extrapolate,
+        })
+    }
+
+    /// Whether `v` lies outside the knots (NaN does not).
+    #[inline]
+    fn outside(&self, v: f64) -> bool {
+        v < self.xs[0] || v > self.xs[self.xs.len() - 1]
+    }
+
+    /// The segment `i` with `xs[i] <= v < xs[i + 1]`, limited to the first
+    /// and last segments.
+    #[inline]
+    fn segment(&self, v: f64) -> usize {
+        let last = self.xs.len() - 2;
+        let Some((x0, step)) = self.grid else {
+            return self
+                .xs
+                .partition_point(|&x| x <= v)
+                .saturating_sub(1)
+                .min(last);
+        };
+        let guess = ((v - x0) / step).floor();
+        // NaN and negative guesses land on 0.
+        let mut i = if guess > 0.0 {
+            (guess as usize).min(last)
+        } else {
+            0
+        };
+        // The knots are only evenly spaced to within rounding.
+        if i > 0 && v < self.xs[i] {
+            i -= 1;
+        } else if i < last && v >= self.xs[i + 1] {
+            i += 1;
+        }
+        i
+    }
+
+    /// The interpolated value at `v` (NaN outside the knots for the `Nan`
+    /// and `Raise` policies; callers check for `Raise` first).
+    #[inline]
+    fn eval(&self, v: f64) -> f64 {
+        let (xs, ys) = (&self.xs, &self.ys);
+        if self.outside(v) {
+            match self.extrapolate {
+                Extrapolate::Clamp if v < xs[0] => return ys[0],
+                Extrapolate::Clamp => return ys[ys.len() - 1],
+                Extrapolate::Nan | Extrapolate::Raise => return f64::NAN,
+                Extrapolate::Extend => {}
+            }
+        }
+        let i = self.segment(v);
+        let h = xs[i + 1] - xs[i];
+        let t = (v - xs[i]) / h;
+        match self.kind {
+            Kind::Linear => ys[i] + (ys[i + 1] - ys[i]) * t,
+            Kind::Cubic => {
+                let (a, b) = (1.0 - t, t);
+                let (m0, m1) = (self.curvature[i], self.curvature[i + 1]);
+                a * ys[i]
+                    + b * ys[i + 1]
+                    + ((a * a * a - a) * m0 + (b * b * b - b) * m1) * h * h / 6.0
+            }
+        }
+    }
+
+    fn out_of_range(&self) -> PyErr {
+        PyValueError::new_err(format!(
+            "value outside the interpolation range [{}, {}] (base SI units)",
+            self.xs[0],
+            self.xs[self.xs.len() - 1]
+        ))
+    }
+}
+
+/// `(first knot, step)` if `xs` is evenly spaced to within rounding.
+fn uniform_grid(xs: &[f64]) -> Option<(f64, f64)> {
+    let (x0, n) = (xs[0], xs.len());
+    let step = (xs[n - 1] - x0) / (n - 1) as f64;
+    let tolerance = step * 1e-9;
+    xs.iter()
+        .enumerate()
+        .all(|(i, &x)| (x - (x0 + i as f64 * step)).abs() <= tolerance)
+        .then_some((x0, step))
+}
+
+/// Second derivatives at the knots of the natural cubic spline through
+/// `(xs, ys)`: the tridiagonal system solved by the Thomas algorithm.
+fn natural_spline(xs: &[f64], ys: &[f64]) -> Vec<f64> {
+    let n = xs.len();
+    let mut m = vec![0.0; n];
+    if n < 3 {
+        return m;
+    }
+    let h = |i: usize| xs[i + 1] - xs[i];
+    let slope = |i: usize| (ys[i + 1] - ys[i]) / h(i);
+    let (mut diag, mut rhs) = (vec![0.0; n], vec![0.0; n]);
+    for i in 1..n - 1 {
+        let mut b = 2.0 * (h(i - 1) + h(i));
+        let mut d = 6.0 * (slope(i) - slope(i - 1));
+        if i > 1 {
+            let w = h(i - 1) / diag[i - 1];
+            b -= w * h(i - 1);
+            d -= w * rhs[i - 1];
+        }
+        diag[i] = b;
+        rhs[i] = d;
+    }
+    for i in (1..n - 1).rev() {
+        m[i] = (rhs[i] - h(i) * m[i + 1]) / diag[i];
+    }
+    m
+}
+
+/// The magnitudes of a 1-D real QuantityNP, in base SI units.
+fn knots(py: Python<'_>, q: &QuantityNP, what: &str) -> PyResult<Vec<f64>> {
+    let arr = q.storage.to_f64(py)?;
+    let view = arr.bind(py).readonly();
+    let view = view.as_array();
+    if view.ndim() != 1 {
+        return Err(PyValueError::new_err(format!("{what} must be 1-D")));
+    }
+    Ok(view.iter().copied().collect())
+}
+
+/// `Interp1D(x, y, kind="linear", extrapolate="clamp")` — a lookup table
+/// of `y` against the strictly increasing `x`, built once and then called
+/// with quantities in `x`'s units: `table(300*K)`.
+///
+/// `kind` is "linear" or "cubic" (a natural cubic spline). `extrapolate`
+/// says what lookups outside `x` give: "clamp" (the end values, as
+/// `np.interp`), "extend" (the end segments, continued), "nan" or "raise"
+/// (ValueError).
+#[pyclass(module = "misu._engine", frozen)]
+pub struct Interp1D {
+    table: Table,
+    x_dim: Dim,
+    y_dim: Dim,
+}
+
+impl Interp1D {
+    fn check(&self, dim: Dim) -> PyResult<()> {
+        if dim != self.x_dim {
+            return Err(EIncompatibleUnits::new_err(
+                "Incompatible units for Interp1D",
+            ));
+        }
+        Ok(())
+    }
+
+    fn knots_np(&self, py: Python<'_>, values: &[f64], dim: Dim) -> QuantityNP {
+        let arr =
+            ArrayD::from_shape_vec(IxDyn(&[values.len()]), values.to_vec()).expect("1-D shape");
+        QuantityNP::new(Storage::from_owned(py, arr), dim)
+    }
+}
+
+#[pymethods]
+impl Interp1D {
+    #[new]
+    #[pyo3(signature = (x, y, kind="linear", extrapolate="clamp"))]
+    fn new<'py>(
+        py: Python<'py>,
+        x: &Bound<'py, PyAny>,
+        y: &Bound<'py, PyAny>,
+        kind: &str,
+        extrapolate: &str,
+    ) -> PyResult<Self> {
+        let (x, y) = (QuantityNP::coerce(py, x)?, QuantityNP::coerce(py, y)?);
+        let table = Table::new(
+            knots(py, &x, "x")?,
+            knots(py, &y, "y")?,
+            Kind::parse(kind)?,
+            Extrapolate::parse(extrapolate)?,
+        )?;
+        Ok(Interp1D {
+            table,
+            x_dim: x.dim,
+            y_dim: y.dim,
+        })
+    }
+
+    /// `table(x)` — the interpolated value at `x`: a Quantity for a scalar,
+    /// a float64 QuantityNP of `x`'s shape for an array.
+    fn __call__<'py>(&self, py: Python<'py>, x: &Bound<'py, PyAny>) -> PyResult<Py<PyAny>> {
+        let table = &self.table;
+        if let Some(q) = Operand::classify(x)?.as_quantity() {
+            self.check(q.dim)?;
+            if table.extrapolate == Extrapolate::Raise && table.outside(q.magnitude) {
+                return Err(table.out_of_range());
+            }
+            let q = Quantity::new(table.eval(q.magnitude), self.y_dim);
+            return Ok(q.into_pyobject(py)?.into_any().unbind());
+        }
+        let Some(q) = QuantityNP::coerce_operand(py, x)? else {
+            return Err(PyTypeError::new_err(format!(
+                "Interp1D cannot look up a '{}'",
+                x.get_type().name()?
+            )));
+        };
+        self.check(q.dim)?;
+        let arr = q.storage.to_f64(py)?;
+        let view = arr.bind(py).readonly();
+        let view = view.as_array();
+        let raise = table.extrapolate == Extrapolate::Raise;
+        let result = parallel::detach(py, view.len(), || {
+            if raise && view.iter().any(|&v| table.outside(v)) {
+                return None;
+            }
+            Some(parallel::map(&view, |v| table.eval(v)))
+        });
+        let Some(result) = result else {
+            return Err(table.out_of_range());
+        };
+        let result = QuantityNP::new(Storage::from_owned(py, result), self.y_dim);
+        Ok(result.into_pyobject(py)?.into_any().unbind())
+    }
+
+    /// The knot positions, in base SI units.
+    #[getter]
+    fn x(&self, py: Python<'_>) -> QuantityNP {
+        self.knots_np(py, &self.table.xs, self.x_dim)
+    }
+
+    /// The values at the knots, in base SI units.
+    #[getter]
+    fn y(&self, py: Python<'_>) -> QuantityNP {
+        self.knots_np(py, &self.table.ys, self.y_dim)
+    }
+
+    #[getter]
+    fn kind(&self) -> &'static str {
+        self.table.kind.name()
+    }
+
+    #[getter]
+    fn extrapolate(&self) -> &'static str {
+        self.table.extrapolate.name()
+    }
+
+    fn __len__(&self) -> usize {
+        self.table.xs.len()
+    }
+
+    fn __repr__(&self) -> String {
+        format!(
+            "Interp1D(<{} knots>, kind='{}', extrapolate='{}')",
+            self.table.xs.len(),
+            self.kind(),
+            self.extrapolate()
+        )
+    }
+
+    fn __reduce__<'py>(slf: &Bound<'py, Self>, py: Python<'py>) -> PyResult<Bound<'py, PyTuple>> {
+        let this = slf.get();
+        let args = (this.x(py), this.y(py), this.kind(), this.extrapolate());
+        PyTuple::new(
+            py,
+            [
+                slf.get_type().into_any(),
+                args.into_pyobject(py)?.into_any(),
+            ],
+        )
+    }
+}
@@ -0,0 +1,451 @@
+//! Lazy, fused evaluation of `QuantityNP` expressions.
+//!
+//! `lazy(qnp)` wraps an array in a `LazyQuantityNP`. Arithmetic on it does
+//! no numerical work: each operator checks dimensions immediately (so unit
+//! errors surface where they are written) and records a node in a small
+//! expression tree. `evaluate()` — or any access that needs the numbers —
+//! compiles the tree to a stack program and runs it in one GIL-released
+//! pass over the inputs.
+//!
+//! The pass works in blocks of `BLOCK` elements: every intermediate result
+//! lives in a block-sized scratch buffer that stays in L1 cache, so an
+//! expression like `0.5 * rho * v**2 * area` reads each input once and
+//! writes the output once, with no full-size temporaries.
+//!
+//! The fused kernel runs in float64: float32 and fixed-point inputs are
+//! widened as they enter an expression, and complex inputs are rejected.
+
+use std::sync::Arc;
+
+use numpy::ndarray::{ArrayD, ArrayViewD};
+use numpy::{IntoPyArray, PyArrayDyn, PyArrayMethods, PyUntypedArray, PyUntypedArrayMethods};
+use pyo3::exceptions::{PyTypeError, PyValueError};
+use pyo3::prelude::*;
+use pyo3::types::PyTuple;
+
+use crate::dim::Dim;
+use crate::errors::EIncompatibleUnits;
+use crate::format;
+use crate::operand::{not_implemented, Operand};
+use crate::quantity_np::{BinOp, QuantityNP};
+use crate::storage::{broadcast_shape, Storage};
+
+/// Elements processed per block of the fused loop.
+const BLOCK: usize = 256;
+
+enum Expr {
+    Leaf(Py<PyArrayDyn<f64>>),
+    Scalar(f64),
+    Binary(BinOp, Arc<Expr>, Arc<Expr>),
+    Powf(Arc<Expr>, f64),
+    Neg(Arc<Expr>),
+    /// A named elementwise function (the name is for `repr`).
+    Call(&'static str, fn(f64) -> f64, Arc<Expr>),
+}
+
+impl Expr {
+    /// The shape of the result: the leaves' shapes, broadcast.
+    fn shape(&self, py: Python<'_>, shape: &mut Vec<usize>) -> PyResult<()> {
+        match self {
+            Expr::Leaf(arr) => *shape = broadcast_shape(shape, arr.bind(py).shape())?,
+            Expr::Scalar(_) => {}
+            Expr::Binary(_, lhs, rhs) => {
+                lhs.shape(py, shape)?;
+                rhs.shape(py, shape)?;
+            }
+            Expr::Powf(inner, _) | Expr::Neg(inner) | Expr::Call(_, _, inner) => {
+                inner.shape(py, shape)?
+            }
+        }
+        Ok(())
+    }
+
+    /// The expression as text, with leaves shown by their shapes:
+    /// `(0.5 * array[100]) ** 2.0`.
+    fn render(&self, py: Python<'_>, top: bool) -> String {
+        let text = match self {
+            Expr::Leaf(arr) => {
+                let dims: Vec<String> = arr.bind(py).shape().iter().map(|n| n.to_string()).collect();
+                return format!("array[{}]", dims.join(", "));
+            }
+            Expr::Scalar(v) => return format!("{v:?}"),
+            Expr::Call(name, _, inner) => return format!("{name}({})", inner.render(py, true)),
+            Expr::Binary(op, lhs, rhs) => {
+                let symbol = match op {
+                    BinOp::Add => "+",
+                    BinOp::Sub => "-",
+                    BinOp::Mul => "*",
+                    BinOp::Div => "/",
+                };
+                format!("{} {symbol} {}", lhs.render(py, false), rhs.render(py, false))
+            }
+            Expr::Powf(inner, exp) => format!("{} ** {exp:?}", inner.render(py, false)),
+            Expr::Neg(inner) => format!("-{}", inner.render(py, false)),
+        };
+        if top {
+            text
+        } else {
+            format!("({text})")
+        }
+    }
+}
+
+/// One instruction of the compiled stack program.
+#[derive(Clone, Copy)]
+enum Instr {
+    /// Push the next block of leaf `i`.
+    Leaf(usize),
+    Scalar(f64),
+    Binary(BinOp),
+    Powf(f64),
+    Neg,
+    Call(fn(f64) -> f64),
+}
+
+struct Program<'a> {
+    instrs: Vec<Instr>,
+    leaves: Vec<&'a Py<PyArrayDyn<f64>>>,
+    depth: usize,
+}
+
+impl<'a> Program<'a> {
+    fn compile(expr: &'a Expr) -> Self {
+        let mut program = Program {
+            instrs: Vec::new(),
+            leaves: Vec::new(),
+            depth: 0,
+        };
+        program.emit(expr, 0);
+        program
+    }
+
+    /// Post-order walk; `sp` is the stack depth before `expr` runs.
+    fn emit(&mut self, expr: &'a Expr, sp: usize) {
+        self.depth = self.depth.max(sp + 1);
+        match expr {
+            Expr::Leaf(arr) => {
+                self.instrs.push(Instr::Leaf(self.leaves.len()));
+                self.leaves.push(arr);
+            }
+            Expr::Scalar(v) => self.instrs.push(Instr::Scalar(*v)),
+            Expr::Binary(op, lhs, rhs) => {
+                self.emit(lhs, sp);
+                self.emit(rhs, sp + 1);
+                self.instrs.push(Instr::Binary(*op));
+            }
+            Expr::Powf(inner, exp) => {
+                self.emit(inner, sp);
+                self.instrs.push(Instr::Powf(*exp));
+            }
+            Expr::Neg(inner) => {
+                self.emit(inner, sp);
+                self.instrs.push(Instr::Neg);
+            }
+            Expr::Call(_, f, inner) => {
+                self.emit(inner, sp);
+                self.instrs.push(Instr::Call(*f));
+            }
+        }
+    }
+}
+
+/// Run `instrs` over `n` elements. Every leaf view already has the result
+/// shape (the caller broadcasts them), and is read in logical order.
+fn run(instrs: &[Instr], depth: usize, leaves: &[ArrayViewD<'_, f64>], n: usize) -> Vec<f64> {
+    let mut out = Vec::with_capacity(n);
+    let mut iters: Vec<_> = leaves.iter().map(|v| v.iter()).collect();
+    let mut stack = vec![[0.0f64; BLOCK]; depth];
+    let mut start = 0;
+    while start < n {
+        let len = BLOCK.min(n - start);
+        let mut sp = 0;
+        for instr in instrs {
+            match *instr {
+                Instr::Leaf(i) => {
+                    for (slot, &v) in stack[sp][..len].iter_mut().zip(&mut iters[i]) {
+                        *slot = v;
+                    }
+                    sp += 1;
+                }
+                Instr::Scalar(v) => {
+                    stack[sp][..len].fill(v);
+                    sp += 1;
+                }
+                Instr::Binary(op) => {
+                    sp -= 1;
+                    let (lo, hi) = stack.split_at_mut(sp);
+                    let a = &mut lo[sp - 1][..len];
+                    let b = &hi[0][..len];
+                    let pairs = a.iter_mut().zip(b);
+                    match op {
+                        BinOp::Add => pairs.for_each(|(x, &y)| *x += y),
+                        BinOp::Sub => pairs.for_each(|(x, &y)| *x -= y),
+                        BinOp::Mul => pairs.for_each(|(x, &y)| *x *= y),
+                        BinOp::Div => pairs.for_each(|(x, &y)| *x /= y),
+                    }
+                }
+                Instr::Powf(exp) => {
+                    stack[sp - 1][..len].iter_mut().for_each(|x| *x = x.powf(exp));
+                }
+                Instr::Neg => {
+                    stack[sp - 1][..len].iter_mut().for_each(|x| *x = -*x);
+                }
+                Instr::Call(f) => {
+                    stack[sp - 1][..len].iter_mut().for_each(|x| *x = f(*x));
+                }
+            }
+        }
+        out.extend_from_slice(&stack[0][..len]);
+        start += len;
+    }
+    out
+}
+
+#[pyclass(module = "misu._engine", frozen)]
+pub struct LazyQuantityNP {
+    expr: Arc<Expr>,
+    dim: Dim,
+}
+
+impl LazyQuantityNP {
+    /// The expression node and Dim for an operand, or `None` if the type
+    /// isn't supported.
+    fn operand_node<'py>(
+        py: Python<'py>,
+        obj: &Bound<'py, PyAny>,
+    ) -> PyResult<Option<(Arc<Expr>, Dim)>> {
+        if let Ok(lazy) = obj.cast::<LazyQuantityNP>() {
+            let lazy = lazy.get();
+            return Ok(Some((lazy.expr.clone(), lazy.dim)));
+        }
+        let node = match Operand::classify(obj)? {
+            Operand::Quantity(q) => (Arc::new(Expr::Scalar(q.magnitude)), q.dim),
+            Operand::Scalar(v) => (Arc::new(Expr::Scalar(v)), Dim::DIMENSIONLESS),
+            Operand::QuantityNP(_) | Operand::Array(_) => {
+                let q = QuantityNP::coerce(py, obj)?;
+                (Arc::new(Expr::Leaf(q.storage.to_f64(py)?)), q.dim)
+            }
+            Operand::Other => return Ok(None),
+        };
+        Ok(Some(node))
+    }
+
+    fn dispatch<'py>(
+        &self,
+        py: Python<'py>,
+        other: &Bound<'py, PyAny>,
+        op: BinOp,
+        reflected: bool,
+    ) -> PyResult<Py<PyAny>> {
+        let Some((node, dim)) = Self::operand_node(py, other)? else {
+            return not_implemented(py);
+        };
+        let (lhs, rhs) = if reflected {
+            ((node, dim), (self.expr.clone(), self.dim))
+        } else {
+            ((self.expr.clone(), self.dim), (node, dim))
+        };
+        let out = LazyQuantityNP {
+            dim: op.result_dim(&lhs.1, &rhs.1)?,
+            expr: Arc::new(Expr::Binary(op, lhs.0, rhs.0)),
+        };
+        Ok(out.into_pyobject(py)?.into_any().unbind())
+    }
+
+    fn call(&self, name: &'static str, f: fn(f64) -> f64) -> PyResult<LazyQuantityNP> {
+        if !self.dim.is_dimensionless() {
+            return Err(EIncompatibleUnits::new_err(
+                "Argument must be dimensionless.",
+            ));
+        }
+        Ok(LazyQuantityNP {
+            expr: Arc::new(Expr::Call(name, f, self.expr.clone())),
+            dim: Dim::DIMENSIONLESS,
+        })
+    }
+
+    /// The shape of the result, from the leaves alone.
+    fn shape(&self, py: Python<'_>) -> PyResult<Vec<usize>> {
+        let mut shape = Vec::new();
+        self.expr.shape(py, &mut shape)?;
+        Ok(shape)
+    }
+
+    pub fn evaluate_np(&self, py: Python<'_>) -> PyResult<QuantityNP> {
+        let program = Program::compile(&self.expr);
+        let readonly: Vec<_> = program
+            .leaves
+            .iter()
+            .map(|arr| arr.bind(py).readonly())
+            .collect();
+        let views: Vec<_> = readonly.iter().map(|r| r.as_array()).collect();
+        let shape = self.shape(py)?;
+        let broadcast: Vec<_> = views
+            .iter()
+            .map(|v| v.broadcast(shape.as_slice()).expect("shape checked"))
+            .collect();
+        let n = shape.iter().product();
+        let result = py.detach(|| run(&program.instrs, program.depth, &broadcast, n));
+        let result = ArrayD::from_shape_vec(shape, result)
+            .map_err(|e| PyValueError::new_err(e.to_string()))?;
+        Ok(QuantityNP::new(
+            Storage::F64(result.into_pyarray(py).unbind()),
+            self.dim,
+        ))
+    }
+}
+
+#[pymethods]
+impl LazyQuantityNP {
+    /// Run the fused kernel and return the result as a `QuantityNP`.
+    fn evaluate(&self, py: Python<'_>) -> PyResult<QuantityNP> {
+        self.evaluate_np(py)
+    }
+
+    #[getter]
+    fn magnitude<'py>(&self, py: Python<'py>) -> PyResult<Bound<'py, PyUntypedArray>> {
+        Ok(self.evaluate_np(py)?.storage.array(py))
+    }
+
+    fn unit_as_tuple<'py>(&self, py: Python<'py>) -> PyResult<Bound<'py, PyTuple>> {
+        PyTuple::new(py, self.dim.exponents())
+    }
+
+    fn convert<'py>(
+        &self,
+        py: Python<'py>,
+        target_unit: &Bound<'py, PyAny>,
+    ) -> PyResult<Bound<'py, PyAny>> {
+        let q = Bound::new(py, self.evaluate_np(py)?)?;
+        q.call_method1("convert", (target_unit,))
+    }
+
+    fn __rshift__<'py>(
+        &self,
+        py: Python<'py>,
+        other: &Bound<'py, PyAny>,
+    ) -> PyResult<Bound<'py, PyAny>> {
+        self.convert(py, other)
+    }
+
+    fn __str__(&self, py: Python<'_>) -> PyResult<String> {
+        let q = Bound::new(py, self.evaluate_np(py)?)?;
+        Ok(q.str()?.to_string())
+    }
+
+    /// The expression and its units; nothing is evaluated.
+    fn __repr__(&self, py: Python<'_>) -> String {
+        let unit = if self.dim.is_dimensionless() {
+            "dimensionless".to_string()
+        } else {
+            format::dim_string(&self.dim)
+        };
+        format!("LazyQuantityNP({}, unit='{unit}')", self.expr.render(py, true))
+    }
+
+    /// The length of the result's first axis; nothing is evaluated.
+    fn __len__(&self, py: Python<'_>) -> PyResult<usize> {
+        match self.shape(py)?.first() {
+            Some(&n) => Ok(n),
+            None => Err(PyTypeError::new_err("len() of unsized object")),
+        }
+    }
+
+    /// The shape of the result; nothing is evaluated.
+    #[getter(shape)]
+    fn py_shape<'py>(&self, py: Python<'py>) -> PyResult<Bound<'py, PyTuple>> {
+        PyTuple::new(py, self.shape(py)?)
+    }
+
+    // ---- arithmetic: builds nodes, checks dims ---------------------------
+
+    fn __add__<'py>(&self, py: Python<'py>, other: Bound<'py, PyAny>) -> PyResult<Py<PyAny>> {
+        self.dispatch(py, &other, BinOp::Add, false)
+    }
+
+    fn __radd__<'py>(&self, py: Python<'py>, other: Bound<'py, PyAny>) -> PyResult<Py<PyAny>> {
+        self.dispatch(py, &other, BinOp::Add, true)
+    }
+
+    fn __sub__<'py>(&self, py: Python<'py>, other: Bound<'py, PyAny>) -> PyResult<Py<PyAny>> {
+        self.dispatch(py, &other, BinOp::Sub, false)
+    }
+
+    fn __rsub__<'py>(&self, py: Python<'py>, other: Bound<'py, PyAny>) -> PyResult<Py<PyAny>> {
+        self.dispatch(py, &other, BinOp::Sub, true)
+    }
+
+    fn __mul__<'py>(&self, py: Python<'py>, other: Bound<'py, PyAny>) -> PyResult<Py<PyAny>> {
+        self.dispatch(py, &other, BinOp::Mul, false)
+    }
+
+    fn __rmul__<'py>(&self, py: Python<'py>, other: Bound<'py, PyAny>) -> PyResult<Py<PyAny>> {
+        self.dispatch(py, &other, BinOp::Mul, true)
+    }
+
+    fn __truediv__<'py>(&self, py: Python<'py>, other: Bound<'py, PyAny>) -> PyResult<Py<PyAny>> {
+        self.dispatch(py, &other, BinOp::Div, false)
+    }
+
+    fn __rtruediv__<'py>(&self, py: Python<'py>, other: Bound<'py, PyAny>) -> PyResult<Py<PyAny>> {
+        self.dispatch(py, &other, BinOp::Div, true)
+    }
+
+    fn __pow__(&self, other: f64, modulo: Option<Bound<'_, PyAny>>) -> LazyQuantityNP {
+        let _ = modulo;
+        LazyQuantityNP {
+            expr: Arc::new(Expr::Powf(self.expr.clone(), other)),
+            dim: self.dim.scale(other),
+        }
+    }
+
+    fn __neg__(&self) -> LazyQuantityNP {
+        LazyQuantityNP {
+            expr: Arc::new(Expr::Neg(self.expr.clone())),
+            dim: self.dim,
+        }
+    }
+
+    // numpy-style elementwise math (dimensionless only)
+    fn sin(&self) -> PyResult<LazyQuantityNP> { self.call("sin", f64::sin) }
+    fn cos(&self) -> PyResult<LazyQuantityNP> { self.call("cos", f64::cos) }
+    fn tan(&self) -> PyResult<LazyQuantityNP> { self.call("tan", f64::tan) }
+    fn arcsin(&self) -> PyResult<LazyQuantityNP> { self.call("arcsin", f64::asin) }
+    fn arccos(&self) -> PyResult<LazyQuantityNP> { self.call("arccos", f64::acos) }
+    fn arctan(&self) -> PyResult<LazyQuantityNP> { self.call("arctan", f64::atan) }
+    fn degrees(&self) -> PyResult<LazyQuantityNP> { self.call("degrees", f64::to_degrees) }
+    fn radians(&self) -> PyResult<LazyQuantityNP> { self.call("radians", f64::to_radians) }
+    fn deg2rad(&self) -> PyResult<LazyQuantityNP> { self.call("deg2rad", f64::to_radians) }
+    fn rad2deg(&self) -> PyResult<LazyQuantityNP> { self.call("rad2deg", f64::to_degrees) }
+    fn sinh(&self) -> PyResult<LazyQuantityNP> { self.call("sinh", f64::sinh) }
+    fn cosh(&self) -> PyResult<LazyQuantityNP> { self.call("cosh", f64::cosh) }
+    fn tanh(&self) -> PyResult<LazyQuantityNP> { self.call("tanh", f64::tanh) }
+    fn arcsinh(&self) -> PyResult<LazyQuantityNP> { self.call("arcsinh", f64::asinh) }
+    fn arccosh(&self) -> PyResult<LazyQuantityNP> { self.call("arccosh", f64::acosh) }
+    fn arctanh(&self) -> PyResult<LazyQuantityNP> { self.call("arctanh", f64::atanh) }
+    fn exp(&self) -> PyResult<LazyQuantityNP> { self.call("exp", f64::exp) }
+    fn expm1(&self) -> PyResult<LazyQuantityNP> { self.call("expm1", f64::exp_m1) }
+    fn exp2(&self) -> PyResult<LazyQuantityNP> { self.call("exp2", f64::exp2) }
+    fn log(&self) -> PyResult<LazyQuantityNP> { self.call("log", f64::ln) }
+    fn log10(&self) -> PyResult<LazyQuantityNP> { self.call("log10", f64::log10) }
+    fn log2(&self) -> PyResult<LazyQuantityNP> { self.call("log2", f64::log2) }
+    fn log1p(&self) -> PyResult<LazyQuantityNP> { self.call("log1p", f64::ln_1p) }
+}
+
+/// `lazy(qnp)` — start a lazily evaluated expression from a `QuantityNP`
+/// (or anything `QuantityNP()` accepts).
+#[pyfunction]
+pub fn lazy(py: Python<'_>, obj: Bound<'_, PyAny>) -> PyResult<LazyQuantityNP> {
+    if let Ok(l) = obj.cast::<LazyQuantityNP>() {
+        let l = l.get();
+        return Ok(LazyQuantityNP {
+            expr: l.expr.clone(),
+            dim: l.dim,
+        });
+    }
+    let q = QuantityNP::coerce(py, &obj)?;
+    Ok(LazyQuantityNP {
+        expr: Arc::new(Expr::Leaf(q.storage.to_f64(py)?)),
+        dim: q.dim,
+    })
+}
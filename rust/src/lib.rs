@@ -5,29 +5,64 @@
 //! misu Rust core (`misu._engine`).
 //!
 //! Exposes:
-//! - `Quantity`, `QuantityNP` pyclasses
+//! - `Quantity`, `QuantityNP`, `LazyQuantityNP` pyclasses
+//! - `QuantityVec2`, `QuantityVec3` — fixed-size vector quantities (see
+//!   `vector.rs`)
+//! - `Interp1D` — precomputed unit-aware interpolation tables (see
+//!   `interp.rs`)
 //! - `EIncompatibleUnits`, `ESignatureAlreadyRegistered` exceptions
 //! - `addType(quantity, name)` — register a Dim → category-name mapping
 //! - `dimensions(**kwargs)` decorator
 //! - `quantity_from_string(s)` parser
+//! - `lazy(qnp)` — start a fused, lazily evaluated array expression
+//! - `qsum`, `qmean`, `qmin`, `qmax`, `qsorted` — aggregates over plain
+//!   sequences of scalar quantities (see `aggregate.rs`)
+//! - `axpy`, `lerp`, `hypot`, `clip`, `fma` — fused single-pass array
+//!   kernels (see `fused.rs`)
+//! - `_integrate(...)` — the ODE integration loop behind `misu.integrate`
+//!   (see `integrate.rs`)
+//! - `set_num_threads(n)` / `get_num_threads()` — the thread budget of the
+//!   array kernels (see `parallel.rs`)
+//! - `QUANTITY_FREELIST_CAPACITY` — size cap of the scalar `Quantity`
+//!   free-list (see `quantity.rs`)
 //! - module-level `RepresentCache` (mirror of the Cython global; provided
 //!   only so any user code that touched it still finds a dict-like there).
 
+mod aggregate;
+mod calculus;
 mod dim;
 mod errors;
 mod format;
+mod fused;
+mod integrate;
+mod interp;
+mod lazy;
+mod operand;
+mod parallel;
 mod parser;
 mod quantity;
 mod quantity_np;
+mod reduce;
 mod registry;
+mod search;
+mod storage;
+mod ufunc;
+mod vector;
+mod vmath;
 
 use pyo3::prelude::*;
 use pyo3::types::PyDict;
 
+use crate::aggregate::{qmax, qmean, qmin, qsorted, qsum};
 use crate::errors::{EIncompatibleUnits, ESignatureAlreadyRegistered};
-use crate::quantity::Quantity;
+use crate::fused::{axpy, clip, fma, hypot, lerp};
+use crate::integrate::_integrate;
+use crate::interp::Interp1D;
+use crate::lazy::{lazy, LazyQuantityNP};
+use crate::quantity::{Quantity, QUANTITY_FREELIST_CAPACITY};
 use crate::quantity_np::{_restore_quantity_np, QuantityNP};
 use crate::registry::QUANTITY_TYPE;
+use crate::vector::{QuantityVec2, QuantityVec3};
 
 /// `addType(quantity, name)` — registers a Dim → category-name mapping.
 #[pyfunction]
@@ -81,6 +116,11 @@ fn quantity_from_string<'py>(
 fn _engine(m: &Bound<'_, PyModule>) -> PyResult<()> {
     m.add_class::<Quantity>()?;
     m.add_class::<QuantityNP>()?;
+    m.add_class::<LazyQuantityNP>()?;
+    m.add_class::<QuantityVec2>()?;
+    m.add_class::<QuantityVec3>()?;
+    m.add_class::<Interp1D>()?;
+    m.add("QUANTITY_FREELIST_CAPACITY", QUANTITY_FREELIST_CAPACITY)?;
     m.add(
         "EIncompatibleUnits",
         m.py().get_type::<EIncompatibleUnits>(),
@@ -92,6 +132,20 @@ fn _engine(m: &Bound<'_, PyModule>) -> PyResult<()> {
     m.add_function(wrap_pyfunction!(addType, m)?)?;
     m.add_function(wrap_pyfunction!(dimensions, m)?)?;
     m.add_function(wrap_pyfunction!(quantity_from_string, m)?)?;
+    m.add_function(wrap_pyfunction!(lazy, m)?)?;
+    m.add_function(wrap_pyfunction!(qsum, m)?)?;
+    m.add_function(wrap_pyfunction!(qmean, m)?)?;
+    m.add_function(wrap_pyfunction!(qmin, m)?)?;
+    m.add_function(wrap_pyfunction!(qmax, m)?)?;
+    m.add_function(wrap_pyfunction!(qsorted, m)?)?;
+    m.add_function(wrap_pyfunction!(axpy, m)?)?;
+    m.add_function(wrap_pyfunction!(lerp, m)?)?;
+    m.add_function(wrap_pyfunction!(hypot, m)?)?;
+    m.add_function(wrap_pyfunction!(clip, m)?)?;
+    m.add_function(wrap_pyfunction!(fma, m)?)?;
+    m.add_function(wrap_pyfunction!(_integrate, m)?)?;
+    m.add_function(wrap_pyfunction!(parallel::set_num_threads, m)?)?;
+    m.add_function(wrap_pyfunction!(parallel::get_num_threads, m)?)?;
     m.add_function(wrap_pyfunction!(_restore_quantity_np, m)?)?;
     m.add_function(wrap_pyfunction!(_unit_registry_set, m)?)?;
     Ok(())
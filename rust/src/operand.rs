@@ -0,0 +1,76 @@
+//! Operand classification for the binary operators.
+//!
+//! Every `__add__` / `__mul__` / ... used to find out what its right-hand
+//! side was by trying `extract::<Quantity>()`, then `extract::<f64>()`,
+//! and so on — each failed attempt builds (and throws away) a Python
+//! exception. `Operand::classify` instead looks at the operand's type once,
+//! using only type checks, so the common `quantity * 2.0` case never
+//! touches the error machinery.
+
+use numpy::PyUntypedArray;
+use pyo3::prelude::*;
+use pyo3::types::{PyFloat, PyInt};
+
+use crate::dim::Dim;
+use crate::quantity::Quantity;
+use crate::quantity_np::QuantityNP;
+
+pub enum Operand<'a, 'py> {
+    Quantity(&'a Quantity),
+    QuantityNP(&'a Bound<'py, QuantityNP>),
+    /// A Python `float` or `int` (or anything else convertible to `f64`),
+    /// treated as a dimensionless magnitude.
+    Scalar(f64),
+    /// A numpy ndarray of any dtype and shape.
+    Array(&'a Bound<'py, PyUntypedArray>),
+    /// Anything else: binary operators return `NotImplemented`.
+    Other,
+}
+
+impl<'a, 'py> Operand<'a, 'py> {
+    pub fn classify(obj: &'a Bound<'py, PyAny>) -> PyResult<Self> {
+        if let Ok(q) = obj.cast::<Quantity>() {
+            return Ok(Operand::Quantity(q.get()));
+        }
+        if let Ok(f) = obj.cast::<PyFloat>() {
+            return Ok(Operand::Scalar(f.value()));
+        }
+        if let Ok(q) = obj.cast::<QuantityNP>() {
+            return Ok(Operand::QuantityNP(q));
+        }
+        if obj.is_instance_of::<PyInt>() {
+            // Only fails for ints too large for an f64 — a genuine error.
+            return Ok(Operand::Scalar(obj.extract::<f64>()?));
+        }
+        if let Ok(arr) = obj.cast::<PyUntypedArray>() {
+            return Ok(Operand::Array(arr));
+        }
+        // Rare path: numpy scalars, Decimal, Fraction and friends. This is
+        // the only arm that may build a throwaway exception.
+        match obj.extract::<f64>() {
+            Ok(v) => Ok(Operand::Scalar(v)),
+            Err(_) => Ok(Operand::Other),
+        }
+    }
+
+    /// True for operands that route through the ndarray-backed path.
+    #[inline]
+    pub fn is_array(&self) -> bool {
+        matches!(self, Operand::QuantityNP(_) | Operand::Array(_))
+    }
+
+    /// The operand as a scalar Quantity, if it is one (or a bare number).
+    #[inline]
+    pub fn as_quantity(&self) -> Option<Quantity> {
+        match self {
+            Operand::Quantity(q) => Some((*q).clone()),
+            Operand::Scalar(v) => Some(Quantity::new(*v, Dim::DIMENSIONLESS)),
+            _ => None,
+        }
+    }
+}
+
+/// `NotImplemented`, for binary operators handed an operand they don't know.
+pub fn not_implemented(py: Python<'_>) -> PyResult<Py<PyAny>> {
+    Ok(py.NotImplemented().into_pyobject(py)?.into_any().unbind())
+}
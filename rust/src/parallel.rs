@@ -0,0 +1,281 @@
+//! Multi-core execution of the elementwise `QuantityNP` kernels.
+//!
+//! A large kernel is cut into one piece per thread along the output's
+//! longest axis. The calling thread runs the first piece and a persistent
+//! pool of worker threads runs the rest; the pool is started on first use
+//! and grows to the largest thread budget seen, so a kernel call costs a
+//! queue push per piece rather than a thread spawn. Small arrays stay on
+//! the calling thread: below `PARALLEL_MIN` elements per thread, handing
+//! out pieces costs more than it saves, and below `DETACH_MIN` elements
+//! the kernel does not even release the GIL.
+//!
+//! Every element is computed by the same expression whichever piece it
+//! lands in, so results do not depend on the thread count.
+//!
+//! The thread budget comes from `set_num_threads()`, else the
+//! `MISU_NUM_THREADS` environment variable, else the number of CPUs.
+
+use std::mem::MaybeUninit;
+use std::ops::Range;
+use std::panic::{self, AssertUnwindSafe};
+use std::sync::atomic::{AtomicUsize, Ordering};
+use std::sync::mpsc::{self, Receiver, Sender};
+use std::sync::{Arc, Condvar, Mutex};
+
+use numpy::ndarray::{ArrayD, ArrayViewD, ArrayViewMutD, Axis, Slice, Zip};
+use pyo3::exceptions::PyValueError;
+use pyo3::prelude::*;
+
+/// Elements per thread below which splitting doesn't pay.
+const PARALLEL_MIN: usize = 1 << 15;
+/// Elements below which the GIL is kept for the whole kernel.
+const DETACH_MIN: usize = 1 << 10;
+
+/// The thread budget; 0 until first resolved.
+static NUM_THREADS: AtomicUsize = AtomicUsize::new(0);
+
+fn default_threads() -> usize {
+    std::env::var("MISU_NUM_THREADS")
+        .ok()
+        .and_then(|v| v.trim().parse::<usize>().ok())
+        .filter(|&n| n > 0)
+        .or_else(|| std::thread::available_parallelism().ok().map(|n| n.get()))
+        .unwrap_or(1)
+}
+
+pub fn num_threads() -> usize {
+    match NUM_THREADS.load(Ordering::Relaxed) {
+        0 => {
+            let n = default_threads();
+            NUM_THREADS.store(n, Ordering::Relaxed);
+            n
+        }
+        n => n,
+    }
+}
+
+/// `set_num_threads(n)` — the most threads a single array operation may
+/// use. `None` restores the default (`MISU_NUM_THREADS`, else the CPU
+/// count); 1 keeps every kernel on the calling thread.
+#[pyfunction]
+#[pyo3(signature = (n=None))]
+pub fn set_num_threads(n: Option<usize>) -> PyResult<()> {
+    let n = match n {
+        Some(0) => return Err(PyValueError::new_err("the thread count must be at least 1")),
+        Some(n) => n,
+        None => default_threads(),
+    };
+    NUM_THREADS.store(n, Ordering::Relaxed);
+    Ok(())
+}
+
+/// `get_num_threads()` — the current thread budget.
+#[pyfunction]
+pub fn get_num_threads() -> usize {
+    num_threads()
+}
+
+/// How many threads a kernel over `len` elements should use.
+fn threads_for(len: usize) -> usize {
+    (len / PARALLEL_MIN).clamp(1, num_threads())
+}
+
+/// Run `f` with the GIL released, unless the array is too small for that
+/// to pay off.
+pub fn detach<R: Send>(py: Python<'_>, len: usize, f: impl FnOnce() -> R + Send) -> R {
+    if len < DETACH_MIN {
+        f()
+    } else {
+        py.detach(f)
+    }
+}
+
+/// A piece of work for the pool. Its borrows are erased to `'static` by
+/// `run_all`, which waits for it before they end.
+type Job = Box<dyn FnOnce() + Send + 'static>;
+
+/// The worker threads, which take jobs off one shared queue.
+struct Pool {
+    /// The process that started the workers: a forked child has none.
+    pid: u32,
+    queue: Sender<Job>,
+    jobs: Arc<Mutex<Receiver<Job>>>,
+    workers: usize,
+}
+
+static POOL: Mutex<Option<Pool>> = Mutex::new(None);
+
+impl Pool {
+    fn new() -> Pool {
+        let (queue, jobs) = mpsc::channel();
+        Pool { pid: std::process::id(), queue, jobs: Arc::new(Mutex::new(jobs)), workers: 0 }
+    }
+
+    /// Start workers until there are `n`, or the OS refuses more. Returns
+    /// how many there are.
+    fn grow(&mut self, n: usize) -> usize {
+        while self.workers < n {
+            let jobs = Arc::clone(&self.jobs);
+            let worker = std::thread::Builder::new()
+                .name(format!("misu-worker-{}", self.workers))
+                .spawn(move || loop {
+                    // The lock is held only while waiting, not while running.
+                    let job = jobs.lock().unwrap_or_else(|e| e.into_inner()).recv();
+                    match job {
+                        Ok(job) => job(),
+                        Err(_) => return,
+                    }
+                });
+            if worker.is_err() {
+                break;
+            }
+            self.workers += 1;
+        }
+        self.workers
+    }
+}
+
+/// Counts down the jobs of one `run_all` call.
+struct Latch {
+    /// Jobs still running, and whether any of them panicked.
+    state: Mutex<(usize, bool)>,
+    done: Condvar,
+}
+
+impl Latch {
+    fn finish(&self, panicked: bool) {
+        let mut state = self.state.lock().unwrap_or_else(|e| e.into_inner());
+        state.0 -= 1;
+        state.1 |= panicked;
+        if state.0 == 0 {
+            self.done.notify_all();
+        }
+    }
+
+    /// Block until every job has finished; true if one of them panicked.
+    fn wait(&self) -> bool {
+        let mut state = self.state.lock().unwrap_or_else(|e| e.into_inner());
+        while state.0 > 0 {
+            state = self.done.wait(state).unwrap_or_else(|e| e.into_inner());
+        }
+        state.1
+    }
+}
+
+/// Run every job, the first on the calling thread and the rest on the
+/// pool, returning once all of them have finished.
+fn run_all<'a>(mut jobs: Vec<Box<dyn FnOnce() + Send + 'a>>) {
+    let rest = jobs.split_off(jobs.len().min(1));
+    let latch = Arc::new(Latch { state: Mutex::new((rest.len(), false)), done: Condvar::new() });
+    {
+        let mut pool = POOL.lock().unwrap_or_else(|e| e.into_inner());
+        if pool.as_ref().is_none_or(|p| p.pid != std::process::id()) {
+            *pool = Some(Pool::new());
+        }
+        let pool = pool.as_mut().expect("set above");
+        if pool.grow(rest.len()) == 0 {
+            drop(latch);
+            return jobs.into_iter().chain(rest).for_each(|job| job());
+        }
+        for job in rest {
+            let latch = Arc::clone(&latch);
+            let job: Box<dyn FnOnce() + Send + 'a> = Box::new(move || {
+                let result = panic::catch_unwind(AssertUnwindSafe(job));
+                latch.finish(result.is_err());
+            });
+            // SAFETY: `latch.wait()` below doesn't return before this job has
+            // run, so nothing it borrows ends while it can still be used.
+            let job: Job = unsafe { std::mem::transmute(job) };
+            pool.queue.send(job).expect("the pool holds the receiving end");
+        }
+    }
+    let first = panic::catch_unwind(AssertUnwindSafe(|| jobs.into_iter().for_each(|job| job())));
+    let worker_panicked = latch.wait();
+    if let Err(payload) = first {
+        panic::resume_unwind(payload);
+    }
+    assert!(!worker_panicked, "a misu worker thread panicked");
+}
+
+/// The part of the output a kernel call is working on.
+pub enum Part {
+    Whole,
+    Slice(Axis, Range<usize>),
+}
+
+impl Part {
+    /// The matching part of an input of the output's shape.
+    pub fn cut<'v, A>(&self, view: &'v ArrayViewD<'_, A>) -> ArrayViewD<'v, A> {
+        match self {
+            Part::Whole => view.view(),
+            Part::Slice(axis, range) => view.slice_axis(*axis, Slice::from(range.clone())),
+        }
+    }
+}
+
+/// Call `kernel` on pieces of `out` covering all of it, on up to
+/// `num_threads()` threads. The kernel gets the piece and where it lies, so
+/// it can cut its inputs (which must have `out`'s shape) to match.
+pub fn for_each_chunk<T: Send>(
+    mut out: ArrayViewMutD<'_, T>,
+    kernel: impl Fn(ArrayViewMutD<'_, T>, &Part) + Sync,
+) {
+    let threads = threads_for(out.len());
+    if threads == 1 || out.ndim() == 0 {
+        return kernel(out.view_mut(), &Part::Whole);
+    }
+    let axis = (0..out.ndim())
+        .map(Axis)
+        .max_by_key(|&a| (out.len_of(a), usize::MAX - a.index()))
+        .expect("ndim > 0");
+    let size = out.len_of(axis).div_ceil(threads);
+    let kernel = &kernel;
+    let jobs = out
+        .axis_chunks_iter_mut(axis, size)
+        .enumerate()
+        .map(|(i, piece)| {
+            let start = i * size;
+            let part = Part::Slice(axis, start..start + piece.len_of(axis));
+            Box::new(move || kernel(piece, &part)) as Box<dyn FnOnce() + Send + '_>
+        })
+        .collect();
+    run_all(jobs);
+}
+
+/// `f` applied to each element of `a`, as a new array.
+pub fn map<A: Copy + Sync, B: Send>(a: &ArrayViewD<'_, A>, f: impl Fn(A) -> B + Sync) -> ArrayD<B> {
+    if threads_for(a.len()) == 1 {
+        return a.mapv(f);
+    }
+    let mut out = ArrayD::<B>::uninit(a.raw_dim());
+    for_each_chunk(out.view_mut(), |piece, part| {
+        Zip::from(piece).and(&part.cut(a)).for_each(|o: &mut MaybeUninit<B>, &x| {
+            o.write(f(x));
+        });
+    });
+    // SAFETY: the pieces cover `out`, and each wrote every element it holds.
+    unsafe { out.assume_init() }
+}
+
+/// `f` applied to matching elements of `a` and `b` (of the same shape), as
+/// a new array.
+pub fn zip<A: Copy + Sync, B: Copy + Sync, C: Send>(
+    a: &ArrayViewD<'_, A>,
+    b: &ArrayViewD<'_, B>,
+    f: impl Fn(A, B) -> C + Sync,
+) -> ArrayD<C> {
+    if threads_for(a.len()) == 1 {
+        return Zip::from(a).and(b).map_collect(|&x, &y| f(x, y));
+    }
+    let mut out = ArrayD::<C>::uninit(a.raw_dim());
+    for_each_chunk(out.view_mut(), |piece, part| {
+        Zip::from(piece)
+            .and(&part.cut(a))
+            .and(&part.cut(b))
+            .for_each(|o: &mut MaybeUninit<C>, &x, &y| {
+                o.write(f(x, y));
+            });
+    });
+    // SAFETY: as in `map`.
+    unsafe { out.assume_init() }
+}
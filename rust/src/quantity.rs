@@ -6,6 +6,13 @@
 //! free-threading-safe without any explicit `py.detach()` /
 //! `Python::allow_threads` calls. (Compare `quantity_np.rs`, where the
 //! ndarray-backed loops do release the GIL explicitly.)
+//!
+//! Arithmetic produces a fresh `Quantity` per operation, so tight loops
+//! churn through millions of short-lived objects. The class therefore
+//! keeps a bounded free-list (PyO3's `freelist` option): deallocated
+//! instances are parked and handed back to the next allocation instead
+//! of going through the Python allocator. The list is guarded by a mutex
+//! on free-threaded builds.
 
 use pyo3::class::basic::CompareOp;
 use pyo3::exceptions::PyAssertionError;
@@ -15,10 +22,21 @@ use pyo3::types::{PyDict, PyTuple};
 use crate::dim::Dim;
 use crate::errors::EIncompatibleUnits;
 use crate::format::{self, SYMBOLS};
-use crate::quantity_np::QuantityNP;
+use crate::operand::{not_implemented, Operand};
+use crate::quantity_np::{BinOp, QuantityNP};
 use crate::registry::{QUANTITY_TYPE, REPRESENT_CACHE, RepresentEntry};
-
-#[pyclass(module = "misu._engine", frozen, from_py_object)]
+use crate::ufunc;
+
+/// Upper bound on recycled `Quantity` objects kept alive by the free-list.
+/// Exposed to Python as `misu._engine.QUANTITY_FREELIST_CAPACITY`.
+pub const QUANTITY_FREELIST_CAPACITY: usize = 1024;
+
+#[pyclass(
+    module = "misu._engine",
+    frozen,
+    from_py_object,
+    freelist = QUANTITY_FREELIST_CAPACITY
+)]
 #[derive(Clone)]
 pub struct Quantity {
     pub magnitude: f64,
@@ -31,17 +49,6 @@ impl Quantity {
         Quantity { magnitude, dim }
     }
 
-    /// Coerce a Bound PyAny to a Quantity (cloning if it already is one,
-    /// wrapping a Python float/int as a dimensionless Quantity otherwise).
-    pub fn coerce(obj: &Bound<'_, PyAny>) -> PyResult<Quantity> {
-        if let Ok(q) = obj.extract::<Quantity>() {
-            Ok(q)
-        } else {
-            let mag = obj.extract::<f64>()?;
-            Ok(Quantity::new(mag, Dim::DIMENSIONLESS))
-        }
-    }
-
     pub fn assert_same_units(&self, other: &Quantity) -> PyResult<()> {
         if self.dim != other.dim {
             Err(EIncompatibleUnits::new_err(format!(
@@ -100,7 +107,7 @@ impl Quantity {
                 }
                 let mut arr = [0.0; 7];
                 arr.copy_from_slice(&v);
-                Dim(arr)
+                Dim::from_exponents(arr)
             }
         };
         Ok(Quantity::new(magnitude, dim))
@@ -112,13 +119,42 @@ impl Quantity {
         20.0
     }
 
+    /// numpy ufunc hook; see `ufunc.rs`.
+    #[pyo3(signature = (ufunc, method, *inputs, **kwargs))]
+    fn __array_ufunc__<'py>(
+        &self,
+        py: Python<'py>,
+        ufunc: Bound<'py, PyAny>,
+        method: &str,
+        inputs: Bound<'py, PyTuple>,
+        kwargs: Option<Bound<'py, PyDict>>,
+    ) -> PyResult<Py<PyAny>> {
+        ufunc::array_ufunc(py, &ufunc, method, &inputs, kwargs.as_ref())
+    }
+
+    /// numpy function hook (`np.concatenate`, `np.where`, ...); the unit
+    /// handling lives in `misu._array_function`.
+    fn __array_function__<'py>(
+        &self,
+        py: Python<'py>,
+        func: Bound<'py, PyAny>,
+        types: Bound<'py, PyAny>,
+        args: Bound<'py, PyAny>,
+        kwargs: Bound<'py, PyAny>,
+    ) -> PyResult<Bound<'py, PyAny>> {
+        let helpers = py.import("misu._array_function")?;
+        helpers
+            .getattr("array_function")?
+            .call1((func, types, args, kwargs))
+    }
+
     #[getter]
     fn magnitude(&self) -> f64 {
         self.magnitude
     }
 
     fn unit_as_tuple<'py>(&self, py: Python<'py>) -> PyResult<Bound<'py, PyTuple>> {
-        PyTuple::new(py, self.dim.0.iter().copied())
+        PyTuple::new(py, self.dim.exponents())
     }
 
     fn as_tuple<'py>(&self, py: Python<'py>) -> PyResult<Bound<'py, PyTuple>> {
@@ -133,11 +169,11 @@ impl Quantity {
     }
 
     fn units(&self) -> Vec<f64> {
-        self.dim.0.to_vec()
+        self.dim.exponents().to_vec()
     }
 
     fn getunit(&self) -> Vec<f64> {
-        self.dim.0.to_vec()
+        self.dim.exponents().to_vec()
     }
 
     fn setunit(&self, _unit: Vec<f64>) -> PyResult<()> {
@@ -158,7 +194,7 @@ impl Quantity {
     ) -> PyResult<Bound<'py, PyTuple>> {
         let module = py.import("misu._engine")?;
         let ctor = module.getattr("Quantity")?;
-        let unit_list = PyTuple::new(py, self.dim.0.iter().copied())?;
+        let unit_list = PyTuple::new(py, self.dim.exponents())?;
         let args = PyTuple::new(
             py,
             [
@@ -252,19 +288,24 @@ impl Quantity {
     }
 
     // ---- arithmetic ------------------------------------------------------
+    //
+    // Each operator classifies its operand once (see `operand.rs`), then
+    // routes to the scalar kernel, the ndarray-backed path, or returns
+    // `NotImplemented` so Python can try the reflected operation.
 
     fn __add__<'py>(
         slf: &Bound<'py, Self>,
         py: Python<'py>,
         other: Bound<'py, PyAny>,
     ) -> PyResult<Py<PyAny>> {
-        if is_arraylike(&other) {
-            let lhs = QuantityNP::from_quantity(py, &slf.borrow())?;
-            let rhs = QuantityNP::coerce(py, &other)?;
-            return Ok(lhs.add(py, &rhs)?.into_pyobject(py)?.into_any().unbind());
+        let operand = Operand::classify(&other)?;
+        if operand.is_array() {
+            return array_op(py, slf.get(), &other, BinOp::Add, false);
         }
-        let a = slf.borrow();
-        let b = Quantity::coerce(&other)?;
+        let Some(b) = operand.as_quantity() else {
+            return not_implemented(py);
+        };
+        let a = slf.get();
         a.assert_same_units(&b)?;
         Ok(Quantity::new(a.magnitude + b.magnitude, a.dim)
             .into_pyobject(py)?
@@ -285,13 +326,14 @@ impl Quantity {
         py: Python<'py>,
         other: Bound<'py, PyAny>,
     ) -> PyResult<Py<PyAny>> {
-        if is_arraylike(&other) {
-            let lhs = QuantityNP::from_quantity(py, &slf.borrow())?;
-            let rhs = QuantityNP::coerce(py, &other)?;
-            return Ok(lhs.sub(py, &rhs)?.into_pyobject(py)?.into_any().unbind());
+        let operand = Operand::classify(&other)?;
+        if operand.is_array() {
+            return array_op(py, slf.get(), &other, BinOp::Sub, false);
         }
-        let a = slf.borrow();
-        let b = Quantity::coerce(&other)?;
+        let Some(b) = operand.as_quantity() else {
+            return not_implemented(py);
+        };
+        let a = slf.get();
         a.assert_same_units(&b)?;
         Ok(Quantity::new(a.magnitude - b.magnitude, a.dim)
             .into_pyobject(py)?
@@ -304,13 +346,14 @@ impl Quantity {
         py: Python<'py>,
         other: Bound<'py, PyAny>,
     ) -> PyResult<Py<PyAny>> {
-        if is_arraylike(&other) {
-            let lhs = QuantityNP::coerce(py, &other)?;
-            let rhs = QuantityNP::from_quantity(py, &slf.borrow())?;
-            return Ok(lhs.sub(py, &rhs)?.into_pyobject(py)?.into_any().unbind());
+        let operand = Operand::classify(&other)?;
+        if operand.is_array() {
+            return array_op(py, slf.get(), &other, BinOp::Sub, true);
         }
-        let a = slf.borrow();
-        let b = Quantity::coerce(&other)?;
+        let Some(b) = operand.as_quantity() else {
+            return not_implemented(py);
+        };
+        let a = slf.get();
         a.assert_same_units(&b)?;
         Ok(Quantity::new(b.magnitude - a.magnitude, a.dim)
             .into_pyobject(py)?
@@ -323,13 +366,22 @@ impl Quantity {
         py: Python<'py>,
         other: Bound<'py, PyAny>,
     ) -> PyResult<Py<PyAny>> {
-        if is_arraylike(&other) {
-            let lhs = QuantityNP::from_quantity(py, &slf.borrow())?;
-            let rhs = QuantityNP::coerce(py, &other)?;
-            return Ok(lhs.mul(py, &rhs)?.into_pyobject(py)?.into_any().unbind());
+        let operand = Operand::classify(&other)?;
+        if operand.is_array() {
+            return array_op(py, slf.get(), &other, BinOp::Mul, false);
         }
-        let a = slf.borrow();
-        let b = Quantity::coerce(&other)?;
+        let a = slf.get();
+        let b = match operand {
+            // `quantity * 2.0` — the dimension is unchanged, skip the Dim add.
+            Operand::Scalar(v) => {
+                return Ok(Quantity::new(a.magnitude * v, a.dim)
+                    .into_pyobject(py)?
+                    .into_any()
+                    .unbind());
+            }
+            Operand::Quantity(b) => b,
+            _ => return not_implemented(py),
+        };
         Ok(Quantity::new(a.magnitude * b.magnitude, a.dim.add(&b.dim))
             .into_pyobject(py)?
             .into_any()
@@ -349,17 +401,21 @@ impl Quantity {
         py: Python<'py>,
         other: Bound<'py, PyAny>,
     ) -> PyResult<Py<PyAny>> {
-        if is_arraylike(&other) {
-            let lhs = QuantityNP::from_quantity(py, &slf.borrow())?;
-            let rhs = QuantityNP::coerce(py, &other)?;
-            return Ok(lhs
-                .truediv(py, &rhs)?
-                .into_pyobject(py)?
-                .into_any()
-                .unbind());
+        let operand = Operand::classify(&other)?;
+        if operand.is_array() {
+            return array_op(py, slf.get(), &other, BinOp::Div, false);
         }
-        let a = slf.borrow();
-        let b = Quantity::coerce(&other)?;
+        let a = slf.get();
+        let b = match operand {
+            Operand::Scalar(v) => {
+                return Ok(Quantity::new(a.magnitude / v, a.dim)
+                    .into_pyobject(py)?
+                    .into_any()
+                    .unbind());
+            }
+            Operand::Quantity(b) => b,
+            _ => return not_implemented(py),
+        };
         Ok(Quantity::new(a.magnitude / b.magnitude, a.dim.sub(&b.dim))
             .into_pyobject(py)?
             .into_any()
@@ -371,17 +427,14 @@ impl Quantity {
         py: Python<'py>,
         other: Bound<'py, PyAny>,
     ) -> PyResult<Py<PyAny>> {
-        if is_arraylike(&other) {
-            let lhs = QuantityNP::coerce(py, &other)?;
-            let rhs = QuantityNP::from_quantity(py, &slf.borrow())?;
-            return Ok(lhs
-                .truediv(py, &rhs)?
-                .into_pyobject(py)?
-                .into_any()
-                .unbind());
+        let operand = Operand::classify(&other)?;
+        if operand.is_array() {
+            return array_op(py, slf.get(), &other, BinOp::Div, true);
         }
-        let a = slf.borrow();
-        let b = Quantity::coerce(&other)?;
+        let Some(b) = operand.as_quantity() else {
+            return not_implemented(py);
+        };
+        let a = slf.get();
         Ok(Quantity::new(b.magnitude / a.magnitude, b.dim.sub(&a.dim))
             .into_pyobject(py)?
             .into_any()
@@ -395,13 +448,16 @@ impl Quantity {
         modulo: Option<Bound<'py, PyAny>>,
     ) -> PyResult<Py<PyAny>> {
         let _ = modulo;
-        if other.extract::<Quantity>().is_ok() {
-            return Err(PyAssertionError::new_err(
-                "The exponent must not be a quantity!",
-            ));
-        }
-        let exp = other.extract::<f64>()?;
-        let a = slf.borrow();
+        let exp = match Operand::classify(&other)? {
+            Operand::Scalar(v) => v,
+            Operand::Quantity(_) => {
+                return Err(PyAssertionError::new_err(
+                    "The exponent must not be a quantity!",
+                ));
+            }
+            _ => return not_implemented(py),
+        };
+        let a = slf.get();
         Ok(Quantity::new(a.magnitude.powf(exp), a.dim.scale(exp))
             .into_pyobject(py)?
             .into_any()
@@ -409,7 +465,7 @@ impl Quantity {
     }
 
     fn __neg__<'py>(slf: &Bound<'py, Self>, py: Python<'py>) -> PyResult<Py<PyAny>> {
-        let a = slf.borrow();
+        let a = slf.get();
         Ok(Quantity::new(-a.magnitude, a.dim)
             .into_pyobject(py)?
             .into_any()
@@ -417,7 +473,7 @@ impl Quantity {
     }
 
     fn __pos__<'py>(slf: &Bound<'py, Self>, py: Python<'py>) -> PyResult<Py<PyAny>> {
-        let a = slf.borrow();
+        let a = slf.get();
         Ok(Quantity::new(a.magnitude, a.dim)
             .into_pyobject(py)?
             .into_any()
@@ -425,24 +481,38 @@ impl Quantity {
     }
 
     fn __abs__<'py>(slf: &Bound<'py, Self>, py: Python<'py>) -> PyResult<Py<PyAny>> {
-        let a = slf.borrow();
+        let a = slf.get();
         Ok(Quantity::new(a.magnitude.abs(), a.dim)
             .into_pyobject(py)?
             .into_any()
             .unbind())
     }
 
-    fn __richcmp__(&self, other: &Bound<'_, PyAny>, op: CompareOp) -> PyResult<bool> {
-        let b = Quantity::coerce(other)?;
+    fn __richcmp__(
+        &self,
+        py: Python<'_>,
+        other: &Bound<'_, PyAny>,
+        op: CompareOp,
+    ) -> PyResult<Py<PyAny>> {
+        let operand = Operand::classify(other)?;
+        let Some(b) = operand.as_quantity() else {
+            // Arrays compare elementwise via the reflected QuantityNP /
+            // ndarray method; unknown types fall back to identity.
+            return not_implemented(py);
+        };
         self.assert_same_units(&b)?;
-        Ok(match op {
+        let result = match op {
             CompareOp::Lt => self.magnitude < b.magnitude,
             CompareOp::Le => self.magnitude <= b.magnitude,
             CompareOp::Eq => self.magnitude == b.magnitude,
             CompareOp::Ne => self.magnitude != b.magnitude,
             CompareOp::Gt => self.magnitude > b.magnitude,
             CompareOp::Ge => self.magnitude >= b.magnitude,
-        })
+        };
+        Ok(pyo3::types::PyBool::new(py, result)
+            .to_owned()
+            .into_any()
+            .unbind())
     }
 
     fn __float__(&self) -> PyResult<f64> {
@@ -459,11 +529,8 @@ impl Quantity {
     }
 
     fn __hash__(&self) -> u64 {
-        let mut h: u64 = self.magnitude.to_bits();
-        for v in self.dim.0.iter() {
-            h = h.rotate_left(7) ^ v.to_bits();
-        }
-        h
+        // The packed Dim word is already unique per dimension.
+        self.magnitude.to_bits().rotate_left(7) ^ self.dim.word()
     }
 
     // --- numpy-style elementwise math (dimensionless only) --------------
@@ -508,7 +575,7 @@ fn describe_for_error(q: &Quantity) -> String {
     let mut parts = vec![mag];
     let extra = SYMBOLS
         .iter()
-        .zip(q.dim.0.iter())
+        .zip(q.dim.exponents().iter())
         .filter(|(_, &v)| v != 0.0)
         .map(|(s, &v)| format!("{}^{}", s, v))
         .collect::<Vec<_>>()
@@ -519,23 +586,19 @@ fn describe_for_error(q: &Quantity) -> String {
     parts.join(" ")
 }
 
-/// True if `obj` is a numpy ndarray or a misu QuantityNP — used to route
-/// arithmetic through the array-aware path.
-///
-/// Optimised for the common case: both arms of misu arithmetic are
-/// scalar Quantity-or-number 99% of the time. Hot path is therefore a
-/// single `is_instance_of::<QuantityNP>` check (PyO3 lookup, no Python
-/// attribute access). Only when that fails do we pay the cost of two
-/// `hasattr` calls to detect a foreign ndarray.
-#[inline]
-fn is_arraylike(obj: &Bound<'_, PyAny>) -> bool {
-    if obj.is_instance_of::<QuantityNP>() {
-        return true;
-    }
-    // numpy ndarrays are PyArray instances; downcast is much cheaper than
-    // `hasattr` (which performs full attribute resolution).
-    if obj.cast::<numpy::PyUntypedArray>().is_ok() {
-        return true;
-    }
-    false
+/// `q op array`, or `array op q` when `reflected`, through QuantityNP's
+/// scalar kernels — the scalar is never lifted into a temporary array.
+fn array_op<'py>(
+    py: Python<'py>,
+    q: &Quantity,
+    array: &Bound<'py, PyAny>,
+    op: BinOp,
+    reflected: bool,
+) -> PyResult<Py<PyAny>> {
+    let arr = QuantityNP::coerce(py, array)?;
+    Ok(arr
+        .scalar_op(py, q.magnitude, q.dim, op, !reflected)?
+        .into_pyobject(py)?
+        .into_any()
+        .unbind())
 }
@@ -1,143 +1,365 @@
 //! Numpy-backed Quantity (replaces the Cython `QuantityNP` class).
 //!
-//! Holds a 1-D `f64` ndarray plus a Dim. Arithmetic releases the GIL for
-//! the actual numerical loop (free-thread-friendly, parallel-safe).
+//! Holds an N-dimensional ndarray plus a Dim. The array keeps the caller's
+//! dtype (see `storage.rs`). Arithmetic follows numpy's broadcasting rules
+//! and releases the GIL for the actual numerical loop (free-thread-friendly,
+//! parallel-safe). Operands are read through strided views, so slices and
+//! transposes are never copied on the way in.
+//!
+//! Views follow numpy: basic slicing (`x[a:b:c]`) and `view()` return a
+//! QuantityNP over the same buffer, while `copy()`, arithmetic, masks and
+//! index arrays give new data. A write through any view — in-place
+//! operators, `out=` — is seen by all of them. The views share the data
+//! but each holds its own Dim, so a write that changes the units (`*=`,
+//! `/=` or `out=` by a quantity with units) is refused while another
+//! QuantityNP over the same buffer is alive; see `check_unit_change`.
+
+use std::cmp::Ordering;
+use std::sync::Arc;
 
-use numpy::ndarray::{Array1, Zip};
-use numpy::{IntoPyArray, PyArray1, PyArrayMethods, PyReadonlyArray1};
+use numpy::ndarray::{ArrayD, ArrayViewD, Axis, Ix1, IxDyn, Slice};
+use numpy::npyffi::NPY_ARRAY_WRITEABLE;
+use numpy::{
+    Complex64, IntoPyArray, PyArrayDescr, PyArrayDescrMethods, PyArrayDyn, PyArrayMethods,
+    PyUntypedArray, PyUntypedArrayMethods,
+};
 use pyo3::class::basic::CompareOp;
-use pyo3::exceptions::{PyAssertionError, PyTypeError};
+use pyo3::exceptions::{PyAssertionError, PyOverflowError, PyTypeError, PyValueError};
 use pyo3::prelude::*;
-use pyo3::types::{PyDict, PySlice, PyTuple};
+use pyo3::types::{PyComplex, PyDict, PyList, PySlice, PyString, PyTuple};
 
+use crate::aggregate;
+use crate::calculus::{self, Kernel, Spacing};
 use crate::dim::Dim;
 use crate::errors::EIncompatibleUnits;
 use crate::format;
+use crate::operand::{not_implemented, Operand};
+use crate::parallel;
 use crate::quantity::Quantity;
+use crate::reduce::{self, Reduction};
 use crate::registry::{QUANTITY_TYPE, REPRESENT_CACHE, RepresentEntry};
+use crate::search;
+use crate::storage::{self, per_dtype, Data, Elem, Storage, Tolerance};
+use crate::ufunc;
+use crate::vmath::{self, Func};
+
+/// The four arithmetic operators, for code shared between them.
+#[derive(Clone, Copy, Debug, PartialEq, Eq)]
+pub enum BinOp {
+    Add,
+    Sub,
+    Mul,
+    Div,
+}
+
+impl BinOp {
+    /// Dimension of `lhs op rhs`, or an error if the operator requires
+    /// matching units and they differ.
+    pub fn result_dim(self, lhs: &Dim, rhs: &Dim) -> PyResult<Dim> {
+        match self {
+            BinOp::Add | BinOp::Sub => {
+                if lhs != rhs {
+                    return Err(EIncompatibleUnits::new_err(
+                        "Incompatible units for ndarray quantities",
+                    ));
+                }
+                Ok(*lhs)
+            }
+            BinOp::Mul => Ok(lhs.add(rhs)),
+            BinOp::Div => Ok(lhs.sub(rhs)),
+        }
+    }
+}
+
+/// An arithmetic operand before it is cast to the destination's dtype.
+pub enum Input {
+    Array(Storage),
+    Scalar(f64),
+}
 
 #[pyclass(module = "misu._engine")]
 pub struct QuantityNP {
-    pub magnitude: Py<PyArray1<f64>>,
+    pub storage: Storage,
     pub dim: Dim,
+    /// One token per buffer: every QuantityNP over the same data holds a
+    /// clone, so the count is how many of them are alive.
+    share: Arc<()>,
 }
 
 impl QuantityNP {
-    pub fn new(magnitude: Py<PyArray1<f64>>, dim: Dim) -> Self {
-        QuantityNP { magnitude, dim }
+    pub fn new(storage: Storage, dim: Dim) -> Self {
+        QuantityNP { storage, dim, share: Arc::new(()) }
+    }
+
+    /// A QuantityNP over `storage`, an array derived from this one's (a
+    /// slice, a reshape, a copy). It shares this one's token if the two
+    /// buffers overlap.
+    pub fn derive(&self, py: Python<'_>, storage: Storage, dim: Dim) -> QuantityNP {
+        let share = if overlaps(&self.storage.array(py), &storage.array(py)) {
+            Arc::clone(&self.share)
+        } else {
+            Arc::new(())
+        };
+        QuantityNP { storage, dim, share }
+    }
+
+    /// Raise instead of changing the Dim to `dim` while another QuantityNP
+    /// over the same buffer is alive: the data would be rescaled under
+    /// both, but the other would keep its old units.
+    pub fn check_unit_change(&self, dim: Dim) -> PyResult<()> {
+        if dim != self.dim && Arc::strong_count(&self.share) > 1 {
+            return Err(PyValueError::new_err(
+                "cannot change the units of a QuantityNP that shares its buffer with a view; copy() it first",
+            ));
+        }
+        Ok(())
     }
 
     /// Build a QuantityNP from an iterable / scalar / Quantity / ndarray.
     pub fn coerce<'py>(py: Python<'py>, obj: &Bound<'py, PyAny>) -> PyResult<Self> {
-        if let Ok(qnp) = obj.extract::<PyRef<QuantityNP>>() {
-            return Ok(QuantityNP {
-                magnitude: qnp.magnitude.clone_ref(py),
-                dim: qnp.dim,
-            });
+        match Self::coerce_operand(py, obj)? {
+            Some(q) => Ok(q),
+            // Lists, tuples, generators...: let numpy build the array.
+            None => Ok(QuantityNP::new(Storage::from_any(py, obj)?, Dim::DIMENSIONLESS)),
         }
-        if let Ok(q) = obj.extract::<Quantity>() {
-            // Wrap a scalar Quantity into a 0-d array? Tests use scalar
-            // results out of Quantity-on-Quantity ops; for QuantityNP arms
-            // (which arise only when one operand is array-like), we lift
-            // the scalar to a length-1 array.
-            let arr = Array1::from_elem(1, q.magnitude);
-            return Ok(QuantityNP::new(arr.into_pyarray(py).unbind(), q.dim));
-        }
-        // Bare Python scalar (int/float, also numpy 0-d): lift to a length-1
-        // dimensionless array so `3.0 * qnp` works as users expect.
-        if let Ok(mag) = obj.extract::<f64>() {
-            let arr = Array1::from_elem(1, mag);
-            return Ok(QuantityNP::new(arr.into_pyarray(py).unbind(), Dim::DIMENSIONLESS));
-        }
-        // numpy ndarray path
-        if let Ok(arr) = obj.cast::<PyArray1<f64>>() {
-            return Ok(QuantityNP::new(arr.clone().unbind(), Dim::DIMENSIONLESS));
-        }
-        // Generic ndarray of any dtype: convert to f64 via numpy.
-        let np = py.import("numpy")?;
-        let asarray = np.getattr("asarray")?;
-        let conv = asarray.call1((obj.clone(), np.getattr("float64")?))?;
-        let arr = conv.cast_into::<PyArray1<f64>>().map_err(|_| {
-            PyTypeError::new_err("Could not coerce to a 1-D float64 numpy array")
-        })?;
-        Ok(QuantityNP::new(arr.unbind(), Dim::DIMENSIONLESS))
+    }
+
+    /// Like `coerce`, but for the arithmetic operators: classifies `obj`
+    /// without raising, and returns `None` for types an operator should
+    /// answer with `NotImplemented`.
+    pub fn coerce_operand<'py>(
+        py: Python<'py>,
+        obj: &Bound<'py, PyAny>,
+    ) -> PyResult<Option<Self>> {
+        let q = match Operand::classify(obj)? {
+            Operand::QuantityNP(qnp) => {
+                let qnp = qnp.borrow();
+                QuantityNP::new(qnp.storage.clone_ref(py), qnp.dim)
+            }
+            // Scalars (dimensioned or bare numbers) lift to a length-1
+            // array so `3.0 * qnp` works as users expect.
+            Operand::Quantity(q) => QuantityNP::from_quantity(py, q)?,
+            Operand::Scalar(mag) => QuantityNP::new(Storage::scalar(py, mag), Dim::DIMENSIONLESS),
+            Operand::Array(_) => QuantityNP::new(Storage::from_any(py, obj)?, Dim::DIMENSIONLESS),
+            Operand::Other => match Self::complex_scalar(py, obj) {
+                Some(storage) => QuantityNP::new(storage, Dim::DIMENSIONLESS),
+                None => return Ok(None),
+            },
+        };
+        Ok(Some(q))
+    }
+
+    /// A Python `complex` as a length-1 complex128 array.
+    fn complex_scalar(py: Python<'_>, obj: &Bound<'_, PyAny>) -> Option<Storage> {
+        let c = obj.cast::<PyComplex>().ok()?;
+        Some(Storage::scalar(py, Complex64::new(c.real(), c.imag())))
     }
 
     pub fn from_quantity<'py>(py: Python<'py>, q: &Quantity) -> PyResult<Self> {
-        let arr = Array1::from_elem(1, q.magnitude);
-        Ok(QuantityNP::new(arr.into_pyarray(py).unbind(), q.dim))
+        Ok(QuantityNP::new(Storage::scalar(py, q.magnitude), q.dim))
     }
 
-    pub fn assert_same_units(&self, other: &QuantityNP) -> PyResult<()> {
-        if self.dim != other.dim {
-            Err(EIncompatibleUnits::new_err(
-                "Incompatible units for ndarray quantities",
-            ))
-        } else {
-            Ok(())
-        }
+    /// `self op other`, both arrays, promoting to their common dtype.
+    pub fn binary_op(&self, py: Python<'_>, other: &QuantityNP, op: BinOp) -> PyResult<QuantityNP> {
+        let dim = op.result_dim(&self.dim, &other.dim)?;
+        let dtype = self.storage.dtype().promote(other.storage.dtype());
+        let (l, r) = (self.storage.cast(py, dtype)?, other.storage.cast(py, dtype)?);
+        let result = per_dtype!(dtype, T => {
+            let arr = storage::binary::<T>(py, T::expect(&l), T::expect(&r), op)?;
+            Storage::from_owned(py, arr)
+        });
+        Ok(QuantityNP::new(result, dim))
     }
 
-    fn binary<'py>(
+    /// `self op scalar`, or `scalar op self` when `scalar_first`.
+    ///
+    /// The scalar's magnitude and Dim are used directly, rather than being
+    /// lifted into a length-1 array for `binary` to broadcast back out. The
+    /// array keeps its dtype.
+    pub fn scalar_op(
         &self,
-        py: Python<'py>,
-        rhs: &QuantityNP,
-        op: impl Fn(f64, f64) -> f64 + Send + Sync,
+        py: Python<'_>,
+        scalar: f64,
+        scalar_dim: Dim,
+        op: BinOp,
+        scalar_first: bool,
     ) -> PyResult<QuantityNP> {
-        let lhs_view: PyReadonlyArray1<f64> = self.magnitude.bind(py).readonly();
-        let rhs_view: PyReadonlyArray1<f64> = rhs.magnitude.bind(py).readonly();
-        let lhs_arr = lhs_view.as_array();
-        let rhs_arr = rhs_view.as_array();
-
-        // Broadcast a length-1 operand against an N-length operand.
-        let result: Array1<f64> = py.detach(|| {
-            let (l, r) = (lhs_arr.len(), rhs_arr.len());
-            if l == r {
-                let mut out = Array1::<f64>::zeros(l);
-                Zip::from(&mut out)
-                    .and(&lhs_arr)
-                    .and(&rhs_arr)
-                    .for_each(|o, &a, &b| *o = op(a, b));
-                out
-            } else if l == 1 {
-                let scalar = lhs_arr[0];
-                rhs_arr.mapv(|b| op(scalar, b))
-            } else if r == 1 {
-                let scalar = rhs_arr[0];
-                lhs_arr.mapv(|a| op(a, scalar))
-            } else {
-                // Length mismatch: fall through with NaN; numpy proper would
-                // broadcast multi-D — extend later if a test needs it.
-                Array1::from_elem(l.max(r), f64::NAN)
+        let dim = if scalar_first {
+            op.result_dim(&scalar_dim, &self.dim)?
+        } else {
+            op.result_dim(&self.dim, &scalar_dim)?
+        };
+        let arr = self.storage.decoded(py)?;
+        let result = per_dtype!(arr.dtype(), T => {
+            let out = storage::scalar::<T>(py, T::expect(&arr), T::from_f64(scalar), op, scalar_first);
+            Storage::from_owned(py, out)
+        });
+        Ok(QuantityNP::new(result, dim))
+    }
+
+    /// `f` applied elementwise to the (decoded) magnitudes.
+    fn map_elements(&self, py: Python<'_>, dim: Dim, f: impl Fn(f64) -> f64 + Copy + Send + Sync) -> PyResult<QuantityNP> {
+        let arr = self.storage.decoded(py)?;
+        let result = per_dtype!(arr.dtype(), T => {
+            if T::DTYPE.is_complex() {
+                return Err(PyTypeError::new_err(
+                    "this function is not supported for complex QuantityNP",
+                ));
             }
+            let out = storage::map::<T>(py, T::expect(&arr), move |x| T::from_f64(f(x.to_f64())));
+            Storage::from_owned(py, out)
         });
+        Ok(QuantityNP::new(result, dim))
+    }
 
-        Ok(QuantityNP::new(
-            result.into_pyarray(py).unbind(),
-            self.dim,
-        ))
+    /// Shared body of the arithmetic dunders: `self op other`, or
+    /// `other op self` when `reflected`.
+    fn dispatch<'py>(
+        slf: &Bound<'py, Self>,
+        py: Python<'py>,
+        other: &Bound<'py, PyAny>,
+        op: BinOp,
+        reflected: bool,
+    ) -> PyResult<Py<PyAny>> {
+        let this = slf.borrow();
+        let result = match Operand::classify(other)? {
+            Operand::Quantity(q) => this.scalar_op(py, q.magnitude, q.dim, op, reflected)?,
+            Operand::Scalar(v) => this.scalar_op(py, v, Dim::DIMENSIONLESS, op, reflected)?,
+            Operand::QuantityNP(_) | Operand::Array(_) | Operand::Other => {
+                let Some(that) = QuantityNP::coerce_operand(py, other)? else {
+                    return not_implemented(py);
+                };
+                if reflected {
+                    that.binary_op(py, &this, op)?
+                } else {
+                    this.binary_op(py, &that, op)?
+                }
+            }
+        };
+        Ok(result.into_pyobject(py)?.into_any().unbind())
     }
 
-    pub fn add(&self, py: Python<'_>, other: &QuantityNP) -> PyResult<QuantityNP> {
-        self.assert_same_units(other)?;
-        self.binary(py, other, |a, b| a + b)
+    /// `obj` as kernel input plus its Dim, or `None` for unsupported types.
+    pub fn operand_input<'py>(py: Python<'py>, obj: &Bound<'py, PyAny>) -> PyResult<Option<(Input, Dim)>> {
+        Ok(match Operand::classify(obj)? {
+            Operand::Quantity(q) => Some((Input::Scalar(q.magnitude), q.dim)),
+            Operand::Scalar(v) => Some((Input::Scalar(v), Dim::DIMENSIONLESS)),
+            _ => QuantityNP::coerce_operand(py, obj)?.map(|q| (Input::Array(q.storage), q.dim)),
+        })
     }
 
-    pub fn sub(&self, py: Python<'_>, other: &QuantityNP) -> PyResult<QuantityNP> {
-        self.assert_same_units(other)?;
-        self.binary(py, other, |a, b| a - b)
+    /// The typed destination array of `out`, which must not be fixed-point.
+    pub fn out_storage(py: Python<'_>, out: &Bound<'_, QuantityNP>) -> PyResult<Storage> {
+        match &out.try_borrow()?.storage {
+            Storage::Fixed(..) => Err(PyTypeError::new_err(
+                "cannot write into fixed-point QuantityNP storage",
+            )),
+            storage => Ok(storage.clone_ref(py)),
+        }
     }
 
-    pub fn mul(&self, py: Python<'_>, other: &QuantityNP) -> PyResult<QuantityNP> {
-        let mut out = self.binary(py, other, |a, b| a * b)?;
-        out.dim = self.dim.add(&other.dim);
-        Ok(out)
+    /// `input` cast to `dest`'s dtype, under numpy's "same_kind" rule.
+    pub fn input_data<T: Elem>(py: Python<'_>, input: &Input) -> PyResult<Data<T>> {
+        match input {
+            Input::Scalar(v) => Ok(Data::Scalar(T::from_f64(*v))),
+            Input::Array(s) => {
+                if !s.dtype().casts_to(T::DTYPE) {
+                    return Err(PyTypeError::new_err(format!(
+                        "cannot write {} values into a {} array",
+                        s.dtype().name(),
+                        T::DTYPE.name()
+                    )));
+                }
+                Ok(Data::Array(T::expect(&s.cast(py, T::DTYPE)?).clone_ref(py)))
+            }
+        }
     }
 
-    pub fn truediv(&self, py: Python<'_>, other: &QuantityNP) -> PyResult<QuantityNP> {
-        let mut out = self.binary(py, other, |a, b| a / b)?;
-        out.dim = self.dim.sub(&other.dim);
-        Ok(out)
+    /// `lhs op rhs` written into `out`, whose Dim becomes the result's.
+    fn binary_into(
+        py: Python<'_>,
+        lhs: &(Input, Dim),
+        rhs: &(Input, Dim),
+        op: BinOp,
+        out: &Bound<'_, QuantityNP>,
+    ) -> PyResult<()> {
+        let dim = op.result_dim(&lhs.1, &rhs.1)?;
+        out.try_borrow()?.check_unit_change(dim)?;
+        let dest = Self::out_storage(py, out)?;
+        per_dtype!(dest.dtype(), T => {
+            let arr = T::expect(&dest).bind(py);
+            let (l, r) = (Self::input_data::<T>(py, &lhs.0)?, Self::input_data::<T>(py, &rhs.0)?);
+            match op {
+                BinOp::Add => storage::write_into(py, arr, &l, &r, |a, b| a + b)?,
+                BinOp::Sub => storage::write_into(py, arr, &l, &r, |a, b| a - b)?,
+                BinOp::Mul => storage::write_into(py, arr, &l, &r, |a, b| a * b)?,
+                BinOp::Div => storage::write_into(py, arr, &l, &r, |a, b| a / b)?,
+            }
+        });
+        // Only take the mutable borrow when the Dim actually changes, so an
+        // `out` that is also the receiver of a `&self` method still works.
+        if out.try_borrow()?.dim != dim {
+            out.try_borrow_mut()?.dim = dim;
+        }
+        Ok(())
+    }
+
+    /// Shared body of the in-place dunders: `self op= other`.
+    fn inplace<'py>(
+        slf: &Bound<'py, Self>,
+        py: Python<'py>,
+        other: &Bound<'py, PyAny>,
+        op: BinOp,
+    ) -> PyResult<()> {
+        let Some(rhs) = Self::operand_input(py, other)? else {
+            return Err(PyTypeError::new_err(format!(
+                "unsupported operand type for in-place arithmetic on QuantityNP: '{}'",
+                other.get_type().name()?
+            )));
+        };
+        let lhs = {
+            let this = slf.try_borrow()?;
+            (Input::Array(this.storage.clone_ref(py)), this.dim)
+        };
+        Self::binary_into(py, &lhs, &rhs, op, slf)
+    }
+
+    /// Body of the named arithmetic methods: allocate a result, or write
+    /// into `out` and return it.
+    fn method_op<'py>(
+        slf: &Bound<'py, Self>,
+        py: Python<'py>,
+        other: &Bound<'py, PyAny>,
+        op: BinOp,
+        out: Option<Bound<'py, QuantityNP>>,
+    ) -> PyResult<Py<PyAny>> {
+        let Some(out) = out else {
+            let result = Self::dispatch(slf, py, other, op, false)?;
+            if result.as_ptr() == py.NotImplemented().as_ptr() {
+                return Err(PyTypeError::new_err(format!(
+                    "unsupported operand type for QuantityNP arithmetic: '{}'",
+                    other.get_type().name()?
+                )));
+            }
+            return Ok(result);
+        };
+        let Some(rhs) = Self::operand_input(py, other)? else {
+            return Err(PyTypeError::new_err(format!(
+                "unsupported operand type for QuantityNP arithmetic: '{}'",
+                other.get_type().name()?
+            )));
+        };
+        let lhs = {
+            let this = slf.try_borrow()?;
+            (Input::Array(this.storage.clone_ref(py)), this.dim)
+        };
+        Self::binary_into(py, &lhs, &rhs, op, &out)?;
+        Ok(out.into_any().unbind())
+    }
+
+    /// Wrap an array derived from this one's storage (slice, reshape, copy).
+    fn rewrap(&self, arr: &Bound<'_, PyAny>) -> PyResult<QuantityNP> {
+        Ok(self.derive(arr.py(), self.storage.rewrap(arr)?, self.dim))
     }
 }
 
@@ -145,29 +367,201 @@ impl QuantityNP {
 impl QuantityNP {
     #[new]
     fn py_new(py: Python<'_>, magnitude: Bound<'_, PyAny>) -> PyResult<Self> {
+        if let Ok(other) = magnitude.cast::<QuantityNP>() {
+            // Same buffer, so the two must not change units independently.
+            let other = other.try_borrow()?;
+            return Ok(other.derive(py, other.storage.clone_ref(py), other.dim));
+        }
         Self::coerce(py, &magnitude)
     }
 
+    /// A 1-D array from a sequence (or any iterable) of `Quantity`
+    /// scalars, checking in the same pass that they share dimensions.
+    /// With `unit`, every element must have that unit's dimensions, which
+    /// also gives an empty sequence its dimensions.
+    #[staticmethod]
+    #[pyo3(signature = (quantities, unit=None))]
+    fn from_quantities(py: Python<'_>, quantities: &Bound<'_, PyAny>, unit: Option<Quantity>) -> PyResult<Self> {
+        let mut values = Vec::with_capacity(quantities.len().unwrap_or(0));
+        let dim = aggregate::for_each_quantity(quantities, unit.map(|u| u.dim), |_, v| values.push(v))?;
+        let dim = dim.unwrap_or(Dim::DIMENSIONLESS);
+        Ok(QuantityNP::new(Storage::from_owned(py, column(values)), dim))
+    }
+
+    /// A 1-D array of `values`, numbers expressed in `unit`. Any iterable
+    /// works, generators included; it is read once, without building an
+    /// intermediate list. An ndarray keeps its dtype.
+    #[staticmethod]
+    fn from_values(py: Python<'_>, values: &Bound<'_, PyAny>, unit: Quantity) -> PyResult<Self> {
+        if values.cast::<PyUntypedArray>().is_ok() {
+            let raw = QuantityNP::new(Storage::from_any(py, values)?, Dim::DIMENSIONLESS);
+            return raw.scalar_op(py, unit.magnitude, unit.dim, BinOp::Mul, false);
+        }
+        let mut magnitudes = Vec::with_capacity(values.len().unwrap_or(0));
+        for item in values.try_iter()? {
+            magnitudes.push(item?.extract::<f64>()? * unit.magnitude);
+        }
+        Ok(QuantityNP::new(Storage::from_owned(py, column(magnitudes)), unit.dim))
+    }
+
     #[classattr]
     fn __array_priority__() -> f64 {
         20.0
     }
 
+    /// numpy ufunc hook; see `ufunc.rs`.
+    #[pyo3(signature = (ufunc, method, *inputs, **kwargs))]
+    fn __array_ufunc__<'py>(
+        &self,
+        py: Python<'py>,
+        ufunc: Bound<'py, PyAny>,
+        method: &str,
+        inputs: Bound<'py, PyTuple>,
+        kwargs: Option<Bound<'py, PyDict>>,
+    ) -> PyResult<Py<PyAny>> {
+        ufunc::array_ufunc(py, &ufunc, method, &inputs, kwargs.as_ref())
+    }
+
+    /// numpy function hook (`np.concatenate`, `np.where`, ...); the unit
+    /// handling lives in `misu._array_function`.
+    fn __array_function__<'py>(
+        &self,
+        py: Python<'py>,
+        func: Bound<'py, PyAny>,
+        types: Bound<'py, PyAny>,
+        args: Bound<'py, PyAny>,
+        kwargs: Bound<'py, PyAny>,
+    ) -> PyResult<Bound<'py, PyAny>> {
+        let helpers = py.import("misu._array_function")?;
+        helpers
+            .getattr("array_function")?
+            .call1((func, types, args, kwargs))
+    }
+
+    /// Magnitudes in base SI units (decoded to float64 for fixed-point).
+    #[getter]
+    fn magnitude<'py>(&self, py: Python<'py>) -> PyResult<Bound<'py, PyUntypedArray>> {
+        Ok(self.storage.decoded(py)?.array(py))
+    }
+
+    /// The numpy dtype of the stored array (the integer dtype of the
+    /// counts, for fixed-point storage).
     #[getter]
-    fn magnitude<'py>(&self, py: Python<'py>) -> Bound<'py, PyArray1<f64>> {
-        self.magnitude.bind(py).clone()
+    fn dtype<'py>(&self, py: Python<'py>) -> Bound<'py, PyAny> {
+        self.storage.array(py).dtype().into_any()
+    }
+
+    /// The fixed-point quantum as a Quantity, or None for float storage.
+    #[getter]
+    fn quantum(&self) -> Option<Quantity> {
+        match self.storage {
+            Storage::Fixed(_, quantum) => Some(Quantity::new(quantum, self.dim)),
+            _ => None,
+        }
+    }
+
+    #[getter]
+    fn shape<'py>(&self, py: Python<'py>) -> PyResult<Bound<'py, PyTuple>> {
+        PyTuple::new(py, self.storage.array(py).shape())
+    }
+
+    #[getter]
+    fn ndim(&self, py: Python<'_>) -> usize {
+        self.storage.array(py).ndim()
+    }
+
+    #[getter]
+    fn size(&self, py: Python<'_>) -> usize {
+        PyUntypedArrayMethods::len(&self.storage.array(py))
+    }
+
+    /// The same data with a new shape (a view where numpy can make one).
+    #[pyo3(signature = (*shape))]
+    fn reshape(&self, py: Python<'_>, shape: Bound<'_, PyTuple>) -> PyResult<QuantityNP> {
+        self.rewrap(&self.storage.array(py).call_method1("reshape", shape)?)
+    }
+
+    /// A copy stored as `dtype` (float32, float64, complex64 or
+    /// complex128). Use `to_fixed` for integer storage.
+    fn astype(&self, py: Python<'_>, dtype: Bound<'_, PyAny>) -> PyResult<QuantityNP> {
+        let arr = self.storage.decoded(py)?.array(py).call_method1("astype", (dtype,))?;
+        match Storage::from_array(&arr) {
+            Some(storage) => Ok(QuantityNP::new(storage, self.dim)),
+            None => Err(PyTypeError::new_err(
+                "QuantityNP stores float32, float64, complex64 or complex128; use to_fixed() for integers",
+            )),
+        }
+    }
+
+    /// A fixed-point copy: integer counts of `quantum` (a Quantity of the
+    /// same dimensions, or a bare number in base SI units), stored as the
+    /// integer `dtype`. Values outside the dtype's range raise
+    /// OverflowError rather than wrapping.
+    #[pyo3(signature = (quantum, dtype=None))]
+    fn to_fixed(
+        &self,
+        py: Python<'_>,
+        quantum: Bound<'_, PyAny>,
+        dtype: Option<Bound<'_, PyAny>>,
+    ) -> PyResult<QuantityNP> {
+        let quantum = match Operand::classify(&quantum)?.as_quantity() {
+            Some(q) if q.dim == self.dim || q.dim.is_dimensionless() => q.magnitude,
+            Some(_) => return Err(EIncompatibleUnits::new_err("Incompatible units")),
+            None => return Err(PyTypeError::new_err("quantum must be a Quantity or a number")),
+        };
+        if !(quantum.is_finite() && quantum > 0.0) {
+            return Err(PyValueError::new_err("quantum must be positive and finite"));
+        }
+        let np = py.import("numpy")?;
+        let dtype = dtype.unwrap_or_else(|| PyString::new(py, "int32").into_any());
+        let dtype = np.call_method1("dtype", (dtype,))?.cast_into::<PyArrayDescr>()?;
+        if !matches!(dtype.kind(), b'i' | b'u') {
+            return Err(PyTypeError::new_err("fixed-point storage needs an integer dtype"));
+        }
+        let info = np.call_method1("iinfo", (dtype.clone(),))?;
+        let (lo, hi): (f64, f64) = (info.getattr("min")?.extract()?, info.getattr("max")?.extract()?);
+        let values = self.storage.to_f64(py)?;
+        let view = values.bind(py).readonly();
+        let arr = view.as_array();
+        let counts: ArrayD<f64> = py.detach(|| arr.mapv(|x| (x / quantum).round()));
+        if counts.iter().any(|&c| !(lo..=hi).contains(&c)) {
+            return Err(PyOverflowError::new_err(format!(
+                "values are not finite or do not fit in {} counts of the quantum",
+                dtype.str()?
+            )));
+        }
+        let counts = counts.into_pyarray(py).call_method1("astype", (dtype,))?;
+        Ok(QuantityNP::new(
+            Storage::Fixed(counts.cast_into::<PyUntypedArray>()?.unbind(), quantum),
+            self.dim,
+        ))
     }
 
     fn unit_as_tuple<'py>(&self, py: Python<'py>) -> PyResult<Bound<'py, PyTuple>> {
-        PyTuple::new(py, self.dim.0.iter().copied())
+        PyTuple::new(py, self.dim.exponents())
+    }
+
+    /// Replace the dimensions in place. Internal: `misu._ufunc` calls this
+    /// after numpy has written a result into this array through `out=`.
+    fn _set_unit(&mut self, unit: Vec<f64>) -> PyResult<()> {
+        let dim = dim_from_list(&unit)?;
+        self.check_unit_change(dim)?;
+        self.dim = dim;
+        Ok(())
+    }
+
+    /// Raise if `_set_unit(unit)` would. Internal: checked before numpy
+    /// writes into this array through `out=`.
+    fn _check_unit(&self, unit: Vec<f64>) -> PyResult<()> {
+        self.check_unit_change(dim_from_list(&unit)?)
     }
 
     fn units(&self) -> Vec<f64> {
-        self.dim.0.to_vec()
+        self.dim.exponents().to_vec()
     }
 
     fn getunit(&self) -> Vec<f64> {
-        self.dim.0.to_vec()
+        self.dim.exponents().to_vec()
     }
 
     fn setValDict(&self, _valdict: Bound<'_, PyDict>) -> PyResult<()> {
@@ -176,23 +570,41 @@ impl QuantityNP {
         ))
     }
 
-    fn copy(&self, py: Python<'_>) -> QuantityNP {
-        let arr = self.magnitude.bind(py).readonly().as_array().to_owned();
-        QuantityNP::new(arr.into_pyarray(py).unbind(), self.dim)
+    /// A QuantityNP with its own copy of the data.
+    fn copy(&self, py: Python<'_>) -> PyResult<QuantityNP> {
+        self.rewrap(&self.storage.array(py).call_method0("copy")?)
+    }
+
+    /// A new QuantityNP over the same buffer, as numpy's `view()`: a write
+    /// through either one (in-place operators, `out=`) shows in both.
+    fn view(&self, py: Python<'_>) -> PyResult<QuantityNP> {
+        self.rewrap(&self.storage.array(py).call_method0("view")?)
+    }
+
+    /// The array whose buffer the stored array shares (numpy's `base`), or
+    /// None if it owns its data. Slices and views of `x` report
+    /// `x.base` if that is set, else `x`'s own stored array.
+    #[getter]
+    fn base<'py>(&self, py: Python<'py>) -> PyResult<Bound<'py, PyAny>> {
+        self.storage.array(py).getattr("base")
     }
 
     fn __reduce__<'py>(&self, py: Python<'py>) -> PyResult<Bound<'py, PyTuple>> {
         let module = py.import("misu._engine")?;
         let restore = module.getattr("_restore_quantity_np")?;
-        let unit_list = PyTuple::new(py, self.dim.0.iter().copied())?;
-        let mag = self.magnitude.bind(py).clone();
-        let args = PyTuple::new(py, [mag.into_any(), unit_list.into_any()])?;
+        let unit_list = PyTuple::new(py, self.dim.exponents())?;
+        let mag = self.storage.array(py);
+        let quantum = match self.storage {
+            Storage::Fixed(_, quantum) => quantum.into_pyobject(py)?.into_any(),
+            _ => py.None().into_bound(py),
+        };
+        let args = PyTuple::new(py, [mag.into_any(), unit_list.into_any(), quantum])?;
         PyTuple::new(py, [restore.into_any(), args.into_any()])
     }
 
     fn __str__<'py>(slf: &Bound<'py, Self>, py: Python<'py>) -> PyResult<String> {
         let q = slf.borrow();
-        let mag = q.magnitude.bind(py).clone().into_any();
+        let mag = q.storage.decoded(py)?.array(py).into_any();
         format::render(py, &slf.clone().into_any(), &q.dim, mag)
     }
 
@@ -211,7 +623,7 @@ impl QuantityNP {
         format_spec: &str,
     ) -> PyResult<String> {
         let q = slf.borrow();
-        let mag = q.magnitude.bind(py).clone().into_any();
+        let mag = q.storage.decoded(py)?.array(py).into_any();
         format::format_with_spec(py, &slf.clone().into_any(), &q.dim, mag, format_spec)
     }
 
@@ -224,18 +636,36 @@ impl QuantityNP {
         }
     }
 
-    fn convert(&self, py: Python<'_>, target_unit: &Bound<'_, PyAny>) -> PyResult<Py<PyArray1<f64>>> {
+    /// Magnitudes expressed in `target_unit`, as a plain ndarray of the
+    /// same dtype. With `out`, the values are written into that array
+    /// instead.
+    #[pyo3(signature = (target_unit, out=None))]
+    fn convert<'py>(
+        &self,
+        py: Python<'py>,
+        target_unit: &Bound<'py, PyAny>,
+        out: Option<Bound<'py, PyAny>>,
+    ) -> PyResult<Bound<'py, PyAny>> {
         let target = target_unit
             .extract::<Quantity>()
             .map_err(|_| PyAssertionError::new_err("Target must be a quantity."))?;
         if self.dim != target.dim {
             return Err(EIncompatibleUnits::new_err("Incompatible units"));
         }
-        let view = self.magnitude.bind(py).readonly();
-        let arr = view.as_array();
         let div = target.magnitude;
-        let result: Array1<f64> = py.detach(|| arr.mapv(|x| x / div));
-        Ok(result.into_pyarray(py).unbind())
+        let Some(out) = out else {
+            let converted = self.scalar_op(py, div, target.dim, BinOp::Div, false)?;
+            return Ok(converted.storage.array(py).into_any());
+        };
+        let dest = Storage::from_array(&out)
+            .ok_or_else(|| PyTypeError::new_err("out must be a float or complex ndarray"))?;
+        let src = Input::Array(self.storage.clone_ref(py));
+        per_dtype!(dest.dtype(), T => {
+            let src = Self::input_data::<T>(py, &src)?;
+            let div = Data::Scalar(T::from_f64(div));
+            storage::write_into(py, T::expect(&dest).bind(py), &src, &div, |a, b| a / b)?;
+        });
+        Ok(out)
     }
 
     fn unitCategory(&self) -> PyResult<String> {
@@ -292,44 +722,69 @@ impl QuantityNP {
         index: Bound<'py, PyAny>,
     ) -> PyResult<Py<PyAny>> {
         let q = slf.borrow();
-        // Integer index: return Quantity (scalar).
-        if let Ok(i) = index.extract::<isize>() {
-            let arr = q.magnitude.bind(py).readonly();
+        // Integer index into a 1-D float64 array: return Quantity (scalar).
+        if let (Storage::F64(arr), Ok(i)) = (&q.storage, index.extract::<isize>()) {
+            if arr.bind(py).ndim() != 1 {
+                return Self::index_via_numpy(&q, py, index);
+            }
+            let arr = arr.bind(py).readonly();
             let view = arr.as_array();
             let len = view.len() as isize;
             let idx = if i < 0 { i + len } else { i };
             if idx < 0 || idx >= len {
                 return Err(pyo3::exceptions::PyIndexError::new_err("index out of range"));
             }
-            return Ok(Quantity::new(view[idx as usize], q.dim)
+            return Ok(Quantity::new(view[IxDyn(&[idx as usize])], q.dim)
                 .into_pyobject(py)?
                 .into_any()
                 .unbind());
         }
-        // Otherwise let numpy handle the indexing then wrap.
-        let bound = q.magnitude.bind(py);
-        let py_any: &Bound<'py, PyAny> = bound.as_any();
-        let result = py_any.get_item(index)?;
-        // If result is a scalar (0-d / float), wrap as Quantity; else QuantityNP.
-        if let Ok(arr) = result.cast::<PyArray1<f64>>() {
-            return Ok(QuantityNP::new(arr.clone().unbind(), q.dim)
-                .into_pyobject(py)?
-                .into_any()
-                .unbind());
+        // Slices: a view of the same buffer.
+        if let Some(view) = q.slice_view(py, &index)? {
+            return Ok(view.into_pyobject(py)?.into_any().unbind());
         }
-        if let Ok(scalar) = result.extract::<f64>() {
-            return Ok(Quantity::new(scalar, q.dim)
-                .into_pyobject(py)?
-                .into_any()
-                .unbind());
+        // Boolean masks (`x[x > limit]`) and integer index arrays.
+        if let Some(gathered) = q.gather(py, &index)? {
+            return Ok(gathered.into_pyobject(py)?.into_any().unbind());
         }
-        // Slice fallthrough
-        let _ = PySlice::new(py, 0, 0, 1);
-        Err(PyTypeError::new_err("Unsupported index type"))
+        Self::index_via_numpy(&q, py, index)
+    }
+
+    /// `iter(x)`, over the first axis as numpy iterates.
+    fn __iter__(slf: &Bound<'_, Self>, py: Python<'_>) -> PyResult<QuantityNPIterator> {
+        let q = slf.borrow();
+        let shape = q.storage.array(py).shape().to_vec();
+        let Some(&len) = shape.first() else {
+            return Err(PyTypeError::new_err("iteration over a 0-d array"));
+        };
+        let values = if shape.len() == 1 && !q.storage.dtype().is_complex() {
+            Some(q.storage.clone_ref(py))
+        } else {
+            None
+        };
+        Ok(QuantityNPIterator { owner: slf.clone().unbind(), values, dim: q.dim, pos: 0, len })
+    }
+
+    /// The elements as `Quantity` scalars in nested lists, one level per
+    /// axis as in ndarray's `tolist()` (a lone Quantity for a 0-d array).
+    fn tolist(&self, py: Python<'_>) -> PyResult<Py<PyAny>> {
+        let values = self.storage.to_f64(py)?;
+        let view = values.bind(py).readonly();
+        nested_quantities(py, view.as_array(), self.dim)
+    }
+
+    /// Every element as a `Quantity` scalar, in one flat list (C order).
+    fn to_quantities<'py>(&self, py: Python<'py>) -> PyResult<Bound<'py, PyList>> {
+        let values = self.storage.to_f64(py)?;
+        let view = values.bind(py).readonly();
+        PyList::new(py, view.as_array().iter().map(|&v| Quantity::new(v, self.dim)))
     }
 
-    fn __len__(&self, py: Python<'_>) -> usize {
-        self.magnitude.bind(py).readonly().as_array().len()
+    fn __len__(&self, py: Python<'_>) -> PyResult<usize> {
+        match self.storage.array(py).shape().first() {
+            Some(&n) => Ok(n),
+            None => Err(PyTypeError::new_err("len() of unsized object")),
+        }
     }
 
     // ---- arithmetic ------------------------------------------------------
@@ -338,72 +793,122 @@ impl QuantityNP {
         slf: &Bound<'py, Self>,
         py: Python<'py>,
         other: Bound<'py, PyAny>,
-    ) -> PyResult<QuantityNP> {
-        let rhs = QuantityNP::coerce(py, &other)?;
-        slf.borrow().add(py, &rhs)
+    ) -> PyResult<Py<PyAny>> {
+        Self::dispatch(slf, py, &other, BinOp::Add, false)
     }
 
     fn __radd__<'py>(
         slf: &Bound<'py, Self>,
         py: Python<'py>,
         other: Bound<'py, PyAny>,
-    ) -> PyResult<QuantityNP> {
-        let lhs = QuantityNP::coerce(py, &other)?;
-        lhs.add(py, &slf.borrow())
+    ) -> PyResult<Py<PyAny>> {
+        Self::dispatch(slf, py, &other, BinOp::Add, true)
     }
 
     fn __sub__<'py>(
         slf: &Bound<'py, Self>,
         py: Python<'py>,
         other: Bound<'py, PyAny>,
-    ) -> PyResult<QuantityNP> {
-        let rhs = QuantityNP::coerce(py, &other)?;
-        slf.borrow().sub(py, &rhs)
+    ) -> PyResult<Py<PyAny>> {
+        Self::dispatch(slf, py, &other, BinOp::Sub, false)
     }
 
     fn __rsub__<'py>(
         slf: &Bound<'py, Self>,
         py: Python<'py>,
         other: Bound<'py, PyAny>,
-    ) -> PyResult<QuantityNP> {
-        let lhs = QuantityNP::coerce(py, &other)?;
-        lhs.sub(py, &slf.borrow())
+    ) -> PyResult<Py<PyAny>> {
+        Self::dispatch(slf, py, &other, BinOp::Sub, true)
     }
 
     fn __mul__<'py>(
         slf: &Bound<'py, Self>,
         py: Python<'py>,
         other: Bound<'py, PyAny>,
-    ) -> PyResult<QuantityNP> {
-        let rhs = QuantityNP::coerce(py, &other)?;
-        slf.borrow().mul(py, &rhs)
+    ) -> PyResult<Py<PyAny>> {
+        Self::dispatch(slf, py, &other, BinOp::Mul, false)
     }
 
     fn __rmul__<'py>(
         slf: &Bound<'py, Self>,
         py: Python<'py>,
         other: Bound<'py, PyAny>,
-    ) -> PyResult<QuantityNP> {
-        let lhs = QuantityNP::coerce(py, &other)?;
-        lhs.mul(py, &slf.borrow())
+    ) -> PyResult<Py<PyAny>> {
+        Self::dispatch(slf, py, &other, BinOp::Mul, true)
     }
 
     fn __truediv__<'py>(
         slf: &Bound<'py, Self>,
         py: Python<'py>,
         other: Bound<'py, PyAny>,
-    ) -> PyResult<QuantityNP> {
-        let rhs = QuantityNP::coerce(py, &other)?;
-        slf.borrow().truediv(py, &rhs)
+    ) -> PyResult<Py<PyAny>> {
+        Self::dispatch(slf, py, &other, BinOp::Div, false)
     }
 
     fn __rtruediv__<'py>(
         slf: &Bound<'py, Self>,
         py: Python<'py>,
         other: Bound<'py, PyAny>,
-    ) -> PyResult<QuantityNP> {
-        let lhs = QuantityNP::coerce(py, &other)?;
-        lhs.truediv(py, &slf.borrow())
+    ) -> PyResult<Py<PyAny>> {
+        Self::dispatch(slf, py, &other, BinOp::Div, true)
+    }
+
+    fn __iadd__<'py>(slf: &Bound<'py, Self>, py: Python<'py>, other: Bound<'py, PyAny>) -> PyResult<()> {
+        Self::inplace(slf, py, &other, BinOp::Add)
+    }
+
+    fn __isub__<'py>(slf: &Bound<'py, Self>, py: Python<'py>, other: Bound<'py, PyAny>) -> PyResult<()> {
+        Self::inplace(slf, py, &other, BinOp::Sub)
+    }
+
+    fn __imul__<'py>(slf: &Bound<'py, Self>, py: Python<'py>, other: Bound<'py, PyAny>) -> PyResult<()> {
+        Self::inplace(slf, py, &other, BinOp::Mul)
+    }
+
+    fn __itruediv__<'py>(slf: &Bound<'py, Self>, py: Python<'py>, other: Bound<'py, PyAny>) -> PyResult<()> {
+        Self::inplace(slf, py, &other, BinOp::Div)
+    }
+
+    // Named forms of the operators, taking an optional `out` QuantityNP
+    // to write the result into (numpy-style buffer reuse).
+    #[pyo3(name = "add", signature = (other, out=None))]
+    fn py_add<'py>(
+        slf: &Bound<'py, Self>,
+        py: Python<'py>,
+        other: Bound<'py, PyAny>,
+        out: Option<Bound<'py, QuantityNP>>,
+    ) -> PyResult<Py<PyAny>> {
+        Self::method_op(slf, py, &other, BinOp::Add, out)
+    }
+
+    #[pyo3(name = "subtract", signature = (other, out=None))]
+    fn py_subtract<'py>(
+        slf: &Bound<'py, Self>,
+        py: Python<'py>,
+        other: Bound<'py, PyAny>,
+        out: Option<Bound<'py, QuantityNP>>,
+    ) -> PyResult<Py<PyAny>> {
+        Self::method_op(slf, py, &other, BinOp::Sub, out)
+    }
+
+    #[pyo3(name = "multiply", signature = (other, out=None))]
+    fn py_multiply<'py>(
+        slf: &Bound<'py, Self>,
+        py: Python<'py>,
+        other: Bound<'py, PyAny>,
+        out: Option<Bound<'py, QuantityNP>>,
+    ) -> PyResult<Py<PyAny>> {
+        Self::method_op(slf, py, &other, BinOp::Mul, out)
+    }
+
+    #[pyo3(name = "divide", signature = (other, out=None))]
+    fn py_divide<'py>(
+        slf: &Bound<'py, Self>,
+        py: Python<'py>,
+        other: Bound<'py, PyAny>,
+        out: Option<Bound<'py, QuantityNP>>,
+    ) -> PyResult<Py<PyAny>> {
+        Self::method_op(slf, py, &other, BinOp::Div, out)
     }
 
     fn __pow__<'py>(
@@ -415,20 +920,23 @@ impl QuantityNP {
         let _ = modulo;
         let exp = other.extract::<f64>()?;
         let q = slf.borrow();
-        let view = q.magnitude.bind(py).readonly();
-        let arr = view.as_array();
-        let result: Array1<f64> = py.detach(|| arr.mapv(|x| x.powf(exp)));
-        Ok(QuantityNP::new(
-            result.into_pyarray(py).unbind(),
-            q.dim.scale(exp),
-        ))
+        let arr = q.storage.decoded(py)?;
+        if let Storage::F64(a) = &arr {
+            let result = vector_map(py, a, Func::Pow(exp));
+            return Ok(QuantityNP::new(result, q.dim.scale(exp)));
+        }
+        let result = per_dtype!(arr.dtype(), T => {
+            Storage::from_owned(py, storage::map::<T>(py, T::expect(&arr), move |x| x.powf(exp)))
+        });
+        Ok(QuantityNP::new(result, q.dim.scale(exp)))
     }
 
     fn __neg__(&self, py: Python<'_>) -> PyResult<QuantityNP> {
-        let view = self.magnitude.bind(py).readonly();
-        let arr = view.as_array();
-        let result: Array1<f64> = py.detach(|| arr.mapv(|x| -x));
-        Ok(QuantityNP::new(result.into_pyarray(py).unbind(), self.dim))
+        let arr = self.storage.decoded(py)?;
+        let result = per_dtype!(arr.dtype(), T => {
+            Storage::from_owned(py, storage::map::<T>(py, T::expect(&arr), |x| -x))
+        });
+        Ok(QuantityNP::new(result, self.dim))
     }
 
     fn __richcmp__(
@@ -438,7 +946,9 @@ impl QuantityNP {
         op: CompareOp,
     ) -> PyResult<Py<PyAny>> {
         let q = slf.borrow();
-        let rhs = QuantityNP::coerce(py, &other)?;
+        let Some(rhs) = QuantityNP::coerce_operand(py, &other)? else {
+            return not_implemented(py);
+        };
         if matches!(op, CompareOp::Eq | CompareOp::Ne) {
             // Allow eq/ne even on different units (returns False/True).
             if q.dim != rhs.dim {
@@ -449,91 +959,717 @@ impl QuantityNP {
         } else if q.dim != rhs.dim {
             return Err(EIncompatibleUnits::new_err("Incompatible units"));
         }
-        let l_view = q.magnitude.bind(py).readonly();
-        let r_view = rhs.magnitude.bind(py).readonly();
-        let l = l_view.as_array();
-        let r = r_view.as_array();
-        let cmp: Vec<bool> = py.detach(|| {
-            let len = l.len().max(r.len());
-            (0..len)
-                .map(|i| {
-                    let a = if l.len() == 1 { l[0] } else { l[i] };
-                    let b = if r.len() == 1 { r[0] } else { r[i] };
-                    match op {
-                        CompareOp::Lt => a < b,
-                        CompareOp::Le => a <= b,
-                        CompareOp::Eq => a == b,
-                        CompareOp::Ne => a != b,
-                        CompareOp::Gt => a > b,
-                        CompareOp::Ge => a >= b,
-                    }
-                })
-                .collect()
+        let dtype = q.storage.dtype().promote(rhs.storage.dtype());
+        let (l, r) = (q.storage.cast(py, dtype)?, rhs.storage.cast(py, dtype)?);
+        let cmp = per_dtype!(dtype, T => storage::compare::<T>(py, T::expect(&l), T::expect(&r), op)?);
+        // A numpy bool array, ready to use as a mask.
+        Ok(cmp.into_pyarray(py).into_any().unbind())
+    }
+
+    /// `isclose(other, rtol=1e-05, atol=None, equal_nan=False)` — numpy's
+    /// elementwise `isclose` for arrays in the same units, as a bool array.
+    /// `atol` is a Quantity in those units (a bare number only when they
+    /// are dimensionless); it defaults to zero, or to numpy's 1e-08 for
+    /// dimensionless arrays.
+    #[pyo3(signature = (other, rtol=1e-05, atol=None, equal_nan=false))]
+    fn isclose<'py>(
+        &self,
+        py: Python<'py>,
+        other: Bound<'py, PyAny>,
+        rtol: f64,
+        atol: Option<Bound<'py, PyAny>>,
+        equal_nan: bool,
+    ) -> PyResult<Bound<'py, PyAny>> {
+        let (l, r, tol) = self.close_operands(py, &other, rtol, atol, equal_nan)?;
+        let close = per_dtype!(l.dtype(), T => storage::isclose::<T>(py, T::expect(&l), T::expect(&r), tol)?);
+        Ok(close.into_pyarray(py).into_any())
+    }
+
+    /// `allclose(other, rtol=1e-05, atol=None, equal_nan=False)` — whether
+    /// every element `isclose`, without building the bool array.
+    #[pyo3(signature = (other, rtol=1e-05, atol=None, equal_nan=false))]
+    fn allclose<'py>(
+        &self,
+        py: Python<'py>,
+        other: Bound<'py, PyAny>,
+        rtol: f64,
+        atol: Option<Bound<'py, PyAny>>,
+        equal_nan: bool,
+    ) -> PyResult<bool> {
+        let (l, r, tol) = self.close_operands(py, &other, rtol, atol, equal_nan)?;
+        per_dtype!(l.dtype(), T => storage::allclose::<T>(py, T::expect(&l), T::expect(&r), tol))
+    }
+
+    fn __rshift__<'py>(&self, py: Python<'py>, other: &Bound<'py, PyAny>) -> PyResult<Bound<'py, PyAny>> {
+        self.convert(py, other, None)
+    }
+
+    // numpy-style elementwise math (dimensionless only); `out` is a
+    // dimensionless QuantityNP to write the result into.
+    #[pyo3(signature = (out=None))]
+    fn sin(&self, py: Python<'_>, out: Option<Bound<'_, Self>>) -> PyResult<Py<QuantityNP>> { self.vecmath(py, Func::Sin, out) }
+    #[pyo3(signature = (out=None))]
+    fn cos(&self, py: Python<'_>, out: Option<Bound<'_, Self>>) -> PyResult<Py<QuantityNP>> { self.vecmath(py, Func::Cos, out) }
+    #[pyo3(signature = (out=None))]
+    fn tan(&self, py: Python<'_>, out: Option<Bound<'_, Self>>) -> PyResult<Py<QuantityNP>> { self.dimcall(py, f64::tan, out) }
+    #[pyo3(signature = (out=None))]
+    fn arcsin(&self, py: Python<'_>, out: Option<Bound<'_, Self>>) -> PyResult<Py<QuantityNP>> { self.dimcall(py, f64::asin, out) }
+    #[pyo3(signature = (out=None))]
+    fn arccos(&self, py: Python<'_>, out: Option<Bound<'_, Self>>) -> PyResult<Py<QuantityNP>> { self.dimcall(py, f64::acos, out) }
+    #[pyo3(signature = (out=None))]
+    fn arctan(&self, py: Python<'_>, out: Option<Bound<'_, Self>>) -> PyResult<Py<QuantityNP>> { self.dimcall(py, f64::atan, out) }
+    #[pyo3(signature = (out=None))]
+    fn degrees(&self, py: Python<'_>, out: Option<Bound<'_, Self>>) -> PyResult<Py<QuantityNP>> { self.dimcall(py, f64::to_degrees, out) }
+    #[pyo3(signature = (out=None))]
+    fn radians(&self, py: Python<'_>, out: Option<Bound<'_, Self>>) -> PyResult<Py<QuantityNP>> { self.dimcall(py, f64::to_radians, out) }
+    #[pyo3(signature = (out=None))]
+    fn deg2rad(&self, py: Python<'_>, out: Option<Bound<'_, Self>>) -> PyResult<Py<QuantityNP>> { self.dimcall(py, f64::to_radians, out) }
+    #[pyo3(signature = (out=None))]
+    fn rad2deg(&self, py: Python<'_>, out: Option<Bound<'_, Self>>) -> PyResult<Py<QuantityNP>> { self.dimcall(py, f64::to_degrees, out) }
+    #[pyo3(signature = (out=None))]
+    fn sinh(&self, py: Python<'_>, out: Option<Bound<'_, Self>>) -> PyResult<Py<QuantityNP>> { self.dimcall(py, f64::sinh, out) }
+    #[pyo3(signature = (out=None))]
+    fn cosh(&self, py: Python<'_>, out: Option<Bound<'_, Self>>) -> PyResult<Py<QuantityNP>> { self.dimcall(py, f64::cosh, out) }
+    #[pyo3(signature = (out=None))]
+    fn tanh(&self, py: Python<'_>, out: Option<Bound<'_, Self>>) -> PyResult<Py<QuantityNP>> { self.vecmath(py, Func::Tanh, out) }
+    #[pyo3(signature = (out=None))]
+    fn arcsinh(&self, py: Python<'_>, out: Option<Bound<'_, Self>>) -> PyResult<Py<QuantityNP>> { self.dimcall(py, f64::asinh, out) }
+    #[pyo3(signature = (out=None))]
+    fn arccosh(&self, py: Python<'_>, out: Option<Bound<'_, Self>>) -> PyResult<Py<QuantityNP>> { self.dimcall(py, f64::acosh, out) }
+    #[pyo3(signature = (out=None))]
+    fn arctanh(&self, py: Python<'_>, out: Option<Bound<'_, Self>>) -> PyResult<Py<QuantityNP>> { self.dimcall(py, f64::atanh, out) }
+    #[pyo3(signature = (out=None))]
+    fn exp(&self, py: Python<'_>, out: Option<Bound<'_, Self>>) -> PyResult<Py<QuantityNP>> { self.vecmath(py, Func::Exp, out) }
+    #[pyo3(signature = (out=None))]
+    fn expm1(&self, py: Python<'_>, out: Option<Bound<'_, Self>>) -> PyResult<Py<QuantityNP>> { self.dimcall(py, f64::exp_m1, out) }
+    #[pyo3(signature = (out=None))]
+    fn exp2(&self, py: Python<'_>, out: Option<Bound<'_, Self>>) -> PyResult<Py<QuantityNP>> { self.dimcall(py, f64::exp2, out) }
+    #[pyo3(signature = (out=None))]
+    fn log(&self, py: Python<'_>, out: Option<Bound<'_, Self>>) -> PyResult<Py<QuantityNP>> { self.vecmath(py, Func::Ln, out) }
+    #[pyo3(signature = (out=None))]
+    fn log10(&self, py: Python<'_>, out: Option<Bound<'_, Self>>) -> PyResult<Py<QuantityNP>> { self.dimcall(py, f64::log10, out) }
+    #[pyo3(signature = (out=None))]
+    fn log2(&self, py: Python<'_>, out: Option<Bound<'_, Self>>) -> PyResult<Py<QuantityNP>> { self.dimcall(py, f64::log2, out) }
+    #[pyo3(signature = (out=None))]
+    fn log1p(&self, py: Python<'_>, out: Option<Bound<'_, Self>>) -> PyResult<Py<QuantityNP>> { self.dimcall(py, f64::ln_1p, out) }
+
+    // ---- reductions (see reduce.rs); the nan* forms skip NaN elements ----
+
+    fn sum(&self, py: Python<'_>) -> PyResult<Quantity> { self.reduce(py, Reduction::Sum, false) }
+    fn nansum(&self, py: Python<'_>) -> PyResult<Quantity> { self.reduce(py, Reduction::Sum, true) }
+    fn mean(&self, py: Python<'_>) -> PyResult<Quantity> { self.reduce(py, Reduction::Mean, false) }
+    fn nanmean(&self, py: Python<'_>) -> PyResult<Quantity> { self.reduce(py, Reduction::Mean, true) }
+    #[pyo3(signature = (ddof=0.0))]
+    fn var(&self, py: Python<'_>, ddof: f64) -> PyResult<Quantity> { self.reduce(py, Reduction::Var(ddof), false) }
+    #[pyo3(signature = (ddof=0.0))]
+    fn nanvar(&self, py: Python<'_>, ddof: f64) -> PyResult<Quantity> { self.reduce(py, Reduction::Var(ddof), true) }
+    #[pyo3(signature = (ddof=0.0))]
+    fn std(&self, py: Python<'_>, ddof: f64) -> PyResult<Quantity> { self.reduce(py, Reduction::Std(ddof), false) }
+    #[pyo3(signature = (ddof=0.0))]
+    fn nanstd(&self, py: Python<'_>, ddof: f64) -> PyResult<Quantity> { self.reduce(py, Reduction::Std(ddof), true) }
+    fn min(&self, py: Python<'_>) -> PyResult<Quantity> { self.reduce(py, Reduction::Min, false) }
+    fn nanmin(&self, py: Python<'_>) -> PyResult<Quantity> { self.reduce(py, Reduction::Min, true) }
+    fn max(&self, py: Python<'_>) -> PyResult<Quantity> { self.reduce(py, Reduction::Max, false) }
+    fn nanmax(&self, py: Python<'_>) -> PyResult<Quantity> { self.reduce(py, Reduction::Max, true) }
+    fn ptp(&self, py: Python<'_>) -> PyResult<Quantity> { self.reduce(py, Reduction::Ptp, false) }
+    fn norm(&self, py: Python<'_>) -> PyResult<Quantity> { self.reduce(py, Reduction::Norm, false) }
+    /// Index of the smallest element in the flattened (C-order) array.
+    fn argmin(&self, py: Python<'_>) -> PyResult<usize> { self.arg_extreme(py, Ordering::Less, false) }
+    fn nanargmin(&self, py: Python<'_>) -> PyResult<usize> { self.arg_extreme(py, Ordering::Less, true) }
+    /// Index of the largest element in the flattened (C-order) array.
+    fn argmax(&self, py: Python<'_>) -> PyResult<usize> { self.arg_extreme(py, Ordering::Greater, false) }
+    fn nanargmax(&self, py: Python<'_>) -> PyResult<usize> { self.arg_extreme(py, Ordering::Greater, true) }
+
+    // ---- calculus along the last axis (see calculus.rs) ----
+
+    /// The trapezoidal-rule integral along the last axis, for samples at
+    /// positions `x` (1-D, one per sample) or a constant step `dx` (default
+    /// 1). The result carries the dimensions of `self * dx`: power
+    /// integrated over time is energy. A Quantity for a 1-D array.
+    #[pyo3(signature = (x=None, dx=None))]
+    fn trapz(&self, py: Python<'_>, x: Option<Bound<'_, PyAny>>, dx: Option<Bound<'_, PyAny>>) -> PyResult<Py<PyAny>> {
+        let result = self.along_axis(py, Kernel::Trapz, x.or(dx))?;
+        if self.storage.array(py).ndim() == 1 {
+            let total = result.storage.array(py).call_method0("item")?.extract::<f64>()?;
+            return Ok(Quantity::new(total, result.dim).into_pyobject(py)?.into_any().unbind());
+        }
+        Ok(result.into_pyobject(py)?.into_any().unbind())
+    }
+
+    /// The running trapezoidal integral along the last axis (one element
+    /// fewer along it), spaced as for `trapz`.
+    #[pyo3(signature = (x=None, dx=None))]
+    fn cumtrapz(&self, py: Python<'_>, x: Option<Bound<'_, PyAny>>, dx: Option<Bound<'_, PyAny>>) -> PyResult<QuantityNP> {
+        self.along_axis(py, Kernel::CumTrapz, x.or(dx))
+    }
+
+    /// The derivative along the last axis, as `numpy.gradient`: `spacing`
+    /// is a Quantity step (default 1) or a 1-D array of sample positions.
+    /// Position over time gives velocity.
+    #[pyo3(signature = (spacing=None))]
+    fn gradient(&self, py: Python<'_>, spacing: Option<Bound<'_, PyAny>>) -> PyResult<QuantityNP> {
+        self.along_axis(py, Kernel::Gradient, spacing)
+    }
+
+    /// Differences of neighbouring elements along the last axis (one
+    /// element fewer along it), in the array's units.
+    fn diff(&self, py: Python<'_>) -> PyResult<QuantityNP> {
+        let arr = self.storage.decoded(py)?;
+        if arr.array(py).ndim() == 0 {
+            return Err(PyValueError::new_err("diff requires input that is at least one dimensional"));
+        }
+        let result = per_dtype!(arr.dtype(), T => {
+            let view = T::expect(&arr).bind(py).readonly();
+            let y = view.as_array();
+            let out = parallel::detach(py, y.len(), || calculus::diff(&y));
+            Storage::from_owned(py, out)
+        });
+        Ok(QuantityNP::new(result, self.dim))
+    }
+
+    /// Running totals of the flattened array, compensated like `sum`.
+    fn cumsum(&self, py: Python<'_>) -> PyResult<QuantityNP> {
+        let arr = self.storage.decoded(py)?;
+        if arr.dtype().is_complex() {
+            return Err(PyTypeError::new_err("cumsum is not supported for complex QuantityNP"));
+        }
+        let result = per_dtype!(arr.dtype(), T => {
+            let view = T::expect(&arr).bind(py).readonly();
+            let y = view.as_array();
+            let out = parallel::detach(py, y.len(), || calculus::cumsum(&y));
+            Storage::from_owned(py, out)
+        });
+        Ok(QuantityNP::new(result, self.dim))
+    }
+
+    // ---- sorting and searching (see search.rs); NaNs order last ----
+
+    /// Sort in place along the last axis, as `ndarray.sort()` does.
+    fn sort(&self, py: Python<'_>) -> PyResult<()> {
+        if let Storage::Fixed(counts, _) = &self.storage {
+            // The quantum is positive, so the counts sort like the values.
+            counts.bind(py).call_method0("sort")?;
+            return Ok(());
+        }
+        let arr = self.ordered(py)?;
+        per_dtype!(arr.dtype(), T => {
+            let mut dest = T::expect(&arr)
+                .bind(py)
+                .try_readwrite()
+                .map_err(|e| PyValueError::new_err(format!("array is not writeable: {e}")))?;
+            let view = dest.as_array_mut();
+            parallel::detach(py, view.len(), || search::sort(view));
+        });
+        Ok(())
+    }
+
+    /// The indices that would sort the array along the last axis, as an
+    /// int64 ndarray.
+    fn argsort<'py>(&self, py: Python<'py>) -> PyResult<Bound<'py, PyArrayDyn<i64>>> {
+        let arr = self.ordered(py)?;
+        let out = per_dtype!(arr.dtype(), T => {
+            let view = T::expect(&arr).bind(py).readonly();
+            let a = view.as_array();
+            parallel::detach(py, a.len(), || search::argsort(&a))
+        });
+        Ok(out.into_pyarray(py))
+    }
+
+    /// Where `v` — a Quantity, or an array of them, in this array's units —
+    /// would be inserted to keep this sorted 1-D array sorted: an int for a
+    /// scalar, else an int64 ndarray of `v`'s shape. `side` picks the first
+    /// ("left") or last ("right") suitable position among equal values.
+    #[pyo3(signature = (v, side="left"))]
+    fn searchsorted(&self, py: Python<'_>, v: &Bound<'_, PyAny>, side: &str) -> PyResult<Py<PyAny>> {
+        let side = match side {
+            "left" => search::Side::Left,
+            "right" => search::Side::Right,
+            _ => return Err(PyValueError::new_err(format!("side must be 'left' or 'right' (got {side:?})"))),
+        };
+        let arr = self.ordered(py)?;
+        if arr.array(py).ndim() != 1 {
+            return Err(PyValueError::new_err("searchsorted needs a 1-D array"));
+        }
+        if let Some(q) = Operand::classify(v)?.as_quantity() {
+            if q.dim != self.dim {
+                return Err(EIncompatibleUnits::new_err("Incompatible units"));
+            }
+            let i = per_dtype!(arr.dtype(), T => {
+                let view = T::expect(&arr).bind(py).readonly();
+                let haystack = view.as_array().into_dimensionality::<Ix1>().expect("checked 1-D");
+                search::position(&haystack, q.magnitude, side)
+            });
+            return Ok(i.into_pyobject(py)?.into_any().unbind());
+        }
+        let needles = self.same_unit_values(py, v, "v")?;
+        let needles = needles.bind(py).readonly();
+        let n = needles.as_array();
+        let out = per_dtype!(arr.dtype(), T => {
+            let view = T::expect(&arr).bind(py).readonly();
+            let haystack = view.as_array().into_dimensionality::<Ix1>().expect("checked 1-D");
+            parallel::detach(py, n.len(), || search::searchsorted(&haystack, &n, side))
+        });
+        Ok(out.into_pyarray(py).into_any().unbind())
+    }
+
+    /// The sorted distinct values of the flattened array.
+    fn unique(&self, py: Python<'_>) -> PyResult<QuantityNP> {
+        let arr = self.ordered(py)?;
+        let values = per_dtype!(arr.dtype(), T => {
+            let view = T::expect(&arr).bind(py).readonly();
+            let a = view.as_array();
+            let out = parallel::detach(py, a.len(), || search::unique(&a));
+            Storage::from_owned(py, out)
         });
-        Ok(cmp.into_pyobject(py)?.into_any().unbind())
-    }
-
-    fn __rshift__(&self, py: Python<'_>, other: &Bound<'_, PyAny>) -> PyResult<Py<PyArray1<f64>>> {
-        self.convert(py, other)
-    }
-
-    // numpy-style elementwise math (dimensionless only)
-    fn sin(&self, py: Python<'_>) -> PyResult<QuantityNP> { self.dimcall(py, f64::sin) }
-    fn cos(&self, py: Python<'_>) -> PyResult<QuantityNP> { self.dimcall(py, f64::cos) }
-    fn tan(&self, py: Python<'_>) -> PyResult<QuantityNP> { self.dimcall(py, f64::tan) }
-    fn arcsin(&self, py: Python<'_>) -> PyResult<QuantityNP> { self.dimcall(py, f64::asin) }
-    fn arccos(&self, py: Python<'_>) -> PyResult<QuantityNP> { self.dimcall(py, f64::acos) }
-    fn arctan(&self, py: Python<'_>) -> PyResult<QuantityNP> { self.dimcall(py, f64::atan) }
-    fn degrees(&self, py: Python<'_>) -> PyResult<QuantityNP> { self.dimcall(py, f64::to_degrees) }
-    fn radians(&self, py: Python<'_>) -> PyResult<QuantityNP> { self.dimcall(py, f64::to_radians) }
-    fn deg2rad(&self, py: Python<'_>) -> PyResult<QuantityNP> { self.dimcall(py, f64::to_radians) }
-    fn rad2deg(&self, py: Python<'_>) -> PyResult<QuantityNP> { self.dimcall(py, f64::to_degrees) }
-    fn sinh(&self, py: Python<'_>) -> PyResult<QuantityNP> { self.dimcall(py, f64::sinh) }
-    fn cosh(&self, py: Python<'_>) -> PyResult<QuantityNP> { self.dimcall(py, f64::cosh) }
-    fn tanh(&self, py: Python<'_>) -> PyResult<QuantityNP> { self.dimcall(py, f64::tanh) }
-    fn arcsinh(&self, py: Python<'_>) -> PyResult<QuantityNP> { self.dimcall(py, f64::asinh) }
-    fn arccosh(&self, py: Python<'_>) -> PyResult<QuantityNP> { self.dimcall(py, f64::acosh) }
-    fn arctanh(&self, py: Python<'_>) -> PyResult<QuantityNP> { self.dimcall(py, f64::atanh) }
-    fn exp(&self, py: Python<'_>) -> PyResult<QuantityNP> { self.dimcall(py, f64::exp) }
-    fn expm1(&self, py: Python<'_>) -> PyResult<QuantityNP> { self.dimcall(py, f64::exp_m1) }
-    fn exp2(&self, py: Python<'_>) -> PyResult<QuantityNP> { self.dimcall(py, f64::exp2) }
-    fn log(&self, py: Python<'_>) -> PyResult<QuantityNP> { self.dimcall(py, f64::ln) }
-    fn log10(&self, py: Python<'_>) -> PyResult<QuantityNP> { self.dimcall(py, f64::log10) }
-    fn log2(&self, py: Python<'_>) -> PyResult<QuantityNP> { self.dimcall(py, f64::log2) }
-    fn log1p(&self, py: Python<'_>) -> PyResult<QuantityNP> { self.dimcall(py, f64::ln_1p) }
+        Ok(QuantityNP::new(values, self.dim))
+    }
+
+    /// The index of the bin each element falls in, as `numpy.digitize`:
+    /// `bins` is 1-D, in this array's units, and sorted either way.
+    #[pyo3(signature = (bins, right=false))]
+    fn digitize<'py>(&self, py: Python<'py>, bins: &Bound<'py, PyAny>, right: bool) -> PyResult<Bound<'py, PyArrayDyn<i64>>> {
+        let arr = self.ordered(py)?;
+        let bins = self.same_unit_values(py, bins, "bins")?;
+        let bins = bins.bind(py).readonly();
+        let Ok(edges) = bins.as_array().into_dimensionality::<Ix1>() else {
+            return Err(PyValueError::new_err("bins must be one-dimensional"));
+        };
+        let out = per_dtype!(arr.dtype(), T => {
+            let view = T::expect(&arr).bind(py).readonly();
+            let a = view.as_array();
+            parallel::detach(py, a.len(), || search::digitize(&a, &edges, right))
+        });
+        out.map(|o| o.into_pyarray(py))
+            .ok_or_else(|| PyValueError::new_err("bins must be monotonically increasing or decreasing"))
+    }
 }
 
 impl QuantityNP {
-    fn dimcall(&self, py: Python<'_>, f: fn(f64) -> f64) -> PyResult<QuantityNP> {
+    /// A whole-array reduction as a scalar Quantity. Variance carries the
+    /// square of the dimensions; everything else keeps them.
+    fn reduce(&self, py: Python<'_>, reduction: Reduction, skip_nan: bool) -> PyResult<Quantity> {
+        let arr = self.storage.decoded(py)?;
+        let value = per_dtype!(arr.dtype(), T => {
+            if T::DTYPE.is_complex() {
+                return Err(PyTypeError::new_err(
+                    "reductions are not supported for complex QuantityNP",
+                ));
+            }
+            let view = T::expect(&arr).bind(py).readonly();
+            let a = view.as_array();
+            py.detach(|| reduce::run(&a, reduction, skip_nan))
+        });
+        let Some(value) = value else {
+            return Err(PyValueError::new_err(format!(
+                "zero-size array to reduction operation {} which has no identity",
+                reduction.name()
+            )));
+        };
+        let dim = match reduction {
+            Reduction::Var(_) => self.dim.scale(2.0),
+            _ => self.dim,
+        };
+        Ok(Quantity::new(value, dim))
+    }
+
+    /// `kernel` along the last axis, for samples spaced by `spacing`: a
+    /// Quantity step (None for a dimensionless 1) or an array of positions.
+    fn along_axis(&self, py: Python<'_>, kernel: Kernel, spacing: Option<Bound<'_, PyAny>>) -> PyResult<QuantityNP> {
+        let name = kernel.name();
+        let arr = self.storage.decoded(py)?;
+        if arr.dtype().is_complex() {
+            return Err(PyTypeError::new_err(format!("{name} is not supported for complex QuantityNP")));
+        }
+        let Some(&n) = arr.array(py).shape().last() else {
+            return Err(PyValueError::new_err(format!("{name} requires input that is at least one dimensional")));
+        };
+        if kernel == Kernel::Gradient && n < 2 {
+            return Err(PyValueError::new_err("gradient needs at least 2 samples along the last axis"));
+        }
+        let (positions, step, spacing_dim) = match spacing {
+            None => (None, 1.0, Dim::DIMENSIONLESS),
+            Some(spacing) => match Operand::classify(&spacing)?.as_quantity() {
+                Some(q) => (None, q.magnitude, q.dim),
+                None => {
+                    let Some(x) = QuantityNP::coerce_operand(py, &spacing)? else {
+                        return Err(PyTypeError::new_err(format!(
+                            "{name} needs a Quantity step or an array of sample positions"
+                        )));
+                    };
+                    let positions = x.storage.to_f64(py)?;
+                    if positions.bind(py).shape() != [n].as_slice() {
+                        return Err(PyValueError::new_err(format!(
+                            "the sample positions must be a 1-D array of length {n}"
+                        )));
+                    }
+                    (Some(positions), 0.0, x.dim)
+                }
+            },
+        };
+        let held = positions.as_ref().map(|p| p.bind(py).readonly());
+        let spacing = match &held {
+            Some(x) => Spacing::Samples(x.as_array().into_dimensionality::<Ix1>().expect("checked 1-D")),
+            None => Spacing::Uniform(step),
+        };
+        let result = per_dtype!(arr.dtype(), T => {
+            let view = T::expect(&arr).bind(py).readonly();
+            let y = view.as_array();
+            let out = parallel::detach(py, y.len(), || calculus::run(kernel, &y, &spacing));
+            Storage::from_owned(py, out)
+        });
+        Ok(QuantityNP::new(result, kernel.result_dim(&self.dim, &spacing_dim)))
+    }
+
+    /// The storage in a dtype that can be ordered (fixed-point decoded);
+    /// complex values have no ordering.
+    fn ordered(&self, py: Python<'_>) -> PyResult<Storage> {
+        let arr = self.storage.decoded(py)?;
+        if arr.dtype().is_complex() {
+            return Err(PyTypeError::new_err("complex values have no ordering"));
+        }
+        Ok(arr)
+    }
+
+    /// `other` (a quantity or an array) as float64 magnitudes, checking
+    /// that it is in this array's units.
+    fn same_unit_values(&self, py: Python<'_>, other: &Bound<'_, PyAny>, what: &str) -> PyResult<Py<PyArrayDyn<f64>>> {
+        let Some(other) = QuantityNP::coerce_operand(py, other)? else {
+            return Err(PyTypeError::new_err(format!("{what} must be a quantity or an array")));
+        };
+        if other.dim != self.dim {
+            return Err(EIncompatibleUnits::new_err("Incompatible units"));
+        }
+        other.storage.to_f64(py)
+    }
+
+    fn arg_extreme(&self, py: Python<'_>, want: Ordering, skip_nan: bool) -> PyResult<usize> {
+        let arr = self.storage.decoded(py)?;
+        let (found, empty) = per_dtype!(arr.dtype(), T => {
+            if T::DTYPE.is_complex() {
+                return Err(PyTypeError::new_err(
+                    "complex values have no ordering",
+                ));
+            }
+            let view = T::expect(&arr).bind(py).readonly();
+            let a = view.as_array();
+            (py.detach(|| reduce::extreme(&a, skip_nan, want)), a.is_empty())
+        });
+        match found {
+            Some((index, _)) => Ok(index),
+            None if empty => Err(PyValueError::new_err(
+                "attempt to get argmin or argmax of an empty sequence",
+            )),
+            None => Err(PyValueError::new_err("All-NaN slice encountered")),
+        }
+    }
+
+    /// The two sides of `isclose`/`allclose`, cast to a common dtype, and
+    /// the tolerances in base units.
+    fn close_operands(
+        &self,
+        py: Python<'_>,
+        other: &Bound<'_, PyAny>,
+        rtol: f64,
+        atol: Option<Bound<'_, PyAny>>,
+        equal_nan: bool,
+    ) -> PyResult<(Storage, Storage, Tolerance)> {
+        let Some(rhs) = QuantityNP::coerce_operand(py, other)? else {
+            return Err(PyTypeError::new_err("isclose needs a quantity or an array to compare with"));
+        };
+        if self.dim != rhs.dim {
+            return Err(EIncompatibleUnits::new_err("Incompatible units"));
+        }
+        let atol = match atol {
+            None if self.dim.is_dimensionless() => 1e-08,
+            None => 0.0,
+            Some(atol) => match Operand::classify(&atol)?.as_quantity() {
+                Some(q) if q.dim == self.dim => q.magnitude,
+                Some(_) => return Err(EIncompatibleUnits::new_err("atol must be in the units of the array")),
+                None => return Err(PyTypeError::new_err("atol must be a Quantity")),
+            },
+        };
+        let dtype = self.storage.dtype().promote(rhs.storage.dtype());
+        let tol = Tolerance { rtol, atol, equal_nan };
+        Ok((self.storage.cast(py, dtype)?, rhs.storage.cast(py, dtype)?, tol))
+    }
+
+    /// `self[index]` for an index of plain slices (`x[a:b:c]`, `x[::-1]`,
+    /// `x[i:j, ::2]`): a view sharing this array's buffer, built here
+    /// rather than through numpy's indexing machinery. None for any other
+    /// index, a read-only array, or fixed-point storage.
+    fn slice_view(&self, py: Python<'_>, index: &Bound<'_, PyAny>) -> PyResult<Option<QuantityNP>> {
+        let slices = if let Ok(slice) = index.cast::<PySlice>() {
+            vec![slice.clone()]
+        } else if let Ok(items) = index.cast::<PyTuple>() {
+            match items.iter().map(|i| i.cast_into::<PySlice>().ok()).collect::<Option<Vec<_>>>() {
+                Some(slices) => slices,
+                None => return Ok(None),
+            }
+        } else {
+            return Ok(None);
+        };
+        if matches!(self.storage, Storage::Fixed(..)) {
+            return Ok(None);
+        }
+        let storage = per_dtype!(self.storage.dtype(), T => {
+            let arr = T::expect(&self.storage).bind(py);
+            if slices.len() > arr.ndim() || !is_writeable(arr.as_untyped()) {
+                return Ok(None);
+            }
+            // SAFETY: the view is only used for its pointer and strides; no
+            // element is read or written here.
+            let mut view = unsafe { arr.as_array() };
+            for (axis, slice) in slices.iter().enumerate() {
+                let s = slice.indices(view.len_of(Axis(axis)) as isize)?;
+                view.slice_axis_inplace(Axis(axis), numpy_slice(s.start, s.step, s.slicelength as usize));
+            }
+            // SAFETY: the new array's base is `arr`, which keeps the buffer
+            // alive for as long as the view exists.
+            let sliced = unsafe { PyArrayDyn::<T>::borrow_from_array(&view, arr.clone().into_any()) };
+            T::wrap(sliced.unbind())
+        });
+        Ok(Some(QuantityNP { storage, dim: self.dim, share: Arc::clone(&self.share) }))
+    }
+
+    /// `self[index]` gathered in Rust, for a boolean mask of the array's
+    /// shape or a 1-D array of integer positions. None for any other index
+    /// (and for fixed-point storage), which numpy then handles.
+    fn gather(&self, py: Python<'_>, index: &Bound<'_, PyAny>) -> PyResult<Option<QuantityNP>> {
+        if matches!(self.storage, Storage::Fixed(..)) {
+            return Ok(None);
+        }
+        let gathered = if let Ok(mask) = index.cast::<PyArrayDyn<bool>>() {
+            let mask = mask.readonly();
+            per_dtype!(self.storage.dtype(), T => {
+                storage::mask::<T>(py, T::expect(&self.storage), &mask.as_array()).map(|a| Storage::from_owned(py, a))
+            })
+        } else if let Ok(indices) = index.cast::<PyArrayDyn<i64>>() {
+            let indices = indices.readonly();
+            per_dtype!(self.storage.dtype(), T => {
+                storage::take::<T>(py, T::expect(&self.storage), &indices.as_array())?.map(|a| Storage::from_owned(py, a))
+            })
+        } else {
+            None
+        };
+        Ok(gathered.map(|storage| QuantityNP::new(storage, self.dim)))
+    }
+
+    /// Numpy indexing of the stored array: sub-arrays stay QuantityNP
+    /// (views, for basic slicing), single real elements become Quantity.
+    fn index_via_numpy(&self, py: Python<'_>, index: Bound<'_, PyAny>) -> PyResult<Py<PyAny>> {
+        let result = self.storage.array(py).get_item(index)?;
+        if result.cast::<PyUntypedArray>().is_ok() {
+            return Ok(self.rewrap(&result)?.into_pyobject(py)?.into_any().unbind());
+        }
+        if self.storage.dtype().is_complex() {
+            // Quantity is real: keep a complex element as a 0-d array.
+            let arr = py.import("numpy")?.call_method1("asarray", (result,))?;
+            return Ok(self.rewrap(&arr)?.into_pyobject(py)?.into_any().unbind());
+        }
+        let mut scalar = result.extract::<f64>()?;
+        if let Storage::Fixed(_, quantum) = self.storage {
+            scalar *= quantum;
+        }
+        Ok(Quantity::new(scalar, self.dim)
+            .into_pyobject(py)?
+            .into_any()
+            .unbind())
+    }
+
+    /// `dimcall` for a function with a vector kernel: float64 input
+    /// without `out` runs through `vmath`, anything else one element at a
+    /// time with the same per-element results.
+    fn vecmath(&self, py: Python<'_>, func: Func, out: Option<Bound<'_, QuantityNP>>) -> PyResult<Py<QuantityNP>> {
+        if out.is_none() && self.dim.is_dimensionless() {
+            if let Storage::F64(a) = self.storage.decoded(py)? {
+                return Py::new(py, QuantityNP::new(vector_map(py, &a, func), Dim::DIMENSIONLESS));
+            }
+        }
+        self.dimcall(py, move |x| func.eval(x), out)
+    }
+
+    fn dimcall(
+        &self,
+        py: Python<'_>,
+        f: impl Fn(f64) -> f64 + Copy + Send + Sync,
+        out: Option<Bound<'_, QuantityNP>>,
+    ) -> PyResult<Py<QuantityNP>> {
         if !self.dim.is_dimensionless() {
             return Err(EIncompatibleUnits::new_err(
                 "Argument must be dimensionless.",
             ));
         }
-        let view = self.magnitude.bind(py).readonly();
-        let arr = view.as_array();
-        let result: Array1<f64> = py.detach(|| arr.mapv(f));
-        Ok(QuantityNP::new(
-            result.into_pyarray(py).unbind(),
-            Dim::DIMENSIONLESS,
-        ))
+        let Some(out) = out else {
+            return Py::new(py, self.map_elements(py, Dim::DIMENSIONLESS, f)?);
+        };
+        out.try_borrow()?.check_unit_change(Dim::DIMENSIONLESS)?;
+        let dest = Self::out_storage(py, &out)?;
+        let src = Input::Array(self.storage.clone_ref(py));
+        per_dtype!(dest.dtype(), T => {
+            if T::DTYPE.is_complex() || self.storage.dtype().is_complex() {
+                return Err(PyTypeError::new_err(
+                    "this function is not supported for complex QuantityNP",
+                ));
+            }
+            let src = Self::input_data::<T>(py, &src)?;
+            // The kernel is binary; its second input is ignored here.
+            let unused = Data::Scalar(T::from_f64(0.0));
+            storage::write_into(py, T::expect(&dest).bind(py), &src, &unused, |a, _| {
+                T::from_f64(f(a.to_f64()))
+            })?;
+        });
+        if !out.try_borrow()?.dim.is_dimensionless() {
+            out.try_borrow_mut()?.dim = Dim::DIMENSIONLESS;
+        }
+        Ok(out.unbind())
+    }
+}
+
+/// `values` as a 1-D array.
+fn column(values: Vec<f64>) -> ArrayD<f64> {
+    ArrayD::from_shape_vec(IxDyn(&[values.len()]), values).expect("1-D shape")
+}
+
+/// `tolist()` of one (sub)array.
+fn nested_quantities(py: Python<'_>, a: ArrayViewD<'_, f64>, dim: Dim) -> PyResult<Py<PyAny>> {
+    match a.ndim() {
+        0 => {
+            let v = *a.first().expect("a 0-d array holds one element");
+            Ok(Quantity::new(v, dim).into_pyobject(py)?.into_any().unbind())
+        }
+        1 => Ok(PyList::new(py, a.iter().map(|&v| Quantity::new(v, dim)))?.into_any().unbind()),
+        _ => {
+            let rows = a
+                .outer_iter()
+                .map(|row| nested_quantities(py, row, dim))
+                .collect::<PyResult<Vec<_>>>()?;
+            Ok(PyList::new(py, rows)?.into_any().unbind())
+        }
+    }
+}
+
+/// numpy's slice `start, start + step, ...` (`len` elements) as an
+/// ndarray `Slice`, which always names an ascending range and walks it
+/// from the far end when the step is negative.
+fn numpy_slice(start: isize, step: isize, len: usize) -> Slice {
+    if len == 0 {
+        return Slice::new(0, Some(0), 1);
+    }
+    let last = start + (len as isize - 1) * step;
+    if step > 0 {
+        Slice::new(start, Some(last + 1), step)
+    } else {
+        Slice::new(last, Some(start + 1), step)
+    }
+}
+
+fn is_writeable(arr: &Bound<'_, PyUntypedArray>) -> bool {
+    // SAFETY: reads the flags of a live array object.
+    unsafe { (*arr.as_array_ptr()).flags & NPY_ARRAY_WRITEABLE != 0 }
+}
+
+/// Whether the memory spanned by `a` and `b` overlaps, as numpy's
+/// `may_share_memory`: a bounds check, not an element-by-element one.
+fn overlaps(a: &Bound<'_, PyUntypedArray>, b: &Bound<'_, PyUntypedArray>) -> bool {
+    match (extent(a), extent(b)) {
+        (Some((a0, a1)), Some((b0, b1))) => a0 < b1 && b0 < a1,
+        _ => false,
+    }
+}
+
+/// The byte range `[start, end)` spanned by `arr`'s elements, or None if it
+/// has none.
+fn extent(arr: &Bound<'_, PyUntypedArray>) -> Option<(usize, usize)> {
+    if arr.is_empty() {
+        return None;
+    }
+    // SAFETY: reads the data pointer of a live array object.
+    let data = unsafe { (*arr.as_array_ptr()).data } as isize;
+    let (mut start, mut end) = (data, data + arr.dtype().itemsize() as isize);
+    for (&len, &stride) in arr.shape().iter().zip(arr.strides()) {
+        let reach = (len as isize - 1) * stride;
+        if reach < 0 {
+            start += reach;
+        } else {
+            end += reach;
+        }
+    }
+    Some((start as usize, end as usize))
+}
+
+/// `func` over a float64 array through the vector kernels of `vmath`.
+fn vector_map(py: Python<'_>, a: &Py<PyArrayDyn<f64>>, func: Func) -> Storage {
+    let view = a.bind(py).readonly();
+    let arr = view.as_array();
+    let out = parallel::detach(py, arr.len(), || vmath::map(func, &arr));
+    Storage::from_owned(py, out)
+}
+
+/// The iterator of a `QuantityNP`. A real 1-D array yields `Quantity`
+/// scalars, each read straight from the buffer; anything else yields
+/// `x[i]` (rows, or 0-d arrays for complex elements). Like numpy's, it
+/// sees writes made to the array while iterating.
+#[pyclass(module = "misu._engine")]
+pub struct QuantityNPIterator {
+    owner: Py<QuantityNP>,
+    /// The real 1-D storage, when each step is an element read. Fixed-point
+    /// counts stay encoded and are scaled one at a time.
+    values: Option<Storage>,
+    dim: Dim,
+    pos: usize,
+    len: usize,
+}
+
+#[pymethods]
+impl QuantityNPIterator {
+    fn __iter__(slf: PyRef<'_, Self>) -> PyRef<'_, Self> {
+        slf
+    }
+
+    fn __next__(&mut self, py: Python<'_>) -> PyResult<Option<Py<PyAny>>> {
+        if self.pos >= self.len {
+            return Ok(None);
+        }
+        let i = self.pos;
+        self.pos += 1;
+        let Some(values) = &self.values else {
+            let owner = self.owner.borrow(py);
+            return owner.index_via_numpy(py, i.into_pyobject(py)?.into_any()).map(Some);
+        };
+        let v = match values {
+            Storage::Fixed(counts, quantum) => Some(counts.bind(py).get_item(i)?.extract::<f64>()? * quantum),
+            _ => per_dtype!(values.dtype(), T => {
+                T::expect(values).bind(py).get_owned(&[i][..]).map(Elem::to_f64)
+            }),
+        };
+        match v {
+            Some(v) => Ok(Some(Quantity::new(v, self.dim).into_pyobject(py)?.into_any().unbind())),
+            None => Ok(None),
+        }
     }
 }
 
+/// Rebuild a QuantityNP from its magnitude and unit (pickling, and the
+/// numpy hooks in `misu._ufunc`). With `view_of`, the QuantityNP that
+/// `magnitude` was computed from, the result counts as a view of it when
+/// their buffers overlap.
 #[pyfunction]
+#[pyo3(signature = (magnitude, unit, quantum=None, view_of=None))]
 pub fn _restore_quantity_np(
     py: Python<'_>,
     magnitude: Bound<'_, PyAny>,
     unit: Vec<f64>,
+    quantum: Option<f64>,
+    view_of: Option<PyRef<'_, QuantityNP>>,
 ) -> PyResult<QuantityNP> {
-    if unit.len() != 7 {
-        return Err(pyo3::exceptions::PyValueError::new_err(
-            "unit list must have length 7",
-        ));
-    }
-    let mut arr = [0.0; 7];
-    arr.copy_from_slice(&unit);
-    let mut q = QuantityNP::coerce(py, &magnitude)?;
-    q.dim = Dim(arr);
-    Ok(q)
+    let dim = dim_from_list(&unit)?;
+    if let Some(quantum) = quantum {
+        let counts = magnitude.cast_into::<PyUntypedArray>()?;
+        return Ok(QuantityNP::new(Storage::Fixed(counts.unbind(), quantum), dim));
+    }
+    let storage = QuantityNP::coerce(py, &magnitude)?.storage;
+    Ok(match view_of {
+        Some(source) => source.derive(py, storage, dim),
+        None => QuantityNP::new(storage, dim),
+    })
 }
@@ -0,0 +1,175 @@
+//! Whole-array reductions for `QuantityNP` (sum, mean, var, min, ...).
+//!
+//! The kernels read any real dtype through a (possibly strided) view and
+//! accumulate in `f64`, so they run without the GIL and never copy their
+//! input. Sums use Neumaier's compensated summation: the rounding error
+//! stays at a few ulp of the result however many elements there are,
+//! where naive accumulation grows with the length.
+//!
+//! Every kernel takes `skip_nan`, which backs the `nan*` methods: NaN
+//! elements are left out instead of propagating.
+
+use std::cmp::Ordering;
+
+use numpy::ndarray::ArrayViewD;
+
+use crate::storage::Elem;
+
+/// A reduction to a single value.
+#[derive(Clone, Copy, Debug)]
+pub enum Reduction {
+    Sum,
+    Mean,
+    /// Variance with `ddof` delta degrees of freedom.
+    Var(f64),
+    /// Standard deviation with `ddof` delta degrees of freedom.
+    Std(f64),
+    Min,
+    Max,
+    /// Peak to peak: `max - min`.
+    Ptp,
+    /// The Euclidean (L2) norm.
+    Norm,
+}
+
+impl Reduction {
+    /// numpy's name for the reduction, for error messages.
+    pub fn name(self) -> &'static str {
+        match self {
+            Reduction::Sum => "sum",
+            Reduction::Mean => "mean",
+            Reduction::Var(_) => "var",
+            Reduction::Std(_) => "std",
+            Reduction::Min => "minimum",
+            Reduction::Max => "maximum",
+            Reduction::Ptp => "ptp",
+            Reduction::Norm => "norm",
+        }
+    }
+}
+
+/// Neumaier's variant of Kahan summation.
+#[derive(Default)]
+pub struct Sum {
+    total: f64,
+    compensation: f64,
+    count: usize,
+}
+
+impl Sum {
+    #[inline]
+    pub fn add(&mut self, x: f64) {
+        let t = self.total + x;
+        if self.total.abs() >= x.abs() {
+            self.compensation += (self.total - t) + x;
+        } else {
+            self.compensation += (x - t) + self.total;
+        }
+        self.total = t;
+        self.count += 1;
+    }
+
+    pub fn value(&self) -> f64 {
+        // Once the total overflows or meets a NaN, the compensation is
+        // meaningless (inf - inf) and must not turn an inf into a NaN.
+        if self.total.is_finite() {
+            self.total + self.compensation
+        } else {
+            self.total
+        }
+    }
+}
+
+fn values<'a, T: Elem>(a: &'a ArrayViewD<'_, T>, skip_nan: bool) -> impl Iterator<Item = f64> + 'a {
+    a.iter().map(|x| x.to_f64()).filter(move |x| !(skip_nan && x.is_nan()))
+}
+
+fn sum<T: Elem>(a: &ArrayViewD<'_, T>, skip_nan: bool) -> Sum {
+    let mut s = Sum::default();
+    values(a, skip_nan).for_each(|x| s.add(x));
+    s
+}
+
+fn var<T: Elem>(a: &ArrayViewD<'_, T>, skip_nan: bool, ddof: f64) -> f64 {
+    // Two passes: the sum of squared deviations from the mean is far
+    // better conditioned than E[x^2] - E[x]^2.
+    let total = sum(a, skip_nan);
+    let mean = total.value() / total.count as f64;
+    let mut squares = Sum::default();
+    values(a, skip_nan).for_each(|x| squares.add((x - mean) * (x - mean)));
+    let dof = total.count as f64 - ddof;
+    if dof > 0.0 {
+        squares.value() / dof
+    } else {
+        f64::NAN
+    }
+}
+
+/// The first index and value of the smallest (`Ordering::Less`) or largest
+/// (`Ordering::Greater`) element. Without `skip_nan` the first NaN wins, as
+/// in numpy. None if there is no candidate element.
+pub fn extreme<T: Elem>(a: &ArrayViewD<'_, T>, skip_nan: bool, want: Ordering) -> Option<(usize, f64)> {
+    let mut best: Option<(usize, f64)> = None;
+    for (i, x) in a.iter().map(|x| x.to_f64()).enumerate() {
+        if x.is_nan() {
+            if skip_nan {
+                continue;
+            }
+            return Some((i, x));
+        }
+        match best {
+            Some((_, b)) if x.partial_cmp(&b) != Some(want) => {}
+            _ => best = Some((i, x)),
+        }
+    }
+    best
+}
+
+fn norm<T: Elem>(a: &ArrayViewD<'_, T>) -> f64 {
+    // Scale by the largest magnitude so the squares cannot overflow or
+    // underflow.
+    let mut scale = 0.0_f64;
+    for x in a.iter().map(|x| x.to_f64()) {
+        if x.is_nan() {
+            return f64::NAN;
+        }
+        scale = scale.max(x.abs());
+    }
+    if scale == 0.0 || scale.is_infinite() {
+        return scale;
+    }
+    let mut s = Sum::default();
+    a.iter().for_each(|x| {
+        let r = x.to_f64() / scale;
+        s.add(r * r);
+    });
+    scale * s.value().sqrt()
+}
+
+/// Reduce `a` to one value. None for an extremum of an empty array, which
+/// has no identity.
+pub fn run<T: Elem>(a: &ArrayViewD<'_, T>, reduction: Reduction, skip_nan: bool) -> Option<f64> {
+    let extreme_value = |want| {
+        if a.is_empty() {
+            return None;
+        }
+        // All-NaN with skip_nan: NaN, as numpy's nanmin gives.
+        Some(extreme(a, skip_nan, want).map_or(f64::NAN, |(_, x)| x))
+    };
+    match reduction {
+        Reduction::Sum => Some(sum(a, skip_nan).value()),
+        Reduction::Mean => {
+            let s = sum(a, skip_nan);
+            Some(s.value() / s.count as f64)
+        }
+        Reduction::Var(ddof) => Some(var(a, skip_nan, ddof)),
+        Reduction::Std(ddof) => Some(var(a, skip_nan, ddof).sqrt()),
+        Reduction::Min => extreme_value(Ordering::Less),
+        Reduction::Max => extreme_value(Ordering::Greater),
+        Reduction::Ptp => {
+            Some(extreme_value(Ordering::Greater)? - extreme_value(Ordering::Less)?)
+        }
+        Reduction::Norm => Some(norm(a)),
+    }
+}
+
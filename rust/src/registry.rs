@@ -15,7 +15,7 @@ use once_cell::sync::Lazy;
 use parking_lot::RwLock;
 use pyo3::prelude::*;
 
-use crate::dim::Dim;
+use crate::dim::DimMap;
 use crate::quantity::Quantity;
 
 /// Display configuration: how a particular Dim should be printed.
@@ -28,11 +28,11 @@ pub struct RepresentEntry {
     pub format_spec: String,
 }
 
-pub static QUANTITY_TYPE: Lazy<RwLock<HashMap<Dim, String>>> =
-    Lazy::new(|| RwLock::new(HashMap::new()));
+pub static QUANTITY_TYPE: Lazy<RwLock<DimMap<String>>> =
+    Lazy::new(|| RwLock::new(DimMap::default()));
 
-pub static REPRESENT_CACHE: Lazy<RwLock<HashMap<Dim, RepresentEntry>>> =
-    Lazy::new(|| RwLock::new(HashMap::new()));
+pub static REPRESENT_CACHE: Lazy<RwLock<DimMap<RepresentEntry>>> =
+    Lazy::new(|| RwLock::new(DimMap::default()));
 
 pub static UNIT_REGISTRY: Lazy<RwLock<HashMap<String, Py<Quantity>>>> =
     Lazy::new(|| RwLock::new(HashMap::new()));
@@ -0,0 +1,132 @@
+//! Sorting and searching kernels for `QuantityNP`: sort, argsort,
+//! searchsorted, unique and digitize.
+//!
+//! Values are ordered as numpy orders them, with NaNs after everything
+//! else. Index results are `i64`, numpy's default integer on 64-bit
+//! platforms. The kernels take plain views, so callers run them with the
+//! GIL released.
+
+use std::cmp::Ordering;
+
+use numpy::ndarray::{ArrayD, ArrayView1, ArrayViewD, ArrayViewMutD, Axis, IxDyn};
+
+use crate::parallel;
+use crate::storage::Elem;
+
+/// numpy's sort order: the usual one, with NaNs last.
+#[inline]
+pub fn order(a: f64, b: f64) -> Ordering {
+    a.partial_cmp(&b)
+        .unwrap_or_else(|| a.is_nan().cmp(&b.is_nan()))
+}
+
+/// Which of several equal positions `searchsorted` reports.
+#[derive(Clone, Copy, Debug, PartialEq, Eq)]
+pub enum Side {
+    /// The first: before any elements equal to the needle.
+    Left,
+    /// The last: after any elements equal to the needle.
+    Right,
+}
+
+/// Sort every lane along the last axis, in place.
+pub fn sort<T: Elem>(mut a: ArrayViewMutD<'_, T>) {
+    if a.ndim() == 0 {
+        return;
+    }
+    let axis = Axis(a.ndim() - 1);
+    let mut scratch = Vec::new();
+    for mut lane in a.lanes_mut(axis) {
+        if let Some(values) = lane.as_slice_mut() {
+            values.sort_unstable_by(|x, y| order(x.to_f64(), y.to_f64()));
+            continue;
+        }
+        // A strided lane: sort a contiguous copy and write it back.
+        scratch.clear();
+        scratch.extend(lane.iter().copied());
+        scratch.sort_unstable_by(|x, y| order(x.to_f64(), y.to_f64()));
+        lane.iter_mut().zip(&scratch).for_each(|(o, &x)| *o = x);
+    }
+}
+
+/// The indices that sort each lane along the last axis. The sort is
+/// stable, so equal values keep their order.
+pub fn argsort<T: Elem>(a: &ArrayViewD<'_, T>) -> ArrayD<i64> {
+    let mut out = ArrayD::<i64>::zeros(a.raw_dim());
+    if a.ndim() == 0 {
+        return out;
+    }
+    let axis = Axis(a.ndim() - 1);
+    let mut indices = Vec::new();
+    for (lane, mut dst) in a.lanes(axis).into_iter().zip(out.lanes_mut(axis)) {
+        indices.clear();
+        indices.extend(0..lane.len());
+        indices.sort_by(|&i, &j| order(lane[i].to_f64(), lane[j].to_f64()));
+        dst.iter_mut()
+            .zip(&indices)
+            .for_each(|(o, &i)| *o = i as i64);
+    }
+    out
+}
+
+/// Where `v` would go in the sorted `haystack`, by binary search.
+pub fn position<T: Elem>(haystack: &ArrayView1<'_, T>, v: f64, side: Side) -> usize {
+    let (mut lo, mut hi) = (0, haystack.len());
+    while lo < hi {
+        let mid = lo + (hi - lo) / 2;
+        let o = order(haystack[mid].to_f64(), v);
+        let before = match side {
+            Side::Left => o == Ordering::Less,
+            Side::Right => o != Ordering::Greater,
+        };
+        if before {
+            lo = mid + 1;
+        } else {
+            hi = mid;
+        }
+    }
+    lo
+}
+
+/// `position` of every needle, in the needles' shape.
+pub fn searchsorted<T: Elem>(
+    haystack: &ArrayView1<'_, T>,
+    needles: &ArrayViewD<'_, f64>,
+    side: Side,
+) -> ArrayD<i64> {
+    parallel::map(needles, |v| position(haystack, v, side) as i64)
+}
+
+/// The sorted distinct values of `a`, flattened. NaNs collapse to one.
+pub fn unique<T: Elem>(a: &ArrayViewD<'_, T>) -> ArrayD<T> {
+    let mut values: Vec<T> = a.iter().copied().collect();
+    values.sort_unstable_by(|x, y| order(x.to_f64(), y.to_f64()));
+    values.dedup_by(|x, y| order(x.to_f64(), y.to_f64()) == Ordering::Equal);
+    ArrayD::from_shape_vec(IxDyn(&[values.len()]), values).expect("1-D shape")
+}
+
+/// numpy's `digitize`: the index of the bin each element of `a` falls in.
+/// `right` makes the bins closed on the right instead of the left. None
+/// if `bins` is neither non-decreasing nor non-increasing.
+pub fn digitize<T: Elem>(
+    a: &ArrayViewD<'_, T>,
+    bins: &ArrayView1<'_, f64>,
+    right: bool,
+) -> Option<ArrayD<i64>> {
+    let side = if right { Side::Left } else { Side::Right };
+    let pairs = || bins.iter().zip(bins.iter().skip(1));
+    if pairs().all(|(&x, &y)| order(x, y) != Ordering::Greater) {
+        return Some(parallel::map(a, |v| {
+            position(bins, v.to_f64(), side) as i64
+        }));
+    }
+    if pairs().all(|(&x, &y)| order(x, y) != Ordering::Less) {
+        let mut reversed = bins.view();
+        reversed.invert_axis(Axis(0));
+        let n = bins.len() as i64;
+        return Some(parallel::map(a, |v| {
+            n - position(&reversed, v.to_f64(), side) as i64
+        }));
+    }
+    None
+}
@@ -0,0 +1,766 @@
+//! Typed magnitude storage for `QuantityNP`.
+//!
+//! A `QuantityNP` keeps the caller's dtype — float32, float64, complex64 or
+//! complex128 — instead of converting everything to float64, so float32
+//! telemetry costs half the memory and complex phasors are representable.
+//! The numerical kernels here are generic over the element type and get
+//! monomorphised once per dtype.
+//!
+//! Mixed-dtype arithmetic between arrays promotes both sides to
+//! `DType::promote` of the two, as numpy does: the wider precision wins,
+//! and the result is complex if either side is. A Python scalar never
+//! widens an array (`float32_array * 2.0` stays float32).
+//!
+//! `Storage::Fixed` holds integer counts of a quantum (in base SI units),
+//! for compact archives. It is decoded to float64 whenever it takes part in
+//! arithmetic, and cannot be written into in place.
+
+use std::cmp::Ordering;
+use std::ops::{Add, Div, Mul, Neg, Sub};
+
+use numpy::ndarray::{ArrayD, ArrayViewD, ArrayViewMutD, Axis, IxDyn, Zip};
+use numpy::{
+    Complex32, Complex64, IntoPyArray, PyArrayDescrMethods, PyArrayDyn, PyArrayMethods,
+    PyReadonlyArrayDyn, PyUntypedArray, PyUntypedArrayMethods,
+};
+use pyo3::class::basic::CompareOp;
+use pyo3::exceptions::{PyIndexError, PyTypeError, PyValueError};
+use pyo3::prelude::*;
+
+use crate::parallel::{self, Part};
+use crate::quantity_np::BinOp;
+
+/// The element types a `QuantityNP` can hold directly.
+#[derive(Clone, Copy, Debug, PartialEq, Eq)]
+pub enum DType {
+    F32,
+    F64,
+    C64,
+    C128,
+}
+
+impl DType {
+    pub fn is_complex(self) -> bool {
+        matches!(self, DType::C64 | DType::C128)
+    }
+
+    fn is_double(self) -> bool {
+        matches!(self, DType::F64 | DType::C128)
+    }
+
+    /// The common dtype of an array operation between `self` and `other`.
+    pub fn promote(self, other: DType) -> DType {
+        match (self.is_complex() || other.is_complex(), self.is_double() || other.is_double()) {
+            (false, false) => DType::F32,
+            (false, true) => DType::F64,
+            (true, false) => DType::C64,
+            (true, true) => DType::C128,
+        }
+    }
+
+    /// Whether values of this dtype may be written into an array of
+    /// `dest` (numpy's "same_kind" rule: anything but complex into real).
+    pub fn casts_to(self, dest: DType) -> bool {
+        !self.is_complex() || dest.is_complex()
+    }
+
+    pub fn name(self) -> &'static str {
+        match self {
+            DType::F32 => "float32",
+            DType::F64 => "float64",
+            DType::C64 => "complex64",
+            DType::C128 => "complex128",
+        }
+    }
+}
+
+/// Element types with a `QuantityNP` kernel.
+pub trait Elem:
+    numpy::Element
+    + Copy
+    + PartialEq
+    + Send
+    + Sync
+    + Add<Output = Self>
+    + Sub<Output = Self>
+    + Mul<Output = Self>
+    + Div<Output = Self>
+    + Neg<Output = Self>
+    + 'static
+{
+    const DTYPE: DType;
+    fn from_f64(v: f64) -> Self;
+    /// The value as an `f64`; only called for real dtypes.
+    fn to_f64(self) -> f64;
+    fn powf(self, exp: f64) -> Self;
+    /// The absolute value (the modulus, for complex) as an `f64`.
+    fn modulus(self) -> f64;
+    /// Ordering for `<`, `>` and friends; `None` when unordered (NaN).
+    fn order(self, other: Self) -> Option<Ordering>;
+    fn wrap(arr: Py<PyArrayDyn<Self>>) -> Storage;
+    /// The typed array of a storage already cast to `Self::DTYPE`.
+    fn expect(storage: &Storage) -> &Py<PyArrayDyn<Self>>;
+}
+
+macro_rules! impl_real {
+    ($t:ty, $variant:ident) => {
+        impl Elem for $t {
+            const DTYPE: DType = DType::$variant;
+            #[inline(always)]
+            fn from_f64(v: f64) -> Self {
+                v as $t
+            }
+            #[inline(always)]
+            fn to_f64(self) -> f64 {
+                self as f64
+            }
+            #[inline(always)]
+            fn powf(self, exp: f64) -> Self {
+                <$t>::powf(self, exp as $t)
+            }
+            #[inline(always)]
+            fn modulus(self) -> f64 {
+                (self as f64).abs()
+            }
+            #[inline(always)]
+            fn order(self, other: Self) -> Option<Ordering> {
+                self.partial_cmp(&other)
+            }
+            fn wrap(arr: Py<PyArrayDyn<Self>>) -> Storage {
+                Storage::$variant(arr)
+            }
+            fn expect(storage: &Storage) -> &Py<PyArrayDyn<Self>> {
+                match storage {
+                    Storage::$variant(arr) => arr,
+                    _ => unreachable!("storage was cast to {}", DType::$variant.name()),
+                }
+            }
+        }
+    };
+}
+
+macro_rules! impl_complex {
+    ($t:ty, $part:ty, $variant:ident) => {
+        impl Elem for $t {
+            const DTYPE: DType = DType::$variant;
+            #[inline(always)]
+            fn from_f64(v: f64) -> Self {
+                <$t>::new(v as $part, 0.0)
+            }
+            #[inline(always)]
+            fn to_f64(self) -> f64 {
+                self.re as f64
+            }
+            #[inline(always)]
+            fn powf(self, exp: f64) -> Self {
+                <$t>::powf(self, exp as $part)
+            }
+            #[inline(always)]
+            fn modulus(self) -> f64 {
+                self.norm() as f64
+            }
+            #[inline(always)]
+            fn order(self, _other: Self) -> Option<Ordering> {
+                None
+            }
+            fn wrap(arr: Py<PyArrayDyn<Self>>) -> Storage {
+                Storage::$variant(arr)
+            }
+            fn expect(storage: &Storage) -> &Py<PyArrayDyn<Self>> {
+                match storage {
+                    Storage::$variant(arr) => arr,
+                    _ => unreachable!("storage was cast to {}", DType::$variant.name()),
+                }
+            }
+        }
+    };
+}
+
+impl_real!(f32, F32);
+impl_real!(f64, F64);
+impl_complex!(Complex32, f32, C64);
+impl_complex!(Complex64, f64, C128);
+
+/// Evaluate `$body` with `$T` bound to the element type of `$dtype`.
+macro_rules! per_dtype {
+    ($dtype:expr, $T:ident => $body:expr) => {
+        match $dtype {
+            $crate::storage::DType::F32 => {
+                type $T = f32;
+                $body
+            }
+            $crate::storage::DType::F64 => {
+                type $T = f64;
+                $body
+            }
+            $crate::storage::DType::C64 => {
+                type $T = numpy::Complex32;
+                $body
+            }
+            $crate::storage::DType::C128 => {
+                type $T = numpy::Complex64;
+                $body
+            }
+        }
+    };
+}
+pub(crate) use per_dtype;
+
+/// The numpy array behind a `QuantityNP`.
+pub enum Storage {
+    F32(Py<PyArrayDyn<f32>>),
+    F64(Py<PyArrayDyn<f64>>),
+    C64(Py<PyArrayDyn<Complex32>>),
+    C128(Py<PyArrayDyn<Complex64>>),
+    /// Integer counts (of any numpy integer dtype) of a quantum, with the
+    /// quantum in base SI units.
+    Fixed(Py<PyUntypedArray>, f64),
+}
+
+impl Storage {
+    pub fn clone_ref(&self, py: Python<'_>) -> Storage {
+        match self {
+            Storage::F32(a) => Storage::F32(a.clone_ref(py)),
+            Storage::F64(a) => Storage::F64(a.clone_ref(py)),
+            Storage::C64(a) => Storage::C64(a.clone_ref(py)),
+            Storage::C128(a) => Storage::C128(a.clone_ref(py)),
+            Storage::Fixed(a, quantum) => Storage::Fixed(a.clone_ref(py), *quantum),
+        }
+    }
+
+    /// Wrap `obj`, without copying, if it is an ndarray of a supported dtype.
+    pub fn from_array(obj: &Bound<'_, PyAny>) -> Option<Storage> {
+        if let Ok(a) = obj.cast::<PyArrayDyn<f64>>() {
+            return Some(Storage::F64(a.clone().unbind()));
+        }
+        if let Ok(a) = obj.cast::<PyArrayDyn<f32>>() {
+            return Some(Storage::F32(a.clone().unbind()));
+        }
+        if let Ok(a) = obj.cast::<PyArrayDyn<Complex64>>() {
+            return Some(Storage::C128(a.clone().unbind()));
+        }
+        if let Ok(a) = obj.cast::<PyArrayDyn<Complex32>>() {
+            return Some(Storage::C64(a.clone().unbind()));
+        }
+        None
+    }
+
+    /// Any array-like, via `np.asarray`. Supported dtypes are kept; other
+    /// complex data becomes complex128 and everything else float64.
+    pub fn from_any<'py>(py: Python<'py>, obj: &Bound<'py, PyAny>) -> PyResult<Storage> {
+        if let Some(storage) = Storage::from_array(obj) {
+            return Ok(storage);
+        }
+        let np = py.import("numpy")?;
+        let arr = np.call_method1("asarray", (obj.clone(),))?;
+        if let Some(storage) = Storage::from_array(&arr) {
+            return Ok(storage);
+        }
+        let complex = arr
+            .cast::<PyUntypedArray>()
+            .map(|a| a.dtype().kind() == b'c')
+            .unwrap_or(false);
+        let dtype = if complex { DType::C128 } else { DType::F64 };
+        let arr = arr.call_method1("astype", (dtype.name(),))?;
+        Storage::from_array(&arr)
+            .ok_or_else(|| PyTypeError::new_err("Could not coerce to a float64 numpy array"))
+    }
+
+    pub fn from_owned<T: Elem>(py: Python<'_>, arr: ArrayD<T>) -> Storage {
+        T::wrap(arr.into_pyarray(py).unbind())
+    }
+
+    /// A length-1 array holding `v`.
+    pub fn scalar<T: Elem>(py: Python<'_>, v: T) -> Storage {
+        Storage::from_owned(py, ArrayD::from_elem(IxDyn(&[1]), v))
+    }
+
+    /// The dtype arithmetic sees (fixed-point decodes to float64).
+    pub fn dtype(&self) -> DType {
+        match self {
+            Storage::F32(_) => DType::F32,
+            Storage::F64(_) | Storage::Fixed(..) => DType::F64,
+            Storage::C64(_) => DType::C64,
+            Storage::C128(_) => DType::C128,
+        }
+    }
+
+    /// The stored numpy array itself (the integer counts, if fixed-point).
+    pub fn array<'py>(&self, py: Python<'py>) -> Bound<'py, PyUntypedArray> {
+        match self {
+            Storage::F32(a) => a.bind(py).as_untyped().clone(),
+            Storage::F64(a) => a.bind(py).as_untyped().clone(),
+            Storage::C64(a) => a.bind(py).as_untyped().clone(),
+            Storage::C128(a) => a.bind(py).as_untyped().clone(),
+            Storage::Fixed(a, _) => a.bind(py).clone(),
+        }
+    }
+
+    /// Wrap an array derived from `self.array()` (a slice, a reshape, a
+    /// copy), keeping fixed-point storage fixed-point.
+    pub fn rewrap(&self, arr: &Bound<'_, PyAny>) -> PyResult<Storage> {
+        if let Storage::Fixed(_, quantum) = self {
+            let counts = arr.cast::<PyUntypedArray>()?;
+            return Ok(Storage::Fixed(counts.clone().unbind(), *quantum));
+        }
+        Storage::from_array(arr)
+            .ok_or_else(|| PyTypeError::new_err("unsupported QuantityNP dtype"))
+    }
+
+    /// `self` as one of the directly computable dtypes.
+    pub fn decoded(&self, py: Python<'_>) -> PyResult<Storage> {
+        let Storage::Fixed(counts, quantum) = self else {
+            return Ok(self.clone_ref(py));
+        };
+        let values = counts.bind(py).call_method1("astype", ("float64",))?;
+        let values = values.cast_into::<PyArrayDyn<f64>>()?;
+        let quantum = *quantum;
+        {
+            let mut rw = values.readwrite();
+            let mut view = rw.as_array_mut();
+            py.detach(|| view.mapv_inplace(|c| c * quantum));
+        }
+        Ok(Storage::F64(values.unbind()))
+    }
+
+    /// `self` converted to `dtype`, sharing the array when it already is.
+    pub fn cast(&self, py: Python<'_>, dtype: DType) -> PyResult<Storage> {
+        let decoded = self.decoded(py)?;
+        if decoded.dtype() == dtype {
+            return Ok(decoded);
+        }
+        let arr = decoded.array(py).call_method1("astype", (dtype.name(),))?;
+        Ok(Storage::from_array(&arr).expect("astype to a supported dtype"))
+    }
+
+    /// Real magnitudes as float64, for the float64-only code paths.
+    pub fn to_f64(&self, py: Python<'_>) -> PyResult<Py<PyArrayDyn<f64>>> {
+        if self.dtype().is_complex() {
+            return Err(PyTypeError::new_err(
+                "this operation is not supported for complex QuantityNP",
+            ));
+        }
+        match self.cast(py, DType::F64)? {
+            Storage::F64(arr) => Ok(arr),
+            _ => unreachable!("cast to float64"),
+        }
+    }
+}
+
+/// The shape `a` and `b` broadcast to under numpy's rules: shapes are
+/// aligned on their trailing axes, and each pair of lengths must be equal
+/// or contain a 1.
+pub fn broadcast_shape(a: &[usize], b: &[usize]) -> PyResult<Vec<usize>> {
+    let ndim = a.len().max(b.len());
+    let mut shape = vec![0; ndim];
+    for i in 0..ndim {
+        let x = if i < a.len() { a[a.len() - 1 - i] } else { 1 };
+        let y = if i < b.len() { b[b.len() - 1 - i] } else { 1 };
+        shape[ndim - 1 - i] = match (x, y) {
+            _ if x == y => x,
+            (1, _) => y,
+            (_, 1) => x,
+            _ => {
+                return Err(PyValueError::new_err(format!(
+                    "operands could not be broadcast together with shapes {} {}",
+                    shape_str(a),
+                    shape_str(b)
+                )))
+            }
+        };
+    }
+    Ok(shape)
+}
+
+/// A shape formatted like a Python tuple, as numpy prints it.
+pub fn shape_str(shape: &[usize]) -> String {
+    match shape {
+        [n] => format!("({n},)"),
+        _ => {
+            let dims: Vec<String> = shape.iter().map(|n| n.to_string()).collect();
+            format!("({})", dims.join(", "))
+        }
+    }
+}
+
+// ---- kernels ---------------------------------------------------------------
+
+/// `a op b`, broadcasting. Broadcasting only adjusts strides (zero along
+/// stretched axes), so neither operand is copied.
+pub fn binary<T: Elem>(
+    py: Python<'_>,
+    a: &Py<PyArrayDyn<T>>,
+    b: &Py<PyArrayDyn<T>>,
+    op: BinOp,
+) -> PyResult<ArrayD<T>> {
+    let (a, b) = (a.bind(py).readonly(), b.bind(py).readonly());
+    let (a, b) = (a.as_array(), b.as_array());
+    let shape = broadcast_shape(a.shape(), b.shape())?;
+    Ok(parallel::detach(py, shape.iter().product(), || {
+        let l = a.broadcast(shape.as_slice()).expect("shape checked");
+        let r = b.broadcast(shape.as_slice()).expect("shape checked");
+        // One loop per operator, so the inner loop has no branch on it.
+        match op {
+            BinOp::Add => parallel::zip(&l, &r, |x, y| x + y),
+            BinOp::Sub => parallel::zip(&l, &r, |x, y| x - y),
+            BinOp::Mul => parallel::zip(&l, &r, |x, y| x * y),
+            BinOp::Div => parallel::zip(&l, &r, |x, y| x / y),
+        }
+    }))
+}
+
+/// `a op scalar`, or `scalar op a` when `scalar_first`.
+pub fn scalar<T: Elem>(
+    py: Python<'_>,
+    a: &Py<PyArrayDyn<T>>,
+    scalar: T,
+    op: BinOp,
+    scalar_first: bool,
+) -> ArrayD<T> {
+    let view = a.bind(py).readonly();
+    let arr = view.as_array();
+    // One monomorphised loop per (op, side), so the inner loop has no
+    // branch on the operator.
+    parallel::detach(py, arr.len(), || match (op, scalar_first) {
+        (BinOp::Add, _) => parallel::map(&arr, |x| x + scalar),
+        (BinOp::Sub, false) => parallel::map(&arr, |a| a - scalar),
+        (BinOp::Sub, true) => parallel::map(&arr, |b| scalar - b),
+        (BinOp::Mul, _) => parallel::map(&arr, |x| x * scalar),
+        (BinOp::Div, false) => parallel::map(&arr, |a| a / scalar),
+        (BinOp::Div, true) => parallel::map(&arr, |b| scalar / b),
+    })
+}
+
+/// `f` applied elementwise.
+pub fn map<T: Elem>(py: Python<'_>, a: &Py<PyArrayDyn<T>>, f: impl Fn(T) -> T + Send + Sync) -> ArrayD<T> {
+    let view = a.bind(py).readonly();
+    let arr = view.as_array();
+    parallel::detach(py, arr.len(), || parallel::map(&arr, f))
+}
+
+/// Elementwise comparison, broadcasting. Ordering comparisons of complex
+/// values are rejected, as in numpy.
+pub fn compare<T: Elem>(
+    py: Python<'_>,
+    a: &Py<PyArrayDyn<T>>,
+    b: &Py<PyArrayDyn<T>>,
+    op: CompareOp,
+) -> PyResult<ArrayD<bool>> {
+    if T::DTYPE.is_complex() && !matches!(op, CompareOp::Eq | CompareOp::Ne) {
+        return Err(PyTypeError::new_err("complex values have no ordering"));
+    }
+    let (a, b) = (a.bind(py).readonly(), b.bind(py).readonly());
+    let (a, b) = (a.as_array(), b.as_array());
+    let shape = broadcast_shape(a.shape(), b.shape())?;
+    Ok(parallel::detach(py, shape.iter().product(), || {
+        let l = a.broadcast(shape.as_slice()).expect("shape checked");
+        let r = b.broadcast(shape.as_slice()).expect("shape checked");
+        match op {
+            CompareOp::Lt => parallel::zip(&l, &r, |x, y| x.order(y) == Some(Ordering::Less)),
+            CompareOp::Le => parallel::zip(&l, &r, |x, y| matches!(x.order(y), Some(Ordering::Less | Ordering::Equal))),
+            CompareOp::Eq => parallel::zip(&l, &r, |x, y| x == y),
+            CompareOp::Ne => parallel::zip(&l, &r, |x, y| x != y),
+            CompareOp::Gt => parallel::zip(&l, &r, |x, y| x.order(y) == Some(Ordering::Greater)),
+            CompareOp::Ge => parallel::zip(&l, &r, |x, y| matches!(x.order(y), Some(Ordering::Greater | Ordering::Equal))),
+        }
+    }))
+}
+
+/// The tolerances of `isclose`: `|a - b| <= atol + rtol * |b|`.
+#[derive(Clone, Copy, Debug)]
+pub struct Tolerance {
+    pub rtol: f64,
+    pub atol: f64,
+    pub equal_nan: bool,
+}
+
+impl Tolerance {
+    /// numpy's rule: equal values (infinities included) are always close,
+    /// NaNs only to each other and only with `equal_nan`.
+    #[inline]
+    fn close<T: Elem>(self, a: T, b: T) -> bool {
+        #[allow(clippy::eq_op)]
+        let nan = |x: T| x != x;
+        a == b
+            || (a - b).modulus() <= self.atol + self.rtol * b.modulus()
+            || (self.equal_nan && nan(a) && nan(b))
+    }
+}
+
+/// Elementwise `isclose`, broadcasting.
+pub fn isclose<T: Elem>(
+    py: Python<'_>,
+    a: &Py<PyArrayDyn<T>>,
+    b: &Py<PyArrayDyn<T>>,
+    tol: Tolerance,
+) -> PyResult<ArrayD<bool>> {
+    let (a, b) = (a.bind(py).readonly(), b.bind(py).readonly());
+    let (a, b) = (a.as_array(), b.as_array());
+    let shape = broadcast_shape(a.shape(), b.shape())?;
+    Ok(parallel::detach(py, shape.iter().product(), || {
+        let l = a.broadcast(shape.as_slice()).expect("shape checked");
+        let r = b.broadcast(shape.as_slice()).expect("shape checked");
+        parallel::zip(&l, &r, |x, y| tol.close(x, y))
+    }))
+}
+
+/// Whether every pair is `isclose`, broadcasting; stops at the first pair
+/// that is not, and builds no array.
+pub fn allclose<T: Elem>(
+    py: Python<'_>,
+    a: &Py<PyArrayDyn<T>>,
+    b: &Py<PyArrayDyn<T>>,
+    tol: Tolerance,
+) -> PyResult<bool> {
+    let (a, b) = (a.bind(py).readonly(), b.bind(py).readonly());
+    let (a, b) = (a.as_array(), b.as_array());
+    let shape = broadcast_shape(a.shape(), b.shape())?;
+    Ok(parallel::detach(py, shape.iter().product(), || {
+        let l = a.broadcast(shape.as_slice()).expect("shape checked");
+        let r = b.broadcast(shape.as_slice()).expect("shape checked");
+        Zip::from(&l).and(&r).all(|&x, &y| tol.close(x, y))
+    }))
+}
+
+// ---- gathering -------------------------------------------------------------
+
+/// `a[mask]` for a boolean mask of `a`'s shape: the selected elements in C
+/// order, as a 1-D array. None if the shapes differ (numpy then decides).
+pub fn mask<T: Elem>(py: Python<'_>, a: &Py<PyArrayDyn<T>>, mask: &ArrayViewD<'_, bool>) -> Option<ArrayD<T>> {
+    let view = a.bind(py).readonly();
+    let arr = view.as_array();
+    if arr.shape() != mask.shape() {
+        return None;
+    }
+    Some(parallel::detach(py, arr.len(), || {
+        // `iter` walks both in logical (C) order, whatever their layouts.
+        let kept: Vec<T> = arr
+            .iter()
+            .zip(mask.iter())
+            .filter_map(|(&x, &keep)| keep.then_some(x))
+            .collect();
+        ArrayD::from_shape_vec(IxDyn(&[kept.len()]), kept).expect("1-D shape")
+    }))
+}
+
+/// `a[indices]` for a 1-D array of positions along the first axis
+/// (negative ones counting from the end). None for a 0-d `a` or a
+/// multi-dimensional index, which numpy handles.
+pub fn take<T: Elem>(
+    py: Python<'_>,
+    a: &Py<PyArrayDyn<T>>,
+    indices: &ArrayViewD<'_, i64>,
+) -> PyResult<Option<ArrayD<T>>> {
+    let view = a.bind(py).readonly();
+    let arr = view.as_array();
+    if arr.ndim() == 0 || indices.ndim() != 1 {
+        return Ok(None);
+    }
+    let n = arr.len_of(Axis(0));
+    let positions = indices
+        .iter()
+        .map(|&i| {
+            let j = if i < 0 { i + n as i64 } else { i };
+            if (0..n as i64).contains(&j) {
+                Ok(j as usize)
+            } else {
+                Err(PyIndexError::new_err(format!(
+                    "index {i} is out of bounds for axis 0 with size {n}"
+                )))
+            }
+        })
+        .collect::<PyResult<Vec<usize>>>()?;
+    Ok(Some(parallel::detach(py, positions.len(), || arr.select(Axis(0), &positions))))
+}
+
+// ---- writing into an existing array ----------------------------------------
+
+/// One input of a kernel that writes into a caller-supplied buffer.
+pub enum Data<T: Elem> {
+    Array(Py<PyArrayDyn<T>>),
+    Scalar(T),
+}
+
+/// An input as seen by the kernel. `Out` means "the destination buffer
+/// itself", so `x += y` reads and writes through a single borrow.
+enum Src<'a, T> {
+    Out,
+    Scalar(T),
+    Array(ArrayViewD<'a, T>),
+}
+
+/// Keeps an input's numpy borrow (or, when it overlaps the destination,
+/// a private copy) alive while the kernel runs.
+enum Held<'py, T: Elem> {
+    Out,
+    Scalar(T),
+    View(PyReadonlyArrayDyn<'py, T>),
+    Owned(ArrayD<T>),
+}
+
+impl<T: Elem> Src<'_, T> {
+    /// An array input stretched to `shape` (checked by the caller), so it
+    /// can be cut into the same pieces as the destination.
+    fn broadcast(&self, shape: &[usize]) -> Src<'_, T> {
+        match self {
+            Src::Out => Src::Out,
+            Src::Scalar(v) => Src::Scalar(*v),
+            Src::Array(a) => Src::Array(a.broadcast(shape).expect("shape checked")),
+        }
+    }
+
+    fn cut(&self, part: &Part) -> Src<'_, T> {
+        match self {
+            Src::Out => Src::Out,
+            Src::Scalar(v) => Src::Scalar(*v),
+            Src::Array(a) => Src::Array(part.cut(a)),
+        }
+    }
+}
+
+impl<T: Elem> Held<'_, T> {
+    fn src(&self) -> Src<'_, T> {
+        let arr = match self {
+            Held::Out => return Src::Out,
+            Held::Scalar(v) => return Src::Scalar(*v),
+            Held::View(v) => v.as_array(),
+            Held::Owned(a) => a.view(),
+        };
+        // A single-element array broadcasts like a scalar.
+        match arr.len() {
+            1 => Src::Scalar(*arr.iter().next().expect("one element")),
+            _ => Src::Array(arr),
+        }
+    }
+}
+
+/// `out[i] = f(lhs[i], rhs[i])`, broadcasting array inputs to `out`'s shape
+/// (checked by the caller). The match is outside the loop, so each
+/// combination of input kinds gets its own branch-free loop.
+fn fill<T: Elem>(out: &mut ArrayViewMutD<'_, T>, lhs: &Src<'_, T>, rhs: &Src<'_, T>, f: impl Fn(T, T) -> T) {
+    match (lhs, rhs) {
+        (Src::Out, Src::Out) => out.mapv_inplace(|a| f(a, a)),
+        (Src::Out, Src::Scalar(b)) => out.mapv_inplace(|a| f(a, *b)),
+        (Src::Scalar(a), Src::Out) => out.mapv_inplace(|b| f(*a, b)),
+        (Src::Out, Src::Array(r)) => Zip::from(out).and_broadcast(r).for_each(|o, &b| *o = f(*o, b)),
+        (Src::Array(l), Src::Out) => Zip::from(out).and_broadcast(l).for_each(|o, &a| *o = f(a, *o)),
+        (Src::Array(l), Src::Scalar(b)) => Zip::from(out).and_broadcast(l).for_each(|o, &a| *o = f(a, *b)),
+        (Src::Scalar(a), Src::Array(r)) => Zip::from(out).and_broadcast(r).for_each(|o, &b| *o = f(*a, b)),
+        (Src::Array(l), Src::Array(r)) => {
+            Zip::from(out).and_broadcast(l).and_broadcast(r).for_each(|o, &a, &b| *o = f(a, b))
+        }
+        (Src::Scalar(a), Src::Scalar(b)) => out.fill(f(*a, *b)),
+    }
+}
+
+/// Borrow one input of a kernel writing into `out` (of shape `shape`):
+/// see `write_into`.
+fn hold<'py, T: Elem>(
+    py: Python<'py>,
+    out: &Bound<'py, PyArrayDyn<T>>,
+    shape: &[usize],
+    data: &Data<T>,
+) -> PyResult<Held<'py, T>> {
+    let arr = match data {
+        Data::Scalar(v) => return Ok(Held::Scalar(*v)),
+        Data::Array(arr) if arr.as_ptr() == out.as_ptr() => return Ok(Held::Out),
+        Data::Array(arr) => arr.bind(py),
+    };
+    if broadcast_shape(shape, arr.shape())? != shape {
+        return Err(PyValueError::new_err(format!(
+            "operand with shape {} does not broadcast to the out shape {}",
+            shape_str(arr.shape()),
+            shape_str(shape)
+        )));
+    }
+    Ok(match arr.try_readonly() {
+        Ok(view) => Held::View(view),
+        Err(_) => Held::Owned(arr.to_owned_array()),
+    })
+}
+
+/// Write `f(lhs, rhs)` elementwise into the existing array `out`.
+///
+/// An input that *is* `out` is read through the destination borrow, so
+/// `x += y` needs no temporary; an input that merely overlaps `out` (say,
+/// a view of it) is copied first. Inputs must broadcast to `out`'s shape;
+/// `out` itself is never resized.
+pub fn write_into<'py, T: Elem>(
+    py: Python<'py>,
+    out: &Bound<'py, PyArrayDyn<T>>,
+    lhs: &Data<T>,
+    rhs: &Data<T>,
+    f: impl Fn(T, T) -> T + Send + Sync,
+) -> PyResult<()> {
+    let mut dest = out
+        .try_readwrite()
+        .map_err(|e| PyValueError::new_err(format!("out array is not writeable: {e}")))?;
+    let shape = dest.as_array().shape().to_vec();
+    let (l, r) = (hold(py, out, &shape, lhs)?, hold(py, out, &shape, rhs)?);
+    let (l, r) = (l.src(), r.src());
+    let (l, r) = (l.broadcast(&shape), r.broadcast(&shape));
+    let mut view = dest.as_array_mut();
+    parallel::detach(py, view.len(), || {
+        parallel::for_each_chunk(view.view_mut(), |mut piece, part| {
+            fill(&mut piece, &l.cut(part), &r.cut(part), &f)
+        })
+    });
+    Ok(())
+}
+
+/// `fill` for a kernel of three inputs. Rather than one loop per
+/// combination of input kinds (27 of them), scalars become zero-stride
+/// views of a single element, and inputs that are `out` read the element
+/// being replaced.
+fn fill3<T: Elem>(out: &mut ArrayViewMutD<'_, T>, srcs: [&Src<'_, T>; 3], f: impl Fn(T, T, T) -> T) {
+    let consts = srcs.map(|s| match s {
+        Src::Scalar(v) => *v,
+        _ => T::from_f64(0.0),
+    });
+    let points = consts
+        .each_ref()
+        .map(|v| ArrayViewD::from_shape(IxDyn(&[]), std::slice::from_ref(v)).expect("one element"));
+    let from_out = srcs.map(|s| matches!(s, Src::Out));
+    let shape = out.shape().to_vec();
+    let views: Vec<ArrayViewD<'_, T>> = (0..3)
+        .map(|i| match srcs[i] {
+            Src::Array(a) => a.view(),
+            _ => points[i].broadcast(shape.as_slice()).expect("a 0-d view broadcasts to any shape"),
+        })
+        .collect();
+    Zip::from(out).and(&views[0]).and(&views[1]).and(&views[2]).for_each(|o, &a, &b, &c| {
+        let cur = *o;
+        let a = if from_out[0] { cur } else { a };
+        let b = if from_out[1] { cur } else { b };
+        let c = if from_out[2] { cur } else { c };
+        *o = f(a, b, c);
+    });
+}
+
+/// `write_into` for a kernel of three inputs, `f(a, b, c)`.
+pub fn write_into3<'py, T: Elem>(
+    py: Python<'py>,
+    out: &Bound<'py, PyArrayDyn<T>>,
+    inputs: [&Data<T>; 3],
+    f: impl Fn(T, T, T) -> T + Send + Sync,
+) -> PyResult<()> {
+    let mut dest = out
+        .try_readwrite()
+        .map_err(|e| PyValueError::new_err(format!("out array is not writeable: {e}")))?;
+    let shape = dest.as_array().shape().to_vec();
+    let held = [
+        hold(py, out, &shape, inputs[0])?,
+        hold(py, out, &shape, inputs[1])?,
+        hold(py, out, &shape, inputs[2])?,
+    ];
+    let srcs = held.each_ref().map(|h| h.src());
+    let srcs = srcs.each_ref().map(|s| s.broadcast(&shape));
+    let mut view = dest.as_array_mut();
+    parallel::detach(py, view.len(), || {
+        parallel::for_each_chunk(view.view_mut(), |mut piece, part| {
+            let cut = srcs.each_ref().map(|s| s.cut(part));
+            fill3(&mut piece, cut.each_ref(), &f)
+        })
+    });
+    Ok(())
+}
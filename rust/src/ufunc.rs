@@ -0,0 +1,78 @@
+//! `__array_ufunc__` for Quantity and QuantityNP.
+//!
+//! numpy hands every ufunc call that involves a misu object to this hook,
+//! including the ones behind `ndarray * quantity` and `ndarray < qnp`. Those
+//! plain two-operand calls are answered here by calling the matching
+//! operator method, which keeps them on the same Rust path as
+//! `quantity * ndarray`. Everything else (unary ufuncs, `out=`, `where=`,
+//! the unit rules for the rest of numpy's ufuncs) lives in the Python
+//! helper `misu._ufunc`, mirroring how `dimensions` delegates to
+//! `misu._decorator`.
+
+use pyo3::intern;
+use pyo3::prelude::*;
+use pyo3::types::{PyDict, PyTuple};
+
+use crate::quantity::Quantity;
+use crate::quantity_np::QuantityNP;
+
+/// ufunc name → (method on a misu left operand, method on a misu right
+/// operand).
+const OPERATORS: &[(&str, &str, &str)] = &[
+    ("add", "__add__", "__radd__"),
+    ("subtract", "__sub__", "__rsub__"),
+    ("multiply", "__mul__", "__rmul__"),
+    ("divide", "__truediv__", "__rtruediv__"),
+    ("equal", "__eq__", "__eq__"),
+    ("not_equal", "__ne__", "__ne__"),
+    ("less", "__lt__", "__gt__"),
+    ("less_equal", "__le__", "__ge__"),
+    ("greater", "__gt__", "__lt__"),
+    ("greater_equal", "__ge__", "__le__"),
+];
+
+fn is_misu(obj: &Bound<'_, PyAny>) -> bool {
+    obj.cast::<Quantity>().is_ok() || obj.cast::<QuantityNP>().is_ok()
+}
+
+/// Plain `ufunc(a, b)` with no keywords, as an operator call. None when the
+/// ufunc isn't an operator or the operator returned NotImplemented.
+fn operator_call<'py>(
+    py: Python<'py>,
+    ufunc: &Bound<'py, PyAny>,
+    inputs: &Bound<'py, PyTuple>,
+) -> PyResult<Option<Bound<'py, PyAny>>> {
+    let name: String = ufunc.getattr(intern!(py, "__name__"))?.extract()?;
+    let Some(&(_, forward, reflected)) = OPERATORS.iter().find(|(n, _, _)| *n == name) else {
+        return Ok(None);
+    };
+    let (a, b) = (inputs.get_item(0)?, inputs.get_item(1)?);
+    let result = if is_misu(&a) {
+        a.call_method1(forward, (b,))?
+    } else {
+        b.call_method1(reflected, (a,))?
+    };
+    Ok((result.as_ptr() != py.NotImplemented().as_ptr()).then_some(result))
+}
+
+pub fn array_ufunc<'py>(
+    py: Python<'py>,
+    ufunc: &Bound<'py, PyAny>,
+    method: &str,
+    inputs: &Bound<'py, PyTuple>,
+    kwargs: Option<&Bound<'py, PyDict>>,
+) -> PyResult<Py<PyAny>> {
+    let plain = method == "__call__" && kwargs.map_or(true, |k| k.is_empty());
+    if plain && inputs.len() == 2 {
+        if let Some(result) = operator_call(py, ufunc, inputs)? {
+            return Ok(result.unbind());
+        }
+    }
+    let kwargs = match kwargs {
+        Some(k) => k.clone(),
+        None => PyDict::new(py),
+    };
+    let helpers = py.import("misu._ufunc")?;
+    let helper = helpers.getattr("array_ufunc")?;
+    Ok(helper.call1((ufunc, method, inputs, kwargs))?.unbind())
+}
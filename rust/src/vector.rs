@@ -0,0 +1,366 @@
+//! Fixed-size vector quantities: `QuantityVec2` and `QuantityVec3`.
+//!
+//! Kinematics written with one `Quantity` per component pays an FFI
+//! crossing and an allocation per component for every vector operation,
+//! and a length-3 `QuantityNP` pays numpy's per-call overhead on top. These
+//! classes keep the components inline (`[f64; N]`) with a single `Dim`, so
+//! `r + v * dt` is two native calls whatever the dimension.
+//!
+//! Like `Quantity` they are frozen, so they are free-threading-safe and
+//! hashable, and they keep a small free-list. Both classes are generated by
+//! `vector_class!` from the same code; only `cross` differs (the z
+//! component, a `Quantity`, for 2-D vectors; a vector for 3-D).
+
+use pyo3::class::basic::CompareOp;
+use pyo3::exceptions::{PyAssertionError, PyIndexError, PyTypeError, PyValueError};
+use pyo3::prelude::*;
+use pyo3::types::{PyBool, PyFloat, PyTuple};
+
+use crate::dim::Dim;
+use crate::errors::EIncompatibleUnits;
+use crate::format;
+use crate::operand::{not_implemented, Operand};
+use crate::quantity::Quantity;
+
+/// Upper bound on recycled objects kept alive by each class's free-list.
+const VECTOR_FREELIST_CAPACITY: usize = 256;
+
+/// The magnitudes of a vector quantity, in base SI units.
+#[derive(Clone, Copy, Debug, PartialEq)]
+pub struct Vector<const N: usize>(pub [f64; N]);
+
+impl<const N: usize> Vector<N> {
+    #[inline(always)]
+    fn map(self, f: impl Fn(f64) -> f64) -> Self {
+        Vector(self.0.map(f))
+    }
+
+    #[inline(always)]
+    fn zip(self, other: Self, f: impl Fn(f64, f64) -> f64) -> Self {
+        Vector(std::array::from_fn(|i| f(self.0[i], other.0[i])))
+    }
+
+    #[inline(always)]
+    fn dot(self, other: Self) -> f64 {
+        self.0.iter().zip(other.0).map(|(a, b)| a * b).sum()
+    }
+
+    #[inline(always)]
+    fn norm(self) -> f64 {
+        self.dot(self).sqrt()
+    }
+}
+
+/// The cross product of two vectors, as a Python object with `dim`.
+trait Cross: Sized {
+    fn cross(py: Python<'_>, a: Self, b: Self, dim: Dim) -> PyResult<Py<PyAny>>;
+}
+
+impl Cross for Vector<2> {
+    fn cross(py: Python<'_>, a: Self, b: Self, dim: Dim) -> PyResult<Py<PyAny>> {
+        let [ax, ay] = a.0;
+        let [bx, by] = b.0;
+        let z = Quantity::new(ax * by - ay * bx, dim);
+        Ok(z.into_pyobject(py)?.into_any().unbind())
+    }
+}
+
+impl Cross for Vector<3> {
+    fn cross(py: Python<'_>, a: Self, b: Self, dim: Dim) -> PyResult<Py<PyAny>> {
+        let [ax, ay, az] = a.0;
+        let [bx, by, bz] = b.0;
+        let v = Vector([ay * bz - az * by, az * bx - ax * bz, ax * by - ay * bx]);
+        let c = QuantityVec3 { v, dim };
+        Ok(c.into_pyobject(py)?.into_any().unbind())
+    }
+}
+
+/// The components of a new vector from `items`: Quantities of a single
+/// dimension, or bare numbers (dimensionless).
+fn components<const N: usize>(
+    name: &str,
+    items: &Bound<'_, PyTuple>,
+) -> PyResult<(Vector<N>, Dim)> {
+    if items.len() != N {
+        return Err(PyTypeError::new_err(format!(
+            "{name}() takes {N} components ({} given)",
+            items.len()
+        )));
+    }
+    let mut v = [0.0; N];
+    let mut dim = None;
+    for (i, item) in items.iter().enumerate() {
+        let Some(q) = Operand::classify(&item)?.as_quantity() else {
+            return Err(PyTypeError::new_err(format!(
+                "component {i} is not a Quantity"
+            )));
+        };
+        match dim {
+            None => dim = Some(q.dim),
+            Some(d) if d != q.dim => {
+                return Err(EIncompatibleUnits::new_err(format!(
+                    "Incompatible units for {name} components"
+                )));
+            }
+            Some(_) => {}
+        }
+        v[i] = q.magnitude;
+    }
+    Ok((Vector(v), dim.unwrap_or(Dim::DIMENSIONLESS)))
+}
+
+macro_rules! vector_class {
+    ($name:ident, $n:literal, $($axis:ident = $i:literal),+) => {
+        /// A vector quantity: `N` components in base SI units and one Dim.
+        #[pyclass(module = "misu._engine", frozen, freelist = VECTOR_FREELIST_CAPACITY)]
+        #[derive(Clone)]
+        pub struct $name {
+            pub v: Vector<$n>,
+            pub dim: Dim,
+        }
+
+        impl $name {
+            fn wrap(py: Python<'_>, v: Vector<$n>, dim: Dim) -> PyResult<Py<PyAny>> {
+                Ok($name { v, dim }.into_pyobject(py)?.into_any().unbind())
+            }
+
+            fn assert_same_units(&self, other: &Self) -> PyResult<()> {
+                if self.dim != other.dim {
+                    return Err(EIncompatibleUnits::new_err(concat!(
+                        "Incompatible units for ",
+                        stringify!($name)
+                    )));
+                }
+                Ok(())
+            }
+
+            /// `self * other`, or `self / other` when `divide`, for a scalar
+            /// Quantity or number; NotImplemented for anything else.
+            fn scaled(
+                &self,
+                py: Python<'_>,
+                other: &Bound<'_, PyAny>,
+                divide: bool,
+            ) -> PyResult<Py<PyAny>> {
+                let Some(k) = Operand::classify(other)?.as_quantity() else {
+                    return not_implemented(py);
+                };
+                if divide {
+                    Self::wrap(py, self.v.map(|c| c / k.magnitude), self.dim.sub(&k.dim))
+                } else {
+                    Self::wrap(py, self.v.map(|c| c * k.magnitude), self.dim.add(&k.dim))
+                }
+            }
+        }
+
+        #[pymethods]
+        impl $name {
+            #[new]
+            #[pyo3(signature = (*components))]
+            fn py_new(components: &Bound<'_, PyTuple>) -> PyResult<Self> {
+                let (v, dim) = self::components::<$n>(stringify!($name), components)?;
+                Ok($name { v, dim })
+            }
+
+            /// numpy would otherwise treat a vector as a sequence and
+            /// multiply it into an object array; `None` makes
+            /// `np.float64(2.0) * v` fall back to `__rmul__`.
+            #[classattr]
+            fn __array_ufunc__(py: Python<'_>) -> Py<PyAny> {
+                py.None()
+            }
+
+            /// Build from bare numbers given in `unit`.
+            #[staticmethod]
+            fn from_values(values: [f64; $n], unit: Quantity) -> Self {
+                $name {
+                    v: Vector(values).map(|c| c * unit.magnitude),
+                    dim: unit.dim,
+                }
+            }
+
+            $(
+                #[getter]
+                fn $axis(&self) -> Quantity {
+                    Quantity::new(self.v.0[$i], self.dim)
+                }
+            )+
+
+            /// The components in base SI units.
+            #[getter]
+            fn magnitude<'py>(&self, py: Python<'py>) -> PyResult<Bound<'py, PyTuple>> {
+                PyTuple::new(py, self.v.0)
+            }
+
+            fn unit_as_tuple<'py>(&self, py: Python<'py>) -> PyResult<Bound<'py, PyTuple>> {
+                PyTuple::new(py, self.dim.exponents())
+            }
+
+            fn __len__(&self) -> usize {
+                $n
+            }
+
+            fn __getitem__(&self, index: isize) -> PyResult<Quantity> {
+                let i = if index < 0 { index + $n } else { index };
+                if !(0..$n).contains(&i) {
+                    return Err(PyIndexError::new_err(concat!(
+                        stringify!($name),
+                        " index out of range"
+                    )));
+                }
+                Ok(Quantity::new(self.v.0[i as usize], self.dim))
+            }
+
+            // ---- arithmetic ----------------------------------------------
+            //
+            // `+` and `-` take another vector of the same class and units;
+            // `*` and `/` take a scalar Quantity or a bare number.
+
+            fn __add__(&self, py: Python<'_>, other: &Bound<'_, PyAny>) -> PyResult<Py<PyAny>> {
+                let Ok(b) = other.cast::<Self>() else {
+                    return not_implemented(py);
+                };
+                let b = b.get();
+                self.assert_same_units(b)?;
+                Self::wrap(py, self.v.zip(b.v, |x, y| x + y), self.dim)
+            }
+
+            fn __sub__(&self, py: Python<'_>, other: &Bound<'_, PyAny>) -> PyResult<Py<PyAny>> {
+                let Ok(b) = other.cast::<Self>() else {
+                    return not_implemented(py);
+                };
+                let b = b.get();
+                self.assert_same_units(b)?;
+                Self::wrap(py, self.v.zip(b.v, |x, y| x - y), self.dim)
+            }
+
+            fn __mul__(&self, py: Python<'_>, other: &Bound<'_, PyAny>) -> PyResult<Py<PyAny>> {
+                self.scaled(py, other, false)
+            }
+
+            fn __rmul__(&self, py: Python<'_>, other: &Bound<'_, PyAny>) -> PyResult<Py<PyAny>> {
+                self.scaled(py, other, false)
+            }
+
+            fn __truediv__(&self, py: Python<'_>, other: &Bound<'_, PyAny>) -> PyResult<Py<PyAny>> {
+                self.scaled(py, other, true)
+            }
+
+            fn __neg__(&self) -> Self {
+                $name { v: self.v.map(|c| -c), dim: self.dim }
+            }
+
+            fn __pos__(&self) -> Self {
+                self.clone()
+            }
+
+            /// The scalar product, in the product of the units.
+            fn dot(&self, other: &Bound<'_, Self>) -> Quantity {
+                let b = other.get();
+                Quantity::new(self.v.dot(b.v), self.dim.add(&b.dim))
+            }
+
+            /// The vector product, in the product of the units.
+            fn cross(&self, py: Python<'_>, other: &Bound<'_, Self>) -> PyResult<Py<PyAny>> {
+                let b = other.get();
+                <Vector<$n> as Cross>::cross(py, self.v, b.v, self.dim.add(&b.dim))
+            }
+
+            /// The Euclidean length.
+            fn norm(&self) -> Quantity {
+                Quantity::new(self.v.norm(), self.dim)
+            }
+
+            /// The dimensionless unit vector in the same direction.
+            fn normalized(&self) -> PyResult<Self> {
+                let n = self.v.norm();
+                if n == 0.0 {
+                    return Err(PyValueError::new_err("cannot normalize a zero vector"));
+                }
+                Ok($name { v: self.v.map(|c| c / n), dim: Dim::DIMENSIONLESS })
+            }
+
+            /// The components as bare numbers in `target_unit`.
+            fn convert<'py>(
+                &self,
+                py: Python<'py>,
+                target_unit: &Bound<'py, PyAny>,
+            ) -> PyResult<Bound<'py, PyTuple>> {
+                let target = target_unit
+                    .extract::<Quantity>()
+                    .map_err(|_| PyAssertionError::new_err("Target must be a quantity."))?;
+                if target.dim != self.dim {
+                    return Err(EIncompatibleUnits::new_err(concat!(
+                        "Incompatible units for ",
+                        stringify!($name)
+                    )));
+                }
+                PyTuple::new(py, self.v.map(|c| c / target.magnitude).0)
+            }
+
+            fn __rshift__<'py>(
+                &self,
+                py: Python<'py>,
+                other: &Bound<'py, PyAny>,
+            ) -> PyResult<Bound<'py, PyTuple>> {
+                self.convert(py, other)
+            }
+
+            fn __richcmp__(
+                &self,
+                py: Python<'_>,
+                other: &Bound<'_, PyAny>,
+                op: CompareOp,
+            ) -> PyResult<Py<PyAny>> {
+                let Ok(b) = other.cast::<Self>() else {
+                    return not_implemented(py);
+                };
+                let b = b.get();
+                let equal = match op {
+                    CompareOp::Eq => true,
+                    CompareOp::Ne => false,
+                    _ => return not_implemented(py),
+                };
+                self.assert_same_units(b)?;
+                let result = (self.v == b.v) == equal;
+                Ok(PyBool::new(py, result).to_owned().into_any().unbind())
+            }
+
+            fn __hash__(&self) -> u64 {
+                // -0.0 == 0.0, so both must hash alike.
+                self.v.0.iter().fold(self.dim.word(), |h, &c| {
+                    let c = if c == 0.0 { 0.0 } else { c };
+                    h.rotate_left(7) ^ c.to_bits()
+                })
+            }
+
+            /// Pickling: `(cls, (component, ...))`.
+            fn __reduce__<'py>(slf: &Bound<'py, Self>, py: Python<'py>) -> PyResult<Bound<'py, PyTuple>> {
+                let this = slf.get();
+                let parts = this.v.0.map(|c| Quantity::new(c, this.dim));
+                let args = PyTuple::new(py, parts)?;
+                PyTuple::new(py, [slf.get_type().into_any(), args.into_any()])
+            }
+
+            fn __str__(&self, py: Python<'_>) -> PyResult<String> {
+                let parts = self
+                    .v
+                    .0
+                    .iter()
+                    .map(|&c| {
+                        let q = Bound::new(py, Quantity::new(c, self.dim))?;
+                        format::render(py, q.as_any(), &self.dim, PyFloat::new(py, c).into_any())
+                    })
+                    .collect::<PyResult<Vec<_>>>()?;
+                Ok(format!("{}({})", stringify!($name), parts.join(", ")))
+            }
+
+            fn __repr__(&self, py: Python<'_>) -> PyResult<String> {
+                self.__str__(py)
+            }
+        }
+    };
+}
+
+vector_class!(QuantityVec2, 2, x = 0, y = 1);
+vector_class!(QuantityVec3, 3, x = 0, y = 1, z = 2);
@@ -0,0 +1,62 @@
+"""Measure the memory cost of holding many live misu objects.
+
+Allocates a large list of scalar ``Quantity`` objects (each the result of
+arithmetic, as in a real simulation) and reports the traced bytes per
+object, next to the same measurement for plain Python floats.
+
+For reference, the instance payload of a ``Quantity`` is:
+
+- before (``Dim`` as ``[f64; 7]``): 8 (magnitude) + 56 (exponents) = 64 bytes
+- after  (``Dim`` packed in a word): 8 (magnitude) +  8 (exponents) = 16 bytes
+
+on top of the fixed Python object header. Dimensions that cannot be
+packed (e.g. ``m^(1/3)``) live in a shared intern table, so they do not
+add per-object cost either.
+
+Usage:
+    python scripts/benchmark_memory.py
+"""
+from __future__ import annotations
+
+import gc
+import sys
+import tracemalloc
+
+import misu
+from misu import kg, m, s
+
+
+N = 1_000_000
+
+
+def bytes_per_object(factory, n=N):
+    """Traced bytes per element for a list of `n` objects from `factory(i)`."""
+    gc.collect()
+    tracemalloc.start()
+    items = [factory(i) for i in range(n)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Subtract the list's own pointer array; we only want the elements.
+    per_object = (current - sys.getsizeof(items)) / n
+    del items
+    return per_object
+
+
+def main():
+    print(f"Python {sys.version.split()[0]} | misu {misu.__version__}")
+    velocity = 1.0 * m / s
+    rows = [
+        ("float", lambda i: i * 1.5),
+        ("Quantity (m/s)", lambda i: i * velocity),
+        ("Quantity (kg m^0.5)", lambda i: i * kg * m ** 0.5),
+        ("Quantity (m^(1/3), interned)", lambda i: i * m ** (1 / 3)),
+    ]
+    print(f"\n== bytes per live object ({N:,} objects) ==")
+    for name, factory in rows:
+        print(f"  {name:<30}: {bytes_per_object(factory):7.1f}")
+    print(f"\n  sys.getsizeof(Quantity)       : {sys.getsizeof(velocity):5d}")
+    print(f"  sys.getsizeof(float)          : {sys.getsizeof(1.5):5d}")
+
+
+if __name__ == "__main__":
+    main()